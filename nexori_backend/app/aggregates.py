@@ -0,0 +1,351 @@
+# app/aggregates.py
+"""
+Материализованная статистика по вопросам (таблица survey_question_stats)
+и по интервалам времени (survey_rollups: час и сутки).
+
+Каждый submit добавляет свои ответы к счётчикам в той же транзакции,
+поэтому аналитике не нужно проходить по всем ответам. rebuild_question_stats
+и rebuild_rollups пересчитывают таблицы с нуля из ответов — для проверки,
+ремонта и заполнения после обновления.
+"""
+import json
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import insert_missing
+
+
+def update_question_stats(
+    db: Session,
+    survey_id: int,
+    question_ids: Iterable[int],
+    answer_dicts: Iterable[Dict[int, int]],
+) -> None:
+    """
+    Добавляет ответы к агрегатам опроса. Учитываются только вопросы из
+    question_ids (текущие вопросы опроса).
+
+    Вызывать после INSERT ответа: на SQLite транзакция начинается с первой
+    записи, и только тогда чтение-изменение-запись идёт под блокировкой.
+    Недостающие строки создаются INSERT … ON CONFLICT DO NOTHING, так что
+    два первых submit'а по вопросу не конфликтуют по ключу.
+    """
+    question_ids = set(question_ids)
+    deltas: Dict[int, Dict[int, int]] = {}
+    for answers in answer_dicts:
+        for question_id, value in answers.items():
+            if question_id in question_ids:
+                hist = deltas.setdefault(question_id, {})
+                hist[value] = hist.get(value, 0) + 1
+    if not deltas:
+        return
+
+    stats = models.SurveyQuestionStats
+    # сначала строка должна существовать: FOR UPDATE не блокирует отсутствующую
+    insert_missing(db, stats, [
+        {"survey_id": survey_id, "question_id": question_id,
+         "count": 0, "total": 0, "total_sq": 0, "histogram": "{}"}
+        for question_id in deltas
+    ])
+    rows = {
+        row.question_id: row
+        for row in db.query(stats)
+        .filter(stats.survey_id == survey_id, stats.question_id.in_(deltas))
+        .with_for_update()
+    }
+    for question_id, hist_delta in deltas.items():
+        _merge_histogram(rows[question_id], hist_delta)
+
+
+def _merge_histogram(row: models.SurveyQuestionStats, hist_delta: Dict[int, int]) -> None:
+    histogram = {int(k): v for k, v in json.loads(row.histogram or "{}").items()}
+    for value, count in hist_delta.items():
+        histogram[value] = histogram.get(value, 0) + count
+        row.count += count
+        row.total += value * count
+        row.total_sq += value * value * count
+    low, high = min(hist_delta), max(hist_delta)
+    row.min_value = low if row.min_value is None else min(row.min_value, low)
+    row.max_value = high if row.max_value is None else max(row.max_value, high)
+    row.histogram = json.dumps(histogram, sort_keys=True)
+
+
+def drop_stale_stats(db: Session, survey_id: int, question_ids: Iterable[int]) -> None:
+    """
+    Удаляет агрегаты вопросов, которых больше нет в опросе
+    (админ заменил список вопросов).
+    """
+    stats = models.SurveyQuestionStats
+    db.query(stats).filter(
+        stats.survey_id == survey_id, stats.question_id.notin_(list(question_ids))
+    ).delete(synchronize_session=False)
+
+
+def get_survey_stats(db: Session, survey_id: Optional[int] = None) -> Dict[int, dict]:
+    """
+    Читает агрегаты: {question_id: {average, min, max, count, distribution}}.
+    """
+    stats = models.SurveyQuestionStats
+    query = db.query(stats)
+    if survey_id is not None:
+        query = query.filter(stats.survey_id == survey_id)
+
+    result = {}
+    for row in query:
+        if not row.count:
+            continue
+        result[row.question_id] = {
+            "average": row.total / row.count,
+            "min": row.min_value,
+            "max": row.max_value,
+            "count": row.count,
+            "distribution": {int(k): v for k, v in json.loads(row.histogram).items()},
+        }
+    return result
+
+
+def rebuild_question_stats(db: Session, survey_id: Optional[int] = None) -> Dict[str, int]:
+    """
+    Пересчитывает агрегаты из survey_answers (только по текущим вопросам)
+    и сравнивает с тем, что лежало в таблице. Возвращает
+    {"rows": пересчитано строк, "mismatched": расходилось с накопленным}.
+    """
+    answer = models.SurveyAnswer
+    question = models.SurveyQuestion
+    stats = models.SurveyQuestionStats
+    filters = [] if survey_id is None else [answer.survey_id == survey_id]
+
+    fresh: Dict[tuple, dict] = {}
+    rows = (
+        db.query(
+            answer.survey_id,
+            answer.question_id,
+            func.count(),
+            func.sum(answer.value),
+            func.sum(answer.value * answer.value),
+            func.min(answer.value),
+            func.max(answer.value),
+        )
+        .join(question, question.id == answer.question_id)
+        .filter(*filters)
+        .group_by(answer.survey_id, answer.question_id)
+    )
+    for s_id, q_id, count, total, total_sq, low, high in rows:
+        fresh[(s_id, q_id)] = {
+            "count": count, "total": total, "total_sq": total_sq,
+            "min_value": low, "max_value": high, "histogram": {},
+        }
+    rows = (
+        db.query(answer.survey_id, answer.question_id, answer.value, func.count())
+        .join(question, question.id == answer.question_id)
+        .filter(*filters)
+        .group_by(answer.survey_id, answer.question_id, answer.value)
+    )
+    for s_id, q_id, value, count in rows:
+        fresh[(s_id, q_id)]["histogram"][value] = count
+    for values in fresh.values():
+        values["histogram"] = json.dumps(values["histogram"], sort_keys=True)
+
+    stored_query = db.query(stats)
+    if survey_id is not None:
+        stored_query = stored_query.filter(stats.survey_id == survey_id)
+    stored = {
+        (row.survey_id, row.question_id): {
+            "count": row.count, "total": row.total, "total_sq": row.total_sq,
+            "min_value": row.min_value, "max_value": row.max_value,
+            "histogram": json.dumps(
+                {int(k): v for k, v in json.loads(row.histogram).items()}, sort_keys=True
+            ),
+        }
+        for row in stored_query
+    }
+    mismatched = sum(
+        1 for key in fresh.keys() | stored.keys() if fresh.get(key) != stored.get(key)
+    )
+
+    stored_query.delete(synchronize_session=False)
+    # Core-вставка, как в rebuild_rollups: прочитанные выше строки остались
+    # в identity map, db.add с теми же ключами подменял бы их (SAWarning)
+    if fresh:
+        db.execute(insert(stats), [
+            {"survey_id": s_id, "question_id": q_id, **values}
+            for (s_id, q_id), values in fresh.items()
+        ])
+    db.commit()
+    return {"rows": len(fresh), "mismatched": mismatched}
+
+
+# ---------- временные ряды ----------
+BUCKETS = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+# интервал «за всё время»: одна строка на опрос, из неё — перцентили
+# total_score без слияния суточных гистограмм
+ALL_TIME, ALL_TIME_START = "all", datetime(1970, 1, 1)
+ROLLUP_READ_CHUNK = 50_000
+
+
+def bucket_start(moment: datetime, bucket: str) -> datetime:
+    if bucket == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _add_to_rollups(deltas: dict, created_at: datetime, score: int,
+                    recommendation: Optional[str]) -> None:
+    keys = [(bucket, bucket_start(created_at, bucket)) for bucket in BUCKETS]
+    keys.append((ALL_TIME, ALL_TIME_START))
+    for key in keys:
+        delta = deltas.get(key)
+        if delta is None:
+            delta = deltas[key] = {"count": 0, "score_total": 0, "scores": {}, "recommendations": {}}
+        delta["count"] += 1
+        delta["score_total"] += score
+        delta["scores"][score] = delta["scores"].get(score, 0) + 1
+        # ответы без рекомендации видны как count − сумма recommendations
+        if recommendation is not None:
+            recs = delta["recommendations"]
+            recs[recommendation] = recs.get(recommendation, 0) + 1
+
+
+def update_rollups(
+    db: Session,
+    survey_id: int,
+    scored: Iterable[Tuple[datetime, int, Optional[str]]],
+) -> None:
+    """
+    Добавляет ответы (created_at, total_score, recommendation) к часовым
+    и суточным интервалам опроса и к интервалу «за всё время». Вызывать
+    после INSERT ответа — по той же причине, что и update_question_stats.
+    """
+    deltas: Dict[Tuple[str, datetime], dict] = {}
+    for created_at, score, recommendation in scored:
+        _add_to_rollups(deltas, created_at, score or 0, recommendation)
+    if not deltas:
+        return
+
+    rollup = models.SurveyRollup
+    # новый час — новая строка у каждого первого submit'а: создаём без гонки
+    insert_missing(db, rollup, [
+        {"survey_id": survey_id, "bucket": bucket, "bucket_start": start,
+         "count": 0, "score_total": 0, "score_histogram": "{}", "recommendations": "{}"}
+        for bucket, start in deltas
+    ])
+    rows = {
+        (row.bucket, row.bucket_start): row
+        for row in db.query(rollup)
+        .filter(rollup.survey_id == survey_id,
+                rollup.bucket_start.in_(sorted({start for _, start in deltas})))
+        .with_for_update()
+    }
+    for (bucket, start), delta in deltas.items():
+        row = rows[(bucket, start)]
+        row.count += delta["count"]
+        row.score_total += delta["score_total"]
+        row.score_histogram = _merge_counts(row.score_histogram, delta["scores"])
+        row.recommendations = _merge_counts(row.recommendations, delta["recommendations"])
+
+
+def _merge_counts(stored: Optional[str], delta: Dict) -> str:
+    counts = json.loads(stored or "{}")
+    for key, count in delta.items():
+        counts[str(key)] = counts.get(str(key), 0) + count
+    return json.dumps(counts, sort_keys=True, ensure_ascii=False)
+
+
+def rebuild_rollups(db: Session, survey_id: Optional[int] = None) -> Dict[str, int]:
+    """
+    Пересчитывает survey_rollups из survey_responses: по опросу за раз,
+    ответы читаются порциями, commit после каждого опроса.
+    Возвращает {"surveys": опросов, "rows": строк rollup}.
+    """
+    response = models.SurveyResponse
+    rollup = models.SurveyRollup
+    if survey_id is None:
+        survey_ids = [s_id for (s_id,) in db.query(models.Survey.id).order_by(models.Survey.id)]
+    else:
+        survey_ids = [survey_id]
+
+    written = 0
+    for s_id in survey_ids:
+        deltas: Dict[Tuple[str, datetime], dict] = {}
+        stmt = (
+            select(response.created_at, response.total_score, response.recommendation)
+            .where(response.survey_id == s_id, response.created_at.isnot(None))
+            .execution_options(yield_per=ROLLUP_READ_CHUNK)
+        )
+        for created_at, score, recommendation in db.execute(stmt):
+            _add_to_rollups(deltas, created_at, score or 0, recommendation)
+
+        db.query(rollup).filter(rollup.survey_id == s_id).delete(synchronize_session=False)
+        if deltas:
+            db.execute(insert(rollup), [
+                {
+                    "survey_id": s_id, "bucket": bucket, "bucket_start": start,
+                    "count": delta["count"], "score_total": delta["score_total"],
+                    "score_histogram": _merge_counts(None, delta["scores"]),
+                    "recommendations": _merge_counts(None, delta["recommendations"]),
+                }
+                for (bucket, start), delta in deltas.items()
+            ])
+        db.commit()
+        written += len(deltas)
+    return {"surveys": len(survey_ids), "rows": written}
+
+
+def get_timeseries(
+    db: Session, survey_id: int, bucket: str, start: datetime, end: datetime
+) -> List[dict]:
+    """
+    Непустые интервалы [start, end) по возрастанию; start округляется вниз
+    до начала интервала. Интервалов без ответов в ответе нет.
+    """
+    rollup = models.SurveyRollup
+    rows = (
+        db.query(rollup)
+        .filter(
+            rollup.survey_id == survey_id,
+            rollup.bucket == bucket,
+            rollup.bucket_start >= bucket_start(start, bucket),
+            rollup.bucket_start < end,
+        )
+        .order_by(rollup.bucket_start)
+    )
+    return [
+        {
+            "start": row.bucket_start,
+            "count": row.count,
+            "average_score": row.score_total / row.count if row.count else None,
+            "score_distribution": {int(k): v for k, v in json.loads(row.score_histogram).items()},
+            "recommendations": json.loads(row.recommendations),
+        }
+        for row in rows
+    ]
+
+
+def get_score_histogram(
+    db: Session, survey_id: int,
+    start: Optional[datetime] = None, end: Optional[datetime] = None,
+) -> Dict[int, int]:
+    """
+    Гистограмма total_score {балл: количество} из rollup: за всё время —
+    одна строка, за период — слияние суточных интервалов (границы
+    расширяются до целых суток).
+    """
+    rollup = models.SurveyRollup
+    query = db.query(rollup.score_histogram).filter(rollup.survey_id == survey_id)
+    if start is None and end is None:
+        query = query.filter(rollup.bucket == ALL_TIME)
+    else:
+        query = query.filter(rollup.bucket == "day")
+        if start is not None:
+            query = query.filter(rollup.bucket_start >= bucket_start(start, "day"))
+        if end is not None:
+            query = query.filter(rollup.bucket_start < end)
+    merged: Dict[int, int] = {}
+    for (histogram,) in query:
+        for value, count in json.loads(histogram).items():
+            merged[int(value)] = merged.get(int(value), 0) + count
+    return merged
@@ -0,0 +1,463 @@
+# app/analytics.py
+"""
+Потоковая статистика по ответам опроса на NumPy.
+
+Ответы читаются из survey_answers порциями (yield_per), каждая порция
+превращается в массивы и сворачивается одним bincount в гистограммы
+вопросов. Все показатели (сумма, дисперсия, min/max, точные перцентили)
+считаются из гистограмм: ответы — целые числа в узком диапазоне, поэтому
+память O(вопросов × ширина шкалы) и не зависит от числа ответов.
+Связь между вопросами: корреляции — из попарных сумм (память
+O(вопросов²)), таблица сопряжённости — GROUP BY по одной паре в базе.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, aliased
+
+from app import config, models
+
+CHUNK_SIZE = 50_000
+PERCENTILES = (10, 25, 50, 75, 90)
+# корреляции: ответов (строк survey_responses) за порцию и предел
+# элементов промежуточных матриц в одном блоке строк
+CORRELATION_CHUNK_SIZE = 10_000
+CORRELATION_BLOCK_CELLS = 1 << 22
+
+
+class QuestionStatsAccumulator:
+    """
+    Накопитель гистограмм {вопрос → значение → количество}.
+    """
+
+    def __init__(self, question_ids: Sequence[int]):
+        self.question_ids = np.array(sorted(question_ids), dtype=np.int64)
+        self.low = 0
+        self.hist = np.zeros((len(self.question_ids), 0), dtype=np.int64)
+
+    def add(self, question_ids: np.ndarray, values: np.ndarray) -> None:
+        """
+        Добавляет порцию пар (question_id, value). Пары по вопросам,
+        которых нет в опросе, пропускаются.
+        """
+        if not len(self.question_ids) or not len(values):
+            return
+        idx = np.searchsorted(self.question_ids, question_ids)
+        idx = np.minimum(idx, len(self.question_ids) - 1)
+        known = self.question_ids[idx] == question_ids
+        idx, values = idx[known], values[known]
+        if not len(values):
+            return
+
+        self._fit(int(values.min()), int(values.max()))
+        width = self.hist.shape[1]
+        flat = idx * width + (values - self.low)
+        self.hist += np.bincount(flat, minlength=self.hist.size).reshape(self.hist.shape)
+
+    def _fit(self, low: int, high: int) -> None:
+        """Расширяет гистограммы, если в порции встретились новые значения."""
+        width = self.hist.shape[1]
+        if width and self.low <= low and high < self.low + width:
+            return
+        new_low = min(low, self.low) if width else low
+        new_high = max(high, self.low + width - 1) if width else high
+        grown = np.zeros((len(self.question_ids), new_high - new_low + 1), dtype=np.int64)
+        if width:
+            shift = self.low - new_low
+            grown[:, shift:shift + width] = self.hist
+        self.hist, self.low = grown, new_low
+
+    def result(self) -> Dict[int, dict]:
+        """
+        {question_id: {average, min, max, count, distribution,
+        variance, std, p10, p25, median, p75, p90}} — только вопросы с ответами.
+        """
+        values = np.arange(self.low, self.low + self.hist.shape[1], dtype=np.int64)
+        counts = self.hist.sum(axis=1)
+        totals = self.hist @ values
+        totals_sq = self.hist @ (values * values)
+
+        result = {}
+        for row, question_id in enumerate(self.question_ids.tolist()):
+            count = int(counts[row])
+            if not count:
+                continue
+            hist = self.hist[row]
+            present = np.flatnonzero(hist)
+            mean = totals[row] / count
+            variance = max(totals_sq[row] / count - mean * mean, 0.0)
+            stats = {
+                "average": float(mean),
+                "min": int(values[present[0]]),
+                "max": int(values[present[-1]]),
+                "count": count,
+                "distribution": {int(values[i]): int(hist[i]) for i in present},
+                "variance": float(variance),
+                "std": float(np.sqrt(variance)),
+            }
+            stats.update(_percentiles(hist, values, count, PERCENTILES))
+            result[question_id] = stats
+        return result
+
+
+def _percentiles(hist: np.ndarray, values: np.ndarray, count: int,
+                 percentiles: Iterable[int]) -> Dict[str, float]:
+    """
+    Точные перцентили по гистограмме — то же, что np.percentile
+    (линейная интерполяция) по исходному массиву.
+    """
+    cum = np.cumsum(hist)
+    result = {}
+    for p in percentiles:
+        position = (count - 1) * p / 100
+        lower = int(np.floor(position))
+        upper = int(np.ceil(position))
+        lo_value = values[np.searchsorted(cum, lower, side="right")]
+        hi_value = values[np.searchsorted(cum, upper, side="right")]
+        name = "median" if p == 50 else f"p{p:g}"
+        result[name] = float(lo_value + (position - lower) * (hi_value - lo_value))
+    return result
+
+
+def compute_question_stats(db: Session, survey_id: int,
+                           start: Optional[datetime] = None, end: Optional[datetime] = None,
+                           chunk_size: int = CHUNK_SIZE) -> Dict[int, dict]:
+    """
+    Полный проход по ответам опроса порциями по chunk_size строк.
+    Учитываются только текущие вопросы опроса; start/end — период по
+    created_at ответа, [start, end).
+    """
+    question_ids = [
+        q_id for (q_id,) in db.query(models.SurveyQuestion.id)
+        .filter(models.SurveyQuestion.survey_id == survey_id)
+    ]
+    acc = QuestionStatsAccumulator(question_ids)
+
+    answer = models.SurveyAnswer
+    stmt = (
+        select(answer.question_id, answer.value)
+        .where(answer.survey_id == survey_id)
+        .execution_options(yield_per=chunk_size)
+    )
+    if start is not None or end is not None:
+        response = models.SurveyResponse
+        stmt = stmt.join(response, response.id == answer.response_id)
+        if start is not None:
+            stmt = stmt.where(response.created_at >= start)
+        if end is not None:
+            stmt = stmt.where(response.created_at < end)
+    for chunk in db.execute(stmt).partitions():
+        arr = np.array(chunk, dtype=np.int64).reshape(-1, 2)
+        acc.add(arr[:, 0], arr[:, 1])
+    return acc.result()
+
+
+# ---------- перцентили по гистограммам ----------
+def histogram_percentiles(distribution: Dict[int, int],
+                          percentiles: Iterable[float] = PERCENTILES) -> Dict[str, float]:
+    """
+    Перцентили по гистограмме {значение: количество} — ровно то же, что
+    np.percentile по исходным значениям. Время зависит от числа разных
+    значений, а не от числа ответов.
+    """
+    distribution = {k: v for k, v in distribution.items() if v}
+    if not distribution:
+        return {}
+    values = np.array(sorted(distribution), dtype=np.int64)
+    hist = np.array([distribution[v] for v in values.tolist()], dtype=np.int64)
+    return _percentiles(hist, values, int(hist.sum()), percentiles)
+
+
+def scan_score_histogram(db: Session, survey_id: int,
+                         start: Optional[datetime] = None, end: Optional[datetime] = None,
+                         chunk_size: int = CHUNK_SIZE) -> Dict[int, int]:
+    """
+    Гистограмма total_score полным проходом по survey_responses порциями:
+    память — O(разных значений), как у compute_question_stats.
+    """
+    response = models.SurveyResponse
+    stmt = (
+        select(response.total_score)
+        .where(response.survey_id == survey_id, response.total_score.isnot(None))
+        .execution_options(yield_per=chunk_size)
+    )
+    if start is not None:
+        stmt = stmt.where(response.created_at >= start)
+    if end is not None:
+        stmt = stmt.where(response.created_at < end)
+
+    histogram: Dict[int, int] = {}
+    for chunk in db.execute(stmt).partitions():
+        values, counts = np.unique(np.fromiter((r[0] for r in chunk), dtype=np.int64,
+                                               count=len(chunk)), return_counts=True)
+        for value, count in zip(values.tolist(), counts.tolist()):
+            histogram[value] = histogram.get(value, 0) + count
+    return histogram
+
+
+# ---------- связь между вопросами ----------
+class PairRanksAccumulator:
+    """
+    Первый проход Спирмена: hist[i, a, j] — сколько ответов дали значение
+    low + a на вопрос i среди тех, где отвечен и вопрос j. Из этого —
+    средние ранги значений внутри каждой пары (попарное исключение
+    пропусков). Память O(вопросов² × ширина шкалы), не больше max_cells
+    элементов (CORRELATION_MAX_RANK_CELLS).
+    """
+
+    def __init__(self, question_ids: Sequence[int], max_cells: Optional[int] = None):
+        self.question_ids = np.array(sorted(question_ids), dtype=np.int64)
+        self.max_cells = config.CORRELATION_MAX_RANK_CELLS if max_cells is None else max_cells
+        self.low = 0
+        q = len(self.question_ids)
+        self.hist = np.zeros((q, 0, q), dtype=np.int64)
+
+    def add(self, rows: np.ndarray, question_ids: np.ndarray, values: np.ndarray,
+            block_cells: int = CORRELATION_BLOCK_CELLS) -> None:
+        """
+        Добавляет порцию ответов (номер строки-ответа 0..n-1, question_id,
+        value): индикаторы (вопрос, значение) × индикаторы «отвечен вопрос»
+        — одно матричное произведение по блокам строк.
+        """
+        q = len(self.question_ids)
+        known = _known_answers(self.question_ids, rows, question_ids, values)
+        if known is None:
+            return
+        rows, idx, values = known
+        self._fit(int(values.min()), int(values.max()))
+        width = self.hist.shape[1]
+        columns = idx * width + (values - self.low)
+        n_rows = int(rows.max()) + 1
+        step = max(1, block_cells // (q * width))
+        for start in range(0, n_rows, step):
+            block = (rows >= start) & (rows < start + step)
+            size = min(step, n_rows - start)
+            onehot = np.zeros((size, q * width), dtype=np.float32)
+            onehot[rows[block] - start, columns[block]] = 1
+            answered = np.zeros((size, q), dtype=np.float32)
+            answered[rows[block] - start, idx[block]] = 1
+            # суммы 0/1 в блоке < 2**24 — во float32 точны
+            self.hist += (onehot.T @ answered).astype(np.int64).reshape(self.hist.shape)
+
+    def _fit(self, low: int, high: int) -> None:
+        """Расширяет шкалу, как QuestionStatsAccumulator._fit."""
+        width = self.hist.shape[1]
+        if width and self.low <= low and high < self.low + width:
+            return
+        new_low = min(low, self.low) if width else low
+        new_high = max(high, self.low + width - 1) if width else high
+        q = len(self.question_ids)
+        new_width = new_high - new_low + 1
+        if q * new_width * q > self.max_cells:
+            raise ValueError(
+                f"Too many questions × scale values for rank correlation "
+                f"({q} × {new_width}); use method=pearson"
+            )
+        grown = np.zeros((q, new_width, q), dtype=np.int64)
+        if width:
+            shift = self.low - new_low
+            grown[:, shift:shift + width, :] = self.hist
+        self.hist, self.low = grown, new_low
+
+
+class PairMomentsAccumulator:
+    """
+    Попарные суммы для корреляций с попарным исключением пропусков: по
+    каждой паре вопросов (i, j) — n, Σx, Σx², Σxy по ответам, где отвечены
+    оба (Σy и Σy² — те же суммы пары (j, i)). Память O(вопросов²) и не
+    зависит ни от шкалы, ни от числа ответов. Так считается Пирсон.
+
+    Спирмен — for_ranks: x — средние ранги значений внутри пары; n, Σx, Σx²
+    берутся из гистограмм первого прохода, проход по ответам добирает Σxy.
+    """
+
+    def __init__(self, question_ids: Sequence[int]):
+        self.question_ids = np.array(sorted(question_ids), dtype=np.int64)
+        q = len(self.question_ids)
+        self.n, self.sx, self.sxx, self.sxy = (np.zeros((q, q)) for _ in range(4))
+        self._ranks: Optional[np.ndarray] = None
+        self._low = 0
+
+    @classmethod
+    def for_ranks(cls, pair_ranks: PairRanksAccumulator) -> "PairMomentsAccumulator":
+        acc = cls(pair_ranks.question_ids)
+        hist = pair_ranks.hist.astype(np.float64)          # [i, a, j]
+        midranks = np.cumsum(hist, axis=1) - (hist - 1) / 2
+        acc.n = hist.sum(axis=1)
+        acc.sx = np.einsum("iaj,iaj->ij", hist, midranks)
+        acc.sxx = np.einsum("iaj,iaj,iaj->ij", hist, midranks, midranks)
+        # лишнее значение шкалы с рангом 0 — «нет ответа»: без масок в проходе
+        q, width = len(acc.question_ids), hist.shape[1]
+        acc._ranks = np.zeros((q, width + 1, q))
+        acc._ranks[:, :width] = midranks
+        acc._low = pair_ranks.low
+        return acc
+
+    def add(self, rows: np.ndarray, question_ids: np.ndarray, values: np.ndarray,
+            block_cells: int = CORRELATION_BLOCK_CELLS) -> None:
+        """
+        Добавляет порцию ответов (номер строки-ответа 0..n-1, question_id,
+        value). Порция раскладывается в плотные матрицы строк × вопросов
+        по блокам строк; для Пирсона вклад — четыре матричных произведения,
+        для Спирмена — по вопросу j: ранги всех ответов в паре с j × ранг
+        ответа на j.
+        """
+        q = len(self.question_ids)
+        known = _known_answers(self.question_ids, rows, question_ids, values)
+        if known is None:
+            return
+        rows, idx, values = known
+        n_rows = int(rows.max()) + 1
+        step = max(1, block_cells // q)
+        for start in range(0, n_rows, step):
+            block = (rows >= start) & (rows < start + step)
+            size = min(step, n_rows - start)
+            if self._ranks is None:
+                answered = np.zeros((size, q))
+                answered[rows[block] - start, idx[block]] = 1
+                x = np.zeros((size, q))
+                x[rows[block] - start, idx[block]] = values[block]
+                self.n += answered.T @ answered
+                self.sx += x.T @ answered
+                self.sxx += (x * x).T @ answered
+                self.sxy += x.T @ x
+            else:
+                self._add_rank_products(rows[block] - start, idx[block],
+                                        values[block] - self._low, size)
+
+    def _add_rank_products(self, rows: np.ndarray, idx: np.ndarray, positions: np.ndarray,
+                           size: int) -> None:
+        ranks = self._ranks                                 # [i, a, j]
+        q, width = ranks.shape[0], ranks.shape[1] - 1
+        position = np.full((size, q), width)               # width — «нет ответа», ранг 0
+        position[rows, idx] = positions
+        flat = np.arange(q) * (width + 1) + position
+        pair_scores = np.empty((size, q))
+        for j in range(q):
+            # ранг ответа на i в паре (i, j) и ранг ответа на j в паре (j, i)
+            np.take(ranks[:, :, j], flat, out=pair_scores)
+            partner_scores = ranks[j][position[:, j]]
+            self.sxy[:, j] += np.einsum("ri,ri->i", pair_scores, partner_scores)
+
+    def correlations(self) -> Dict[str, list]:
+        """
+        Матрица корреляций и число пар ответов. None — корреляция не
+        определена (меньше двух ответов или нулевая дисперсия).
+        """
+        n, sx, sxx, sxy = self.n, self.sx, self.sxx, self.sxy
+        sy, syy = sx.T, sxx.T
+        denominator = (n * sxx - sx * sx) * (n * syy - sy * sy)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r = np.clip((n * sxy - sx * sy) / np.sqrt(denominator), -1.0, 1.0)
+        # суммы целых (и полуцелых рангов) во float64 точны: нулевая дисперсия — ровно 0
+        defined = (n >= 2) & (denominator > 0)
+        return {
+            "matrix": [[float(v) if ok else None for v, ok in zip(row, mask)]
+                       for row, mask in zip(r.tolist(), defined.tolist())],
+            "pairs": n.astype(np.int64).tolist(),
+        }
+
+
+def _known_answers(question_ids: np.ndarray, rows: np.ndarray, answer_questions: np.ndarray,
+                   values: np.ndarray) -> Optional[tuple]:
+    """(rows, индекс вопроса, values) только по вопросам опроса; None — таких нет."""
+    q = len(question_ids)
+    if not q or not len(values):
+        return None
+    idx = np.minimum(np.searchsorted(question_ids, answer_questions), q - 1)
+    known = question_ids[idx] == answer_questions
+    if not known.any():
+        return None
+    return rows[known], idx[known], values[known]
+
+
+def latest_response_id(db: Session, survey_id: int) -> int:
+    """
+    Водяной знак данных опроса: ответы только добавляются, поэтому
+    максимальный id меняется с каждым новым ответом.
+    """
+    response = models.SurveyResponse
+    return db.execute(
+        select(func.max(response.id)).where(response.survey_id == survey_id)
+    ).scalar() or 0
+
+
+def iter_answer_chunks(db: Session, survey_id: int, until: Optional[int] = None,
+                       chunk_size: int = CORRELATION_CHUNK_SIZE) -> Iterator[tuple]:
+    """
+    Ответы опроса порциями по chunk_size ответов (keyset по
+    survey_responses.id, ответы порции — диапазоном первичного ключа
+    survey_answers): (номер строки в порции, question_id, value).
+    until — водяной знак: ответы новее не учитываются.
+    """
+    response, answer = models.SurveyResponse, models.SurveyAnswer
+    last = 0
+    while True:
+        stmt = (select(response.id)
+                .where(response.survey_id == survey_id, response.id > last)
+                .order_by(response.id).limit(chunk_size))
+        if until is not None:
+            stmt = stmt.where(response.id <= until)
+        ids = np.array(db.execute(stmt).scalars().all(), dtype=np.int64)
+        if not len(ids):
+            return
+        chunk = db.execute(
+            select(answer.response_id, answer.question_id, answer.value)
+            .where(answer.survey_id == survey_id,
+                   answer.response_id.between(int(ids[0]), int(ids[-1])))
+        ).all()
+        if chunk:
+            arr = np.array(chunk, dtype=np.int64).reshape(-1, 3)
+            yield np.searchsorted(ids, arr[:, 0]), arr[:, 1], arr[:, 2]
+        last = int(ids[-1])
+
+
+def compute_correlations(db: Session, survey_id: int, question_ids: Sequence[int],
+                         method: str = "pearson", until: Optional[int] = None,
+                         chunk_size: int = CORRELATION_CHUNK_SIZE) -> Dict[str, list]:
+    """
+    {"question_ids", "matrix", "pairs"} — корреляции ответов между
+    вопросами. Пирсон — один проход; Спирмен — два: ранги зависят от
+    распределения значений в каждой паре, поэтому сначала гистограммы
+    пар, потом суммы рангов. until фиксирует одни и те же ответы в обоих.
+    """
+    if method == "spearman":
+        pair_ranks = PairRanksAccumulator(question_ids)
+        for chunk in iter_answer_chunks(db, survey_id, until, chunk_size):
+            pair_ranks.add(*chunk)
+        acc = PairMomentsAccumulator.for_ranks(pair_ranks)
+        del pair_ranks
+    else:
+        acc = PairMomentsAccumulator(question_ids)
+    for chunk in iter_answer_chunks(db, survey_id, until, chunk_size):
+        acc.add(*chunk)
+    return {"question_ids": acc.question_ids.tolist(), **acc.correlations()}
+
+
+def compute_crosstab(db: Session, survey_id: int, x: int, y: int,
+                     until: Optional[int] = None) -> dict:
+    """
+    Таблица сопряжённости вопросов x (строки) и y (столбцы): GROUP BY
+    по паре значений в базе, в памяти — только встретившиеся значения.
+    """
+    x_answer, y_answer = aliased(models.SurveyAnswer), aliased(models.SurveyAnswer)
+    stmt = (
+        select(x_answer.value, y_answer.value, func.count())
+        .join(y_answer, y_answer.response_id == x_answer.response_id)
+        .where(x_answer.survey_id == survey_id, x_answer.question_id == x,
+               y_answer.question_id == y)
+        .group_by(x_answer.value, y_answer.value)
+    )
+    if until is not None:
+        stmt = stmt.where(x_answer.response_id <= until)
+    cells = db.execute(stmt).all()
+    x_values = sorted({a for a, _, _ in cells})
+    y_values = sorted({b for _, b, _ in cells})
+    rows, cols = ({v: i for i, v in enumerate(vs)} for vs in (x_values, y_values))
+    counts = [[0] * len(y_values) for _ in x_values]
+    for a, b, count in cells:
+        counts[rows[a]][cols[b]] = count
+    return {"x_values": x_values, "y_values": y_values, "counts": counts,
+            "total": sum(count for _, _, count in cells)}
@@ -0,0 +1,76 @@
+# app/backfill.py
+"""
+Перенос старых ответов из SurveyResponse.answers_raw в survey_answers.
+
+Работает «онлайн»: короткие транзакции по chunk_size строк, поэтому
+сервис продолжает принимать ответы во время переноса. Перенесённой
+строке answers_raw очищается (''), повторный запуск обрабатывает только
+непустые. Строки с неразбираемым blob'ом не трогаются: их id
+возвращаются в failed, после исправления данных их подхватит следующий
+запуск.
+"""
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app import models
+from app.logger import logger
+
+
+def backfill_answers(db: Session, chunk_size: int = 1000, max_chunks: int | None = None) -> dict:
+    """
+    Переносит ответы пачками. Возвращает {"converted": число перенесённых
+    SurveyResponse, "failed": [id строк, которые не удалось разобрать]}.
+    """
+    response = models.SurveyResponse
+    last_id = 0
+    converted_total = 0
+    failed = []
+    chunks = 0
+
+    while max_chunks is None or chunks < max_chunks:
+        rows = (
+            db.query(response.id, response.survey_id, response.answers_raw)
+            .filter(response.answers_raw != "", response.id > last_id)
+            .order_by(response.id)
+            .limit(chunk_size)
+            .all()
+        )
+        if not rows:
+            break
+
+        answer_rows = []
+        converted = []
+        for response_id, survey_id, raw in rows:
+            try:
+                answers = models.decode_answers_raw(raw)
+            except ValueError as exc:
+                logger.warning("backfill: не удалось разобрать ответы response_id=%s: %s",
+                               response_id, exc)
+                failed.append(response_id)
+                continue
+            converted.append(response_id)
+            answer_rows.extend(
+                {
+                    "response_id": response_id,
+                    "survey_id": survey_id,
+                    "question_id": question_id,
+                    "value": value,
+                }
+                for question_id, value in answers.items()
+            )
+        if answer_rows:
+            db.execute(insert(models.SurveyAnswer), answer_rows)
+        if converted:
+            # blob очищаем только у строк, чьи ответы записаны в этой же транзакции
+            db.query(response).filter(response.id.in_(converted)).update(
+                {response.answers_raw: ""}, synchronize_session=False
+            )
+        db.commit()
+
+        last_id = rows[-1][0]
+        converted_total += len(converted)
+        chunks += 1
+        logger.info("backfill: перенесено %s ответов, ошибок %s (до id=%s)",
+                    converted_total, len(failed), last_id)
+
+    return {"converted": converted_total, "failed": failed}
@@ -0,0 +1,111 @@
+# app/cache.py
+"""
+Ограниченный LRU-кэш с TTL и счётчиками попаданий/промахов/вытеснений.
+Потокобезопасен: одна короткая блокировка на операцию.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+_MISSING = object()
+
+
+class LRUTTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class VersionedCache:
+    """
+    LRU+TTL-кэш, согласованный между воркерами через счётчик версии в
+    таблице cache_versions. Записи хранятся под ключом (..., версия);
+    воркер сверяет версию не чаще раза в poll_interval и при изменении
+    сбрасывает всё разом.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float], poll_interval: float):
+        self.entries = LRUTTLCache(maxsize, ttl)
+        self.poll_interval = poll_interval
+        self.version: Optional[int] = None
+        self._checked_at = 0.0
+        self.invalidations = 0
+
+    def poll_due(self) -> bool:
+        return self.version is None or time.monotonic() - self._checked_at >= self.poll_interval
+
+    def observe_version(self, version: int) -> None:
+        """Запоминает версию из БД; если она сменилась — сбрасывает кэш."""
+        if version != self.version:
+            if self.version is not None:
+                self.invalidations += 1
+            self.entries.clear()
+            self.version = version
+        self._checked_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """Локальная инвалидация после записи в этом же процессе."""
+        self.entries.clear()
+        self.version = None
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        return dict(self.entries.stats(), version=self.version,
+                    invalidations=self.invalidations)
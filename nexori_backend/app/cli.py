@@ -0,0 +1,141 @@
+# app/cli.py
+"""
+Служебные команды. Запуск: python -m app.cli <команда> [параметры]
+"""
+import argparse
+import json
+
+from app.database import SessionLocal
+
+
+def backfill_answers(args):
+    from app.aggregates import rebuild_question_stats
+    from app.backfill import backfill_answers
+
+    db = SessionLocal()
+    try:
+        result = backfill_answers(db, chunk_size=args.chunk_size, max_chunks=args.max_chunks)
+        if result["converted"]:
+            # перенесённые ответы ещё не учтены в агрегатах
+            rebuild_question_stats(db)
+    finally:
+        db.close()
+    print(f"Перенесено ответов: {result['converted']}")
+    if result["failed"]:
+        # answers_raw у них не тронут: после исправления — повторный запуск
+        print(f"Не удалось разобрать: {len(result['failed'])}, id: "
+              + ", ".join(map(str, result["failed"][:args.show_failed])))
+        raise SystemExit(1)
+
+
+def rebuild_stats(args):
+    from app.aggregates import rebuild_question_stats
+
+    db = SessionLocal()
+    try:
+        result = rebuild_question_stats(db, survey_id=args.survey_id)
+    finally:
+        db.close()
+    print(f"Пересчитано строк: {result['rows']}, расхождений: {result['mismatched']}")
+    if args.check and result["mismatched"]:
+        raise SystemExit(1)
+
+
+def init_db(args):
+    from app.database import engine, init_db
+
+    init_db()
+    print(f"Схема БД готова: {engine.url.render_as_string(hide_password=True)}")
+
+
+def rebuild_rollups(args):
+    from app.aggregates import rebuild_rollups
+    from app.database import init_db
+
+    # индекс по (survey_id, created_at) появился вместе с rollup: create_all
+    # не добавляет индексы в существующие таблицы, init_db — добавляет
+    init_db()
+    db = SessionLocal()
+    try:
+        result = rebuild_rollups(db, survey_id=args.survey_id)
+    finally:
+        db.close()
+    print(f"Опросов: {result['surveys']}, интервалов: {result['rows']}")
+
+
+def import_responses(args):
+    from app import config, crud, importer
+    from app.survey_cache import survey_cache
+
+    fmt = args.format or ("ndjson" if ".ndjson" in args.file or ".jsonl" in args.file else "csv")
+    db = SessionLocal()
+    try:
+        survey = survey_cache.get_sync(db, args.survey_id)
+        if survey is None:
+            raise SystemExit(f"Опрос {args.survey_id} не найден")
+        if args.job_id is None:
+            job = crud.create_import_job(db, args.survey_id, fmt, args.file)
+            print(f"Задание импорта: {job.id} (для продолжения: --job-id {job.id})")
+        else:
+            job = crud.get_import_job(db, args.job_id)
+            if job is None or job.survey_id != args.survey_id:
+                raise SystemExit(f"Задание {args.job_id} для опроса {args.survey_id} не найдено")
+            job = crud.claim_import_job(db, args.job_id, config.IMPORT_LEASE_SECONDS)
+            if job is None:
+                raise SystemExit(f"Задание {args.job_id} завершено или ещё выполняется")
+            print(f"Продолжение задания {job.id} со строки {job.rows_done + 1}")
+        with open(args.file, "rb") as raw:
+            stream = importer.open_text(raw, compressed=args.file.endswith(".gz"))
+            job = importer.run_import(db, job, survey, importer.iter_records(stream, fmt),
+                                      chunk_size=args.chunk_size)
+        print(f"Импортировано: {job.imported}, отклонено: {job.rejected}, статус: {job.status}")
+        for reject in json.loads(job.rejects)[:args.show_rejects]:
+            print(f"  строка {reject['row']}: {reject['error']}")
+        if job.status != "done":
+            print(f"Ошибка: {job.error}")
+            raise SystemExit(1)
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cmd = commands.add_parser("init-db", help="Создать недостающие таблицы и индексы")
+    cmd.set_defaults(func=init_db)
+
+    cmd = commands.add_parser("backfill-answers", help="Перенести answers_raw в survey_answers")
+    cmd.add_argument("--chunk-size", type=int, default=1000)
+    cmd.add_argument("--max-chunks", type=int, default=None)
+    cmd.add_argument("--show-failed", type=int, default=20)
+    cmd.set_defaults(func=backfill_answers)
+
+    cmd = commands.add_parser("rebuild-stats", help="Пересчитать survey_question_stats с нуля")
+    cmd.add_argument("--survey-id", type=int, default=None)
+    cmd.add_argument("--check", action="store_true",
+                     help="код возврата 1, если накопленные агрегаты расходились")
+    cmd.set_defaults(func=rebuild_stats)
+
+    cmd = commands.add_parser("rebuild-rollups",
+                              help="Пересчитать почасовые и суточные rollup из ответов")
+    cmd.add_argument("--survey-id", type=int, default=None)
+    cmd.set_defaults(func=rebuild_rollups)
+
+    cmd = commands.add_parser("import-responses", help="Импортировать ответы из CSV/NDJSON (.gz)")
+    cmd.add_argument("--survey-id", type=int, required=True)
+    cmd.add_argument("--file", required=True)
+    cmd.add_argument("--format", choices=["csv", "ndjson"], default=None,
+                     help="по умолчанию — по расширению файла")
+    cmd.add_argument("--job-id", type=int, default=None,
+                     help="продолжить прерванное задание с контрольной точки")
+    cmd.add_argument("--chunk-size", type=int, default=None)
+    cmd.add_argument("--show-rejects", type=int, default=20)
+    cmd.set_defaults(func=import_responses)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
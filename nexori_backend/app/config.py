@@ -3,5 +3,109 @@ import os
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./nexori.db")
 SECRET_KEY = os.getenv("SECRET_KEY", "your_secret_key_here_change_me")
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", str(60 * 24)))
 ALGORITHM = "HS256"
+SUBMIT_BATCH_MAX = int(os.getenv("SUBMIT_BATCH_MAX", "1000"))
+
+# Групповая запись ответов (app/submit_queue.py)
+SUBMIT_QUEUE_ENABLED = os.getenv("SUBMIT_QUEUE_ENABLED", "0") == "1"
+SUBMIT_QUEUE_MAX_BATCH = int(os.getenv("SUBMIT_QUEUE_MAX_BATCH", "200"))
+SUBMIT_QUEUE_MAX_DELAY_MS = float(os.getenv("SUBMIT_QUEUE_MAX_DELAY_MS", "5"))
+SUBMIT_QUEUE_MAX_SIZE = int(os.getenv("SUBMIT_QUEUE_MAX_SIZE", "5000"))
+SUBMIT_QUEUE_TIMEOUT = float(os.getenv("SUBMIT_QUEUE_TIMEOUT", "10"))
+
+# Async-слой БД (aiosqlite/asyncpg). DB_ASYNC=0 — синхронный путь через
+# пул потоков. Для SQLite он по умолчанию: на нагрузочном тесте
+# (benchmarks/load_concurrency.py) sync дал 224 rps против 171 у aiosqlite.
+DB_ASYNC = os.getenv(
+    "DB_ASYNC", "0" if DATABASE_URL.startswith("sqlite") else "1"
+) == "1"
+
+# Пул соединений (для SQLite в памяти не используется)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+
+# Схема БД: при старте воркера (lifespan) создаются недостающие таблицы и
+# индексы. В проде — 0 и один раз `python -m app.cli init-db` при выкладке:
+# воркеры автомасштабирования не ходят в БД за DDL при каждом запуске.
+DB_CREATE_SCHEMA = os.getenv("DB_CREATE_SCHEMA", "1") == "1"
+
+# PRAGMA для каждого нового соединения SQLite
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))      # KiB, т.е. 64 МБ
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Кэш определений опросов (app/survey_cache.py)
+SURVEY_CACHE_SIZE = int(os.getenv("SURVEY_CACHE_SIZE", "1024"))
+SURVEY_CACHE_TTL = float(os.getenv("SURVEY_CACHE_TTL", "300"))
+CACHE_VERSION_POLL_INTERVAL = float(os.getenv("CACHE_VERSION_POLL_INTERVAL", "1.0"))
+
+# Кэши аутентификации (app/user_cache.py, app/dependencies.py)
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "4096"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))
+
+# Пароли (app/passwords.py): стоимость bcrypt и ограниченный пул потоков.
+# Хэши с другим числом раундов перехэшируются при следующем входе.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", "64"))
+
+# Метрики (app/metrics.py): период контрольной задачи лага event loop, с
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.25"))
+
+# Логи (app/logger.py): очередь до фонового писателя; при переполнении
+# записи отбрасываются. Проверки здоровья пишутся одна из N.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_HEALTH_SAMPLE_EVERY = int(os.getenv("LOG_HEALTH_SAMPLE_EVERY", "100"))
+
+# Наблюдение за SQL (app/querylog.py): порог медленного выражения, мс, и
+# сколько повторов одной формы выражения за HTTP-запрос считать N+1
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+
+# Импорт исторических ответов (app/importer.py): строк на транзакцию, пауза
+# между транзакциями (живые submit успевают взять блокировку записи) и
+# сколько отклонённых строк хранить в задании с текстом ошибки
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "2000"))
+IMPORT_CHUNK_PAUSE_MS = float(os.getenv("IMPORT_CHUNK_PAUSE_MS", "10"))
+IMPORT_MAX_REJECTS = int(os.getenv("IMPORT_MAX_REJECTS", "1000"))
+# аренда задания импорта: running без коммитов дольше этого — процесс импорта
+# умер, задание можно продолжить; пока аренда жива, продолжение — 409
+IMPORT_LEASE_SECONDS = float(os.getenv("IMPORT_LEASE_SECONDS", "300"))
+
+# Временные ряды аналитики (survey_rollups): предел числа интервалов
+# в одном запросе /analytics/surveys/{id}/timeseries
+TIMESERIES_MAX_BUCKETS = int(os.getenv("TIMESERIES_MAX_BUCKETS", "10000"))
+
+# Корреляции и таблицы сопряжённости (/analytics/surveys/{id}/correlations,
+# /crosstab): сколько готовых результатов держать в кэше. Ключ — версия
+# опросов и последний id ответа, так что TTL только освобождает память
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "64"))
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "3600"))
+# Спирмен держит гистограммы и ранги пар: вопросов² × ширина шкалы
+# элементов, по 8 байт, несколько копий на время расчёта. Больше — 422 с
+# предложением method=pearson (у него память O(вопросов²))
+CORRELATION_MAX_RANK_CELLS = int(os.getenv("CORRELATION_MAX_RANK_CELLS", str(5_000_000)))
+
+# Модель категорий (app/ml): файл модели JSON (пусто — встроенная
+# app/ml/default_model.json), предел пакета /predict/batch и
+# предсказание в ответе submit
+ML_MODEL_PATH = os.getenv("ML_MODEL_PATH", "")
+PREDICT_BATCH_MAX = int(os.getenv("PREDICT_BATCH_MAX", "100000"))
+ML_PREDICT_ON_SUBMIT = os.getenv("ML_PREDICT_ON_SUBMIT", "0") == "1"
+
+# Микро-батчинг предсказаний (app/ml/batcher.py): размер пачки, сколько
+# ждать добора с первого запроса, предел ожидающих и таймаут запроса, с
+ML_BATCH_ENABLED = os.getenv("ML_BATCH_ENABLED", "1") == "1"
+ML_BATCH_MAX_SIZE = int(os.getenv("ML_BATCH_MAX_SIZE", "256"))
+ML_BATCH_MAX_WAIT_MS = float(os.getenv("ML_BATCH_MAX_WAIT_MS", "2"))
+ML_BATCH_MAX_PENDING = int(os.getenv("ML_BATCH_MAX_PENDING", "10000"))
+ML_PREDICT_TIMEOUT = float(os.getenv("ML_PREDICT_TIMEOUT", "1"))
@@ -1,11 +1,13 @@
 # app/crud.py
 
-from typing import List, Dict, Optional
-from datetime import datetime
+from typing import List, Optional, Tuple
+from datetime import datetime, timedelta
 
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.orm import Session, selectinload
 
-from app import models, schemas
+from app import aggregates, models, schemas
+from app.database import insert_missing
 
 
 # --------------------------------------------
@@ -26,10 +28,8 @@ def create_user(db: Session, user_in: schemas.UserCreate, hashed_password: str)
     db_user = models.User(
         username=user_in.username,
         email=user_in.email,
-        full_name=user_in.full_name,
-        hashed_password=hashed_password,
+        password=hashed_password,
         role="user",       # по умолчанию роль = user
-        is_active=1
     )
     db.add(db_user)
     db.commit()
@@ -46,11 +46,21 @@ def authenticate_user(db: Session, username: str, password: str, verify_fn) -> O
     user = get_user_by_username(db, username)
     if not user:
         return None
-    if not verify_fn(password, user.hashed_password):
+    if not verify_fn(password, user.password):
         return None
     return user
 
 
+def update_user_password(db: Session, user_id: int, hashed_password: str) -> None:
+    """
+    Подменяет хэш пароля (перехэширование с новыми параметрами при входе).
+    """
+    db.query(models.User).filter(models.User.id == user_id).update(
+        {models.User.password: hashed_password}, synchronize_session=False
+    )
+    db.commit()
+
+
 def update_user_role(db: Session, user_id: int, new_role: str) -> Optional[models.User]:
     """
     Изменяет роль пользователя (только админ).
@@ -59,6 +69,9 @@ def update_user_role(db: Session, user_id: int, new_role: str) -> Optional[model
     if not user:
         return None
     user.role = new_role
+    # роль в токене не перечитывается; кэши пользователей всех воркеров
+    # сбрасываются по версии
+    bump_cache_version(db, "users")
     db.commit()
     db.refresh(user)
     return user
@@ -67,49 +80,86 @@ def update_user_role(db: Session, user_id: int, new_role: str) -> Optional[model
 # --------------------------------------------
 #  CRUD для Survey (опрос)
 # --------------------------------------------
-def get_all_surveys(db: Session) -> List[models.Survey]:
-    return db.query(models.Survey).all()
+# Опрос почти всегда нужен вместе с вопросами и диапазонами, а в async-
+# режиме ленивой догрузки после выхода из сессии нет — грузим их явно.
+SURVEY_FULL = (selectinload(models.Survey.questions), selectinload(models.Survey.ranges))
+
+
+def get_surveys_page(
+    db: Session,
+    limit: int,
+    after: Optional[Tuple[datetime, int]] = None,
+    with_questions: bool = True,
+) -> List[models.Survey]:
+    """
+    Страница каталога по ключу (created_at, id) — без OFFSET, по индексу.
+    Возвращает до limit + 1 опросов: лишний означает, что есть следующая
+    страница. Вопросы грузятся одним selectinload на страницу.
+    """
+    survey = models.Survey
+    query = db.query(survey)
+    if with_questions:
+        query = query.options(selectinload(survey.questions))
+    if after is not None:
+        created_at, survey_id = after
+        query = query.filter(or_(
+            survey.created_at > created_at,
+            and_(survey.created_at == created_at, survey.id > survey_id),
+        ))
+    return query.order_by(survey.created_at, survey.id).limit(limit + 1).all()
+
+
+def count_surveys(db: Session) -> int:
+    return db.query(func.count(models.Survey.id)).scalar()
 
 
 def get_survey(db: Session, survey_id: int) -> Optional[models.Survey]:
     return db.query(models.Survey).filter(models.Survey.id == survey_id).first()
 
 
+def get_survey_full(db: Session, survey_id: int) -> Optional[models.Survey]:
+    """
+    Опрос с вопросами и диапазонами (selectinload, без ленивых запросов).
+    """
+    return (
+        db.query(models.Survey)
+        .options(*SURVEY_FULL)
+        .filter(models.Survey.id == survey_id)
+        .populate_existing()
+        .first()
+    )
+
+
 def create_survey(db: Session, survey_in: schemas.SurveyCreate) -> models.Survey:
     """
-    Создаёт новый опрос + связанные вопросы. Возвращает сохранённый Survey.
+    Создаёт новый опрос + связанные вопросы и диапазоны.
+    Возвращает сохранённый Survey с загруженными связями.
     """
-    # 1) Сначала создаём сам опрос
     db_survey = models.Survey(
         title=survey_in.title,
         description=survey_in.description,
-        created_at=datetime.utcnow()
+        created_at=datetime.utcnow(),
+        questions=[
+            models.SurveyQuestion(**q.model_dump()) for q in survey_in.questions
+        ],
+        ranges=[
+            models.SurveyResultRange(**r.model_dump()) for r in survey_in.ranges
+        ],
     )
     db.add(db_survey)
-    db.flush()  # синхронизируем, чтобы появился db_survey.id
-
-    # 2) Создаём каждый вопрос
-    for q in survey_in.questions:
-        db_question = models.SurveyQuestion(
-            text=q.text,
-            min_value=q.min_value,
-            max_value=q.max_value,
-            survey_id=db_survey.id
-        )
-        db.add(db_question)
-
+    bump_cache_version(db, "surveys")
     db.commit()
-    db.refresh(db_survey)
-    return db_survey
+    return get_survey_full(db, db_survey.id)
 
 
 def update_survey(
     db: Session, survey_id: int, survey_data: schemas.SurveyUpdate
 ) -> Optional[models.Survey]:
     """
-    Обновляет поля опроса и/или перезаписывает вопросы.
+    Обновляет поля опроса и/или перезаписывает вопросы и диапазоны.
+    Агрегаты удалённых вопросов удаляются в той же транзакции.
     """
-    db_survey = get_survey(db, survey_id)
+    db_survey = get_survey_full(db, survey_id)
     if not db_survey:
         return None
 
@@ -119,35 +169,42 @@ def update_survey(
     if survey_data.description is not None:
         db_survey.description = survey_data.description
 
-    # Если пришли новые вопросы — удалить старые и добавить новые
+    # Если пришли новые вопросы/диапазоны — заменяем старые
     if survey_data.questions is not None:
-        # Удаляем все связанные questions
-        db.query(models.SurveyQuestion).filter(
-            models.SurveyQuestion.survey_id == survey_id
-        ).delete()
-        # Добавляем новые
-        for q in survey_data.questions:
-            db_question = models.SurveyQuestion(
-                text=q.text,
-                min_value=q.min_value,
-                max_value=q.max_value,
-                survey_id=survey_id
-            )
-            db.add(db_question)
+        db_survey.questions.clear()
+        db_survey.questions.extend(
+            models.SurveyQuestion(**q.model_dump()) for q in survey_data.questions
+        )
+    if survey_data.ranges is not None:
+        db_survey.ranges.clear()
+        db_survey.ranges.extend(
+            models.SurveyResultRange(**r.model_dump()) for r in survey_data.ranges
+        )
 
+    if survey_data.questions is not None:
+        db.flush()  # нужны id новых вопросов
+        aggregates.drop_stale_stats(db, survey_id, [q.id for q in db_survey.questions])
+
+    bump_cache_version(db, "surveys")
     db.commit()
-    db.refresh(db_survey)
-    return db_survey
+    return get_survey_full(db, survey_id)
 
 
 def delete_survey(db: Session, survey_id: int) -> bool:
     """
-    Удаляет опрос и все его вопросы. Возвращает True, если удалено, False, если не найден.
+    Удаляет опрос со всеми вопросами и ответами. Возвращает True, если удалено, False, если не найден.
     """
     db_survey = get_survey(db, survey_id)
     if not db_survey:
         return False
+    # ответы и агрегаты удаляем пачкой: ORM-каскад грузил бы их построчно
+    for model in (models.SurveyAnswer, models.SurveyQuestionStats, models.SurveyRollup,
+                  models.SurveyResponse):
+        db.query(model).filter(model.survey_id == survey_id).delete(
+            synchronize_session=False
+        )
     db.delete(db_survey)
+    bump_cache_version(db, "surveys")
     db.commit()
     return True
 
@@ -155,35 +212,6 @@ def delete_survey(db: Session, survey_id: int) -> bool:
 # --------------------------------------------
 #  CRUD для SurveyResponse (ответы респондента)
 # --------------------------------------------
-def create_survey_response(
-    db: Session,
-    survey_id: int,
-    respondent_name: str,
-    answer_dict: Dict[int, int],
-    total_score: int,
-    recommendation: str
-) -> models.SurveyResponse:
-    """
-    Сохраняет результаты ответа пользователя на опрос.
-    - answer_dict: словарь {question_id: answer_value}.
-    - total_score: сумма всех answer_value.
-    - recommendation: строка-совет.
-    """
-    db_response = models.SurveyResponse(
-        respondent_name=respondent_name,
-        answers=str(answer_dict),  # сохраняем словарь как строку
-        total_score=total_score,
-        recommendation=recommendation,
-        created_at=datetime.utcnow(),
-        user_id=None,             # при необходимости можно добавить связь с user
-        survey_id=survey_id
-    )
-    db.add(db_response)
-    db.commit()
-    db.refresh(db_response)
-    return db_response
-
-
 def get_responses_for_survey(db: Session, survey_id: int) -> List[models.SurveyResponse]:
     """
     Возвращает список всех SurveyResponse по данному survey_id.
@@ -202,6 +230,79 @@ def get_response_by_id(db: Session, response_id: int) -> Optional[models.SurveyR
     ).first()
 
 
+# --------------------------------------------
+#  Версии кэшей (межпроцессная инвалидация)
+# --------------------------------------------
+def get_cache_version(db: Session, name: str) -> int:
+    version = db.query(models.CacheVersion.version).filter(
+        models.CacheVersion.name == name
+    ).scalar()
+    return version or 0
+
+
+def bump_cache_version(db: Session, name: str) -> None:
+    """
+    Увеличивает версию в текущей транзакции: другие воркеры увидят её
+    после commit и сбросят свои кэши. Строка счётчика создаётся
+    INSERT … ON CONFLICT DO NOTHING: первые записи из двух воркеров
+    не сталкиваются по ключу.
+    """
+    insert_missing(db, models.CacheVersion, [{"name": name, "version": 0}])
+    db.execute(
+        update(models.CacheVersion)
+        .where(models.CacheVersion.name == name)
+        .values(version=models.CacheVersion.version + 1)
+    )
+
+
+# --------------------------------------------
+#  Импорт ответов
+# --------------------------------------------
+def create_import_job(
+    db: Session, survey_id: int, fmt: str, source: Optional[str] = None
+) -> models.ImportJob:
+    job = models.ImportJob(survey_id=survey_id, format=fmt, source=source)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_import_job(db: Session, job_id: int) -> Optional[models.ImportJob]:
+    return db.get(models.ImportJob, job_id)
+
+
+def claim_import_job(
+    db: Session, job_id: int, lease_seconds: float
+) -> Optional[models.ImportJob]:
+    """
+    Атомарно забирает задание для продолжения: условный UPDATE проходит,
+    только если задание упало (failed) или его аренда истекла — running без
+    коммитов дольше lease_seconds. Каждый commit пачки импорта продлевает
+    аренду (updated_at). None — задание завершено или его сейчас ведёт
+    другой запрос.
+    """
+    jobs = models.ImportJob
+    now = datetime.utcnow()
+    claimed = db.execute(
+        update(jobs)
+        .where(
+            jobs.id == job_id,
+            or_(
+                jobs.status == "failed",
+                and_(jobs.status == "running",
+                     jobs.updated_at < now - timedelta(seconds=lease_seconds)),
+            ),
+        )
+        .values(status="running", error=None, updated_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    if not claimed:
+        return None
+    return db.get(jobs, job_id, populate_existing=True)
+
+
 # --------------------------------------------
 #  Здесь можно добавить любые вспомогательные функции,
 #  необходимые для других роутов или аналитики.
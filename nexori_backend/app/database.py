@@ -1,11 +1,235 @@
-from sqlalchemy import create_engine
+import time
+from typing import List, Optional
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./nexori.db"
+from app import config, metrics
+from app.querylog import install_statement_hooks
+
+SQLALCHEMY_DATABASE_URL = config.DATABASE_URL
+
+# синхронный драйвер → async-драйвер для того же URL
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def to_async_url(url: str) -> str:
+    scheme, rest = url.split("://", 1)
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}://{rest}"
+
+
+def sqlite_pragmas() -> dict:
+    """PRAGMA, которые выставляются на каждом новом соединении SQLite."""
+    return {
+        "journal_mode": config.SQLITE_JOURNAL_MODE,
+        "synchronous": config.SQLITE_SYNCHRONOUS,
+        "busy_timeout": config.SQLITE_BUSY_TIMEOUT_MS,
+        "cache_size": config.SQLITE_CACHE_SIZE,
+        "mmap_size": config.SQLITE_MMAP_SIZE,
+        "temp_store": "MEMORY",
+        "foreign_keys": "ON",
+    }
+
+
+def _is_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def _engine_options(url) -> dict:
+    """
+    Настройки пула из config. SQLite в памяти живёт в одном соединении,
+    пул для неё не настраиваем.
+    """
+    options = {"pool_pre_ping": config.DB_POOL_PRE_PING}
+    if url.get_backend_name() == "sqlite":
+        if not url.drivername.endswith("aiosqlite"):
+            options["connect_args"] = {"check_same_thread": False}
+        if _is_memory_sqlite(url):
+            return options
+    is_async = url.get_dialect().is_async
+    options.update(
+        poolclass=TimedAsyncQueuePool if is_async else TimedQueuePool,
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+        pool_recycle=config.DB_POOL_RECYCLE,
+    )
+    return options
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+
+def _install_sqlite_pragmas(sync_engine: Engine) -> None:
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(sync_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+POOL_WAIT_SECONDS = metrics.histogram(
+    "db_pool_checkout_wait_seconds", "Ожидание соединения из пула", ("engine",),
 )
+
+
+# ---------- пул с замером ожидания ----------
+class _TimedCheckout:
+    """Примесь к классу пула: сколько ждали соединения в connect()."""
+    metric_label = "sync"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_WAIT_SECONDS.labels(self.metric_label).observe(time.perf_counter() - started)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    metric_label = "sync"
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    metric_label = "async"
+
+
+def create_db_engine(url: str = SQLALCHEMY_DATABASE_URL):
+    """Синхронный движок с настройками пула и PRAGMA из config."""
+    parsed = make_url(url)
+    db_engine = create_engine(parsed, **_engine_options(parsed))
+    if parsed.get_backend_name() == "sqlite":
+        _install_sqlite_pragmas(db_engine)
+    install_statement_hooks(db_engine, "sync")
+    return db_engine
+
+
+def create_async_db_engine(url: str = SQLALCHEMY_DATABASE_URL):
+    """Async-движок для того же URL, с теми же настройками."""
+    parsed = make_url(to_async_url(url))
+    db_engine = create_async_engine(parsed, **_engine_options(parsed))
+    if parsed.get_backend_name() == "sqlite":
+        _install_sqlite_pragmas(db_engine.sync_engine)
+    install_statement_hooks(db_engine.sync_engine, "async")
+    return db_engine
+
+
+def engine_settings(db_engine: Engine, read_pragmas: bool = True) -> dict:
+    """
+    Фактические настройки движка: пул и, для SQLite, значения PRAGMA,
+    прочитанные из живого соединения (только для синхронного движка).
+    """
+    pool = db_engine.pool
+    settings = {
+        "url": db_engine.url.render_as_string(hide_password=True),
+        "dialect": db_engine.dialect.name,
+        "driver": db_engine.driver,
+        "pool": {
+            "class": type(pool).__name__,
+            "size": pool.size() if hasattr(pool, "size") else None,
+            "max_overflow": getattr(pool, "_max_overflow", None),
+            "timeout": pool.timeout() if hasattr(pool, "timeout") else None,
+            "recycle": getattr(pool, "_recycle", None),
+            "pre_ping": getattr(pool, "_pre_ping", None),
+            "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+        },
+    }
+    if read_pragmas and db_engine.dialect.name == "sqlite":
+        with db_engine.connect() as conn:
+            settings["sqlite_pragmas"] = {
+                name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+                for name in sqlite_pragmas()
+            }
+    return settings
+
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async-движок: обработчики не занимают поток пула на время запроса к БД.
+# expire_on_commit=False — после commit объекты отдаются в сериализацию,
+# а ленивая догрузка вне сессии в async невозможна.
+async_engine = create_async_db_engine()
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
+
+
+def init_db(db_engine: Optional[Engine] = None) -> None:
+    """
+    Создаёт недостающие таблицы и индексы. Существующие не трогает:
+    create_all не добавляет новые индексы в уже созданные таблицы, поэтому
+    индексы — отдельно, с checkfirst. Вызывается из lifespan
+    (DB_CREATE_SCHEMA=1) или командой `python -m app.cli init-db`, но не
+    при импорте приложения.
+    """
+    from app import models  # noqa: F401 — регистрирует таблицы в Base.metadata
+
+    db_engine = db_engine or engine
+    Base.metadata.create_all(bind=db_engine)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db_engine, checkfirst=True)
+
+
+def insert_missing(db, table, rows: List[dict]) -> None:
+    """
+    Вставляет строки, которых ещё нет (по первичному ключу); существующие
+    не трогает и ошибки на них не даёт: ON CONFLICT DO NOTHING (SQLite,
+    PostgreSQL), INSERT IGNORE (MySQL), на прочих — построчно в SAVEPOINT.
+
+    Для счётчиков: «создать, если нет» и затем SELECT … FOR UPDATE —
+    блокировка берётся только на существующую строку, а два первых
+    писателя одного ключа иначе оба делали бы INSERT, и второй падал бы.
+    """
+    if not rows:
+        return
+    table = getattr(table, "__table__", table)
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(table).on_conflict_do_nothing()
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table).on_conflict_do_nothing()
+    elif dialect in ("mysql", "mariadb"):
+        stmt = insert(table).prefix_with("IGNORE")
+    else:
+        for row in rows:
+            try:
+                with db.begin_nested():
+                    db.execute(insert(table), [row])
+            except IntegrityError:
+                pass
+        return
+    db.execute(stmt, rows)
+
+
+def _pool_stats() -> dict:
+    """(engine, state) → число соединений; для пулов без размера — ничего."""
+    values = {}
+    for label, pool in (("sync", engine.pool), ("async", async_engine.sync_engine.pool)):
+        if not isinstance(pool, QueuePool):
+            continue
+        values[(label, "size")] = pool.size()
+        values[(label, "checked_out")] = pool.checkedout()
+        values[(label, "checked_in")] = pool.checkedin()
+        values[(label, "overflow")] = max(pool.overflow(), 0)
+    return values
+
+
+metrics.callback(
+    "db_pool_connections", "Соединения пула по состояниям", "gauge", ("engine", "state"), _pool_stats,
+)
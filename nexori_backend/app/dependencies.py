@@ -1,14 +1,24 @@
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, TypeVar, Union
+
 from fastapi import Depends, HTTPException, status
-from jose import JWTError, jwt
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
-from app.database import SessionLocal
-from app import models, schemas
+from app.cache import LRUTTLCache
+from app.config import (
+    ACCESS_TOKEN_EXPIRE_MINUTES, ALGORITHM, DB_ASYNC, SECRET_KEY,
+    TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL,
+)
+from app.database import AsyncSessionLocal, SessionLocal
+from app.user_cache import Principal, user_cache
+from app import crud, metrics, models
 
-# -- JWT конфиг --
-SECRET_KEY     = "super-secret-key"   # вынесите в .env
-ALGORITHM      = "HS256"
-ACCESS_MINUTES = 60 * 24
+T = TypeVar("T")
+DbSession = Union[AsyncSession, Session]
 
 def get_db():
     db = SessionLocal()
@@ -17,31 +27,159 @@ def get_db():
     finally:
         db.close()
 
+
+@asynccontextmanager
+async def session_scope():
+    """
+    Сессия для async-кода: AsyncSession или, при DB_ASYNC=0,
+    обычная Session. Работать с ней нужно через run_db.
+    """
+    if not DB_ASYNC:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()  # соединение уже вернул run_db, закрытие без I/O
+        return
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_session():
+    async with session_scope() as db:
+        yield db
+
+
+async def run_db(db: DbSession, fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Выполняет синхронную функцию fn(session, *args) над сессией запроса.
+    AsyncSession — через run_sync (I/O идёт через async-драйвер, поток
+    не занимается), обычная Session — в пуле потоков.
+
+    Каждый вызов — отдельная единица работы: после fn сессия закрывается
+    и соединение сразу возвращается в пул, а не держится до конца
+    запроса. Поэтому всё, что fn возвращает наружу, должно быть загружено
+    явно (selectinload): ленивой догрузки потом нет.
+    """
+    if isinstance(db, AsyncSession):
+        try:
+            return await db.run_sync(fn, *args, **kwargs)
+        finally:
+            await db.close()
+
+    def call():
+        try:
+            return fn(db, *args, **kwargs)
+        finally:
+            db.close()
+    return await run_in_threadpool(call)
+
+
+async def run_in_session(fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Для тяжёлых по CPU задач (потоковая аналитика): отдельная
+    синхронная сессия в пуле потоков, чтобы не держать event loop.
+    """
+    def call():
+        db = SessionLocal()
+        try:
+            return fn(db, *args, **kwargs)
+        finally:
+            db.close()
+    return await run_in_threadpool(call)
+
 # ---------- auth helpers ----------
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
+
+# Проверенные токены: клиент шлёт один и тот же токен до истечения,
+# повторная проверка подписи и разбор claims не нужны.
+token_cache = LRUTTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+metrics.register_cache("tokens", token_cache)
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_MINUTES))
+    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
+    from jose import jwt     # ~25 мс импорта (jwk, asn1): не при старте воркера
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_user(
-    token: str = Depends(lambda: schemas.OAuth2PasswordRequestForm(token_url="token").token),
-    db: Session = Depends(get_db),
-):
-    credentials_exc = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+
+def user_token(user: models.User) -> str:
+    """Токен с id и ролью в claims: принципал строится без запроса к БД."""
+    return create_access_token({"sub": user.username, "uid": user.id, "role": user.role})
+
+
+def decode_token(token: str) -> Principal | str | None:
+    """
+    Principal из claims; для старых токенов без uid/role — username
+    (его придётся дочитать из БД); None — если токен невалиден.
+    """
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str | None = payload.get("sub")
-        if username is None:
-            raise credentials_exc
     except JWTError:
-        raise credentials_exc
+        return None
+    username = payload.get("sub")
+    if username is None:
+        return None
+    uid, role = payload.get("uid"), payload.get("role")
+    claims = username if uid is None or role is None else Principal(uid, username, role)
+    # дольше срока жизни токена держать нельзя: истёкший должен получить 401
+    ttl = min(payload["exp"] - time.time(), TOKEN_CACHE_TTL) if "exp" in payload else TOKEN_CACHE_TTL
+    if ttl > 0:
+        token_cache.set(token, claims, ttl=ttl)
+    return claims
+
+
+def legacy_principal(db: Session, username: str) -> Principal | None:
+    user = crud.get_user_by_username(db, username)
+    return Principal(user.id, user.username, user.role) if user else None
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
+    """
+    Принципал запроса из claims токена — без обращения к БД. Сессия
+    запрашивается только для старых токенов без uid/role.
+    """
+    claims = token_cache.get(token)
+    if claims is None:
+        claims = decode_token(token)
+    if claims is None:
+        raise credentials_exception()
+    if isinstance(claims, Principal):
+        return claims
+    async with session_scope() as db:
+        principal = await run_db(db, legacy_principal, claims)
+    if principal is None:
+        raise credentials_exception()
+    return principal
 
-    user = db.query(models.User).filter(models.User.username == username).first()
-    if user is None:
-        raise credentials_exc
+
+async def get_user_row(db: DbSession, user_id: int) -> Principal | None:
+    """Актуальные данные пользователя через кэш (роль могла смениться после выдачи токена)."""
+    principal = user_cache.peek(user_id)
+    if principal is None:
+        principal = await run_db(db, user_cache.load, user_id)
+    return principal
+
+
+async def admin_required(
+    principal: Principal = Depends(get_current_user),
+    db: DbSession = Depends(get_session),
+) -> Principal:
+    """Только администраторы: админка и аналитика по ответам."""
+    # роль в токене могла устареть: сверяемся с кэшем пользователей
+    user = await get_user_row(db, principal.id) if principal.role == "admin" else None
+    if user is None or user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admins only")
     return user
+
+
+def credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
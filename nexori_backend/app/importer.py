@@ -0,0 +1,199 @@
+# app/importer.py
+"""
+Импорт исторических ответов (бумажные анкеты, старые системы) из CSV/NDJSON.
+
+Формат строк — как у выгрузки (app/export.py): respondent_name,
+created_at (ISO 8601, необязательно) и колонки q_<question_id>; в NDJSON
+ответы можно передать и объектом answers {question_id: value}. Прочие
+колонки выгрузки (id, user_id, total_score, recommendation) игнорируются:
+сумма и рекомендация пересчитываются по текущему плану опроса.
+
+Строки проверяются и оцениваются пачками (ScoringPlan.prepare_many) и
+пишутся executemany по IMPORT_CHUNK_SIZE в отдельных транзакциях; в той
+же транзакции сдвигается контрольная точка ImportJob.rows_done. Поэтому:
+- повторный запуск с тем же заданием пропускает уже записанные строки
+  источника и не создаёт дублей;
+- между транзакциями блокировка записи отпускается, и живые submit ждут
+  не дольше одной пачки.
+"""
+import csv
+import gzip
+import io
+import json
+import time
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from typing import IO, Iterator, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app import config, metrics, models, submissions
+from app.logger import logger
+from app.submissions import SubmissionError
+
+IMPORT_ROWS = metrics.counter("import_rows_total", "Строки импорта ответов", ("result",))
+
+
+class ImportAnswer(NamedTuple):
+    question_id: int
+    answer_value: int
+
+
+class ImportRow(NamedTuple):
+    # те же поля, что читает ScoringPlan.prepare_many у SurveySubmit
+    respondent_name: str
+    answers: List[ImportAnswer]
+    created_at: Optional[datetime]
+
+
+# ---------- чтение источника ----------
+def open_text(raw: IO[bytes], compressed: bool = False) -> IO[str]:
+    """Бинарный поток (файл, спул загрузки) → текст; gzip распаковывается на лету."""
+    if compressed:
+        raw = gzip.GzipFile(fileobj=raw, mode="rb")
+    # utf-8-sig: CSV из Excel начинается с BOM
+    return io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+
+
+def iter_records(stream: IO[str], fmt: str) -> Iterator[dict]:
+    """Записи источника по одной; пустые строки NDJSON пропускаются."""
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                yield SubmissionError(f"Invalid JSON: {exc}")
+                continue
+            yield record if isinstance(record, dict) else SubmissionError("Expected a JSON object")
+
+
+@lru_cache(maxsize=1024)
+def _question_column(key) -> Optional[int]:
+    """q_<id> → id; колонки повторяются в каждой строке, разбор кэшируется."""
+    if isinstance(key, str) and key.startswith("q_") and key[2:].isdigit():
+        return int(key[2:])
+    return None
+
+
+def parse_record(record) -> ImportRow:
+    if isinstance(record, SubmissionError):
+        raise record
+    name = record.get("respondent_name")
+    if not isinstance(name, str) or not name.strip():
+        raise SubmissionError("respondent_name is required")
+
+    created_at = record.get("created_at") or None
+    if created_at is not None:
+        try:
+            created_at = datetime.fromisoformat(created_at)
+        except (TypeError, ValueError):
+            raise SubmissionError(f"Invalid created_at {created_at!r}")
+        created_at = models.utc_naive(created_at)
+
+    answers = []
+    try:
+        for key, value in record.items():
+            question_id = _question_column(key)
+            if question_id is not None and value not in (None, ""):
+                answers.append(ImportAnswer(question_id, int(value)))
+        for key, value in (record.get("answers") or {}).items():
+            answers.append(ImportAnswer(int(key), int(value)))
+    except (AttributeError, TypeError, ValueError):
+        raise SubmissionError("Answers must be integers keyed by question id")
+    return ImportRow(name, answers, created_at)
+
+
+# ---------- запись ----------
+def run_import(
+    db: Session,
+    job: models.ImportJob,
+    survey,
+    records: Iterator,
+    chunk_size: Optional[int] = None,
+    pause: Optional[float] = None,
+) -> models.ImportJob:
+    """
+    Импортирует записи в опрос survey (SurveySnapshot) начиная с контрольной
+    точки задания. Ошибка посреди импорта оставляет задание в статусе failed
+    с уже закоммиченными пачками — его можно продолжить тем же источником.
+    """
+    chunk_size = chunk_size or config.IMPORT_CHUNK_SIZE
+    pause = config.IMPORT_CHUNK_PAUSE_MS / 1000 if pause is None else pause
+    plan, question_ids = survey.plan, survey.question_ids
+    rejects = json.loads(job.rejects or "[]")
+    numbered = islice(enumerate(records, 1), job.rows_done, None)
+    started = time.perf_counter()
+
+    job.status, job.error = "running", None
+    db.commit()
+    try:
+        while True:
+            chunk = list(islice(numbered, chunk_size))
+            if not chunk:
+                break
+            rows, errors = _parse_chunk(chunk)
+            prepared = []
+            for (number, row), item in zip(rows, plan.prepare_many([r for _, r in rows])):
+                if isinstance(item, SubmissionError):
+                    errors.append((number, str(item)))
+                else:
+                    item.created_at = row.created_at
+                    prepared.append(item)
+            submissions.insert_submissions(db, survey.id, question_ids, prepared)
+
+            errors.sort()
+            rejects.extend({"row": n, "error": e}
+                           for n, e in errors[:config.IMPORT_MAX_REJECTS - len(rejects)])
+            job.rows_done = chunk[-1][0]
+            job.imported += len(prepared)
+            job.rejected += len(errors)
+            job.rejects = json.dumps(rejects, ensure_ascii=False)
+            db.commit()
+            IMPORT_ROWS.labels("imported").inc(len(prepared))
+            IMPORT_ROWS.labels("rejected").inc(len(errors))
+            if pause:
+                time.sleep(pause)
+    except Exception as exc:
+        db.rollback()
+        job.status, job.error = "failed", f"{type(exc).__name__}: {exc}"
+        db.commit()
+        logger.exception("import failed", extra={"job_id": job.id, "rows_done": job.rows_done})
+        return job
+
+    job.status = "done"
+    db.commit()
+    logger.info("import finished", extra={
+        "job_id": job.id, "survey_id": survey.id, "imported": job.imported,
+        "rejected": job.rejected, "duration_s": round(time.perf_counter() - started, 2),
+    })
+    return job
+
+
+def _parse_chunk(chunk) -> Tuple[List[Tuple[int, ImportRow]], List[Tuple[int, str]]]:
+    rows, errors = [], []
+    for number, record in chunk:
+        try:
+            rows.append((number, parse_record(record)))
+        except SubmissionError as exc:
+            errors.append((number, str(exc)))
+    return rows, errors
+
+
+def import_file(job_id: int, survey, raw: IO[bytes], fmt: str, compressed: bool = False) -> None:
+    """
+    Фоновая задача эндпоинта импорта: своя сессия (сессия запроса к этому
+    времени закрыта), источник — спул загрузки, который здесь и закрывается.
+    """
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        job = db.get(models.ImportJob, job_id)
+        run_import(db, job, survey, iter_records(open_text(raw, compressed), fmt))
+    finally:
+        db.close()
+        raw.close()
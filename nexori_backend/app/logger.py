@@ -1,16 +1,99 @@
 # app/logger.py
+"""
+Логи без задержек на пути запроса.
+
+Обработчики запросов только кладут запись в ограниченную очередь
+(QueueHandler); в stdout пишет фоновый поток QueueListener. Если сток
+не успевает и очередь полна, запись отбрасывается и считается в
+log_records_dropped_total — запрос не ждёт никогда.
+
+Формат — одна JSON-строка на запись; поля из extra= попадают в неё как
+есть. Частые однотипные события (проверки здоровья) прореживаются:
+extra={"sample_every": N} оставляет одну запись из N.
+"""
+import atexit
+import json
 import logging
+import queue
+import sys
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
 
-logger = logging.getLogger("nexori")
-logger.setLevel(logging.INFO)
+from app import config, metrics
+
+DROPPED = metrics.counter("log_records_dropped_total", "Записи лога, отброшенные из-за полной очереди")
+SAMPLED_OUT = metrics.counter("log_records_sampled_out_total", "Записи лога, отброшенные сэмплированием")
+
+# атрибуты LogRecord, которые не относятся к extra=
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName", "sample_every"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(
+            (key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRS
+        )
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает одну из sample_every записей с тем же (logger, msg)."""
 
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    def __init__(self):
+        super().__init__()
+        self._seen = defaultdict(int)
+        self._lock = threading.Lock()
 
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(formatter)
-logger.addHandler(console_handler)
+    def filter(self, record: logging.LogRecord) -> bool:
+        every = getattr(record, "sample_every", 1)
+        if every <= 1:
+            return True
+        with self._lock:
+            seen = self._seen[(record.name, record.msg)]
+            self._seen[(record.name, record.msg)] = seen + 1
+        if seen % every:
+            SAMPLED_OUT.inc()
+            return False
+        record.sampled = every
+        return True
 
-# Если требуется, можно добавить обработчик для записи в файл:
-# file_handler = logging.FileHandler("nexori.log")
-# file_handler.setFormatter(formatter)
-# logger.addHandler(file_handler)
+
+class DroppingQueueHandler(QueueHandler):
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DROPPED.inc()
+
+
+def _setup() -> QueueListener:
+    sink = logging.StreamHandler(sys.stdout)
+    sink.setFormatter(JsonFormatter())
+
+    log_queue = queue.Queue(maxsize=config.LOG_QUEUE_SIZE)
+    handler = DroppingQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter())
+    logger.addHandler(handler)
+
+    listener = QueueListener(log_queue, sink, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)   # дописываем очередь при выходе
+    return listener
+
+
+logger = logging.getLogger("nexori")
+logger.setLevel(config.LOG_LEVEL)
+logger.propagate = False
+listener = _setup()
@@ -1,12 +1,34 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.database import Base, engine
-from app.routes import auth, surveys, admin   # admin-роут подключите аналогично
+from app import metrics
+from app.config import DB_CREATE_SCHEMA, LOOP_LAG_INTERVAL
+from app.database import init_db
+from app.middleware import RequestTimingMiddleware
+from app.routes import auth, surveys, admin, analytics, health, metrics as metrics_routes
+from app.submit_queue import shutdown_submission_queue
+
 
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # схема — при старте сервера, а не при импорте: импорт app.main (тесты,
+    # CLI, воркеры с DB_CREATE_SCHEMA=0) в БД не ходит
+    if DB_CREATE_SCHEMA:
+        await run_in_threadpool(init_db)
+    lag_monitor = asyncio.create_task(metrics.monitor_loop_lag(LOOP_LAG_INTERVAL))
+    yield
+    lag_monitor.cancel()
+    with suppress(asyncio.CancelledError):
+        await lag_monitor
+    # дописываем очередь групповой записи до конца
+    shutdown_submission_queue()
 
-app = FastAPI(title="Nexori API")
+
+app = FastAPI(title="Nexori API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,13 +37,14 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# снаружи CORS: время считается вместе с ним
+app.add_middleware(RequestTimingMiddleware)
 
 # ===== маршруты =====
 
 app.include_router(auth.router,    prefix="/api")
 app.include_router(surveys.router, prefix="/api")
 app.include_router(admin.router,   prefix="/api")
-
-@app.get("/api/health")
-def health():
-    return {"status": "ok"}
+app.include_router(analytics.router, prefix="/api")
+app.include_router(health.router,  prefix="/api")
+app.include_router(metrics_routes.router, prefix="/api")
@@ -0,0 +1,354 @@
+# app/metrics.py
+"""
+Метрики процесса: счётчики, текущие значения и гистограммы.
+
+Запись дешёвая и почти без блокировок: каждое значение разбито на
+шарды по потокам, поток пишет только в свой шард (его список создаётся
+один раз под блокировкой), а сложение шардов делается при чтении.
+Метки — через .labels(...); набор значений меток должен быть
+ограниченным (шаблон маршрута, а не URL).
+
+Снимок отдаётся двумя способами: JSON для админки
+(GET /api/admin/metrics) и текстовый формат Prometheus (GET /api/metrics).
+"""
+import asyncio
+import bisect
+import math
+import threading
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+# секунды: от долей миллисекунды (лаг цикла, запрос к БД) до секунд (bcrypt)
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+PREFIX = "nexori_"
+
+
+class _Shards:
+    """Список чисел на каждый поток; читатель складывает их поэлементно."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._local = threading.local()
+        self._all = []
+        self._lock = threading.Lock()
+
+    def mine(self) -> list:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = [0] * self.size
+            with self._lock:
+                self._all.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def total(self) -> list:
+        with self._lock:
+            shards = list(self._all)
+        totals = [0] * self.size
+        for shard in shards:
+            for i, value in enumerate(shard):
+                totals[i] += value
+        return totals
+
+
+class CounterChild:
+    def __init__(self):
+        self._shards = _Shards(1)
+
+    def inc(self, amount: float = 1) -> None:
+        self._shards.mine()[0] += amount
+
+    @property
+    def value(self) -> float:
+        return self._shards.total()[0]
+
+
+class GaugeChild:
+    def __init__(self):
+        self._base = 0.0
+        self._shards = _Shards(1)
+
+    def inc(self, amount: float = 1) -> None:
+        self._shards.mine()[0] += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self._shards.mine()[0] -= amount
+
+    def set(self, value: float) -> None:
+        self._base = value - self._shards.total()[0]
+
+    @property
+    def value(self) -> float:
+        return self._base + self._shards.total()[0]
+
+
+class HistogramChild:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        n = len(buckets) + 1               # последний бакет — +Inf
+        self._n = n
+        self._shards = _Shards(n + 2)      # [бакеты..., count, sum]
+        self._max = 0.0
+
+    def observe(self, value: float) -> None:
+        shard = self._shards.mine()
+        shard[bisect.bisect_left(self.buckets, value)] += 1
+        shard[self._n] += 1
+        shard[self._n + 1] += value
+        if value > self._max:              # гонка безвредна: max приблизительный
+            self._max = value
+
+    def totals(self) -> Tuple[list, int, float]:
+        totals = self._shards.total()
+        return totals[:self._n], totals[self._n], totals[self._n + 1]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values) -> object:
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def samples(self) -> Dict[tuple, object]:
+        with self._lock:
+            return dict(self._children)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self._default.inc(amount)
+
+    @property
+    def value(self) -> float:
+        return self._default.value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+    def inc(self, amount: float = 1) -> None:
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self._default.dec(amount)
+
+    @property
+    def value(self) -> float:
+        return self._default.value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+
+class CallbackMetric:
+    """
+    Значения, которые дешевле прочитать в момент сбора, чем поддерживать
+    (размер пула, счётчики кэшей): fn() → {значения меток: число}.
+    """
+
+    def __init__(self, name: str, help: str, kind: str, labelnames: Sequence[str],
+                 fn: Callable[[], Dict[tuple, float]]):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+
+    def samples(self) -> Dict[tuple, float]:
+        return self.fn()
+
+
+registry: Dict[str, object] = {}
+
+
+def _register(metric):
+    return registry.setdefault(metric.name, metric)
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    return _register(Counter(name, help, labelnames))
+
+
+def gauge(name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return _register(Gauge(name, help, labelnames))
+
+
+def histogram(name: str, help: str, labelnames: Sequence[str] = (),
+              buckets: Optional[Sequence[float]] = None) -> Histogram:
+    return _register(Histogram(name, help, labelnames, buckets or DEFAULT_BUCKETS))
+
+
+def callback(name: str, help: str, kind: str, labelnames: Sequence[str],
+             fn: Callable[[], Dict[tuple, float]]) -> CallbackMetric:
+    return _register(CallbackMetric(name, help, kind, labelnames, fn))
+
+
+# ---------- кэши ----------
+_caches: Dict[str, object] = {}
+
+
+def register_cache(name: str, cache) -> None:
+    """Кэш с полями hits/misses (LRUTTLCache) попадает в cache_* метрики."""
+    _caches[name] = cache
+
+
+def _cache_values(attr: str) -> Callable[[], Dict[tuple, float]]:
+    def collect():
+        return {(name,): getattr(cache, attr) for name, cache in list(_caches.items())}
+    return collect
+
+
+def _cache_hit_ratio() -> Dict[tuple, float]:
+    ratios = {}
+    for name, cache in list(_caches.items()):
+        lookups = cache.hits + cache.misses
+        ratios[(name,)] = cache.hits / lookups if lookups else 0.0
+    return ratios
+
+
+callback("cache_hits_total", "Попадания в кэш", "counter", ("cache",), _cache_values("hits"))
+callback("cache_misses_total", "Промахи кэша", "counter", ("cache",), _cache_values("misses"))
+callback("cache_hit_ratio", "Доля попаданий в кэш с запуска", "gauge", ("cache",), _cache_hit_ratio)
+
+
+# ---------- снимки ----------
+def _label_key(labelnames: tuple, values: tuple) -> str:
+    return ",".join(f"{k}={v}" for k, v in zip(labelnames, values))
+
+
+def _histogram_json(child: HistogramChild) -> dict:
+    counts, count, total = child.totals()
+    cumulative, running = {}, 0
+    for bound, n in zip(child.buckets + (math.inf,), counts):
+        running += n
+        cumulative["+Inf" if bound == math.inf else str(bound)] = running
+    return {
+        "count": count,
+        "sum": total,
+        "avg": total / count if count else 0.0,
+        "max": child._max,
+        "buckets": cumulative,
+    }
+
+
+def _sample_json(metric, child):
+    if isinstance(metric, Histogram):
+        return _histogram_json(child)
+    if isinstance(metric, CallbackMetric):
+        return child
+    return child.value
+
+
+def snapshot() -> dict:
+    """JSON-снимок: метрики без меток — значением, с метками — словарём."""
+    result = {}
+    for name, metric in sorted(registry.items()):
+        samples = metric.samples()
+        if not metric.labelnames:
+            result[name] = _sample_json(metric, samples[()])
+        else:
+            result[name] = {
+                _label_key(metric.labelnames, values): _sample_json(metric, child)
+                for values, child in sorted(samples.items())
+            }
+    return result
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus() -> str:
+    """Текстовый формат экспозиции Prometheus 0.0.4."""
+    lines = []
+    for name, metric in sorted(registry.items()):
+        full = PREFIX + name
+        lines.append(f"# HELP {full} {_escape(metric.help)}")
+        lines.append(f"# TYPE {full} {metric.kind}")
+        for values, child in sorted(metric.samples().items()):
+            if isinstance(metric, Histogram):
+                counts, count, total = child.totals()
+                running = 0
+                for bound, n in zip(child.buckets + (math.inf,), counts):
+                    running += n
+                    le = _labels(metric.labelnames, values, f'le="{_number(bound)}"')
+                    lines.append(f"{full}_bucket{le} {running}")
+                labels = _labels(metric.labelnames, values)
+                lines.append(f"{full}_sum{labels} {_number(total)}")
+                lines.append(f"{full}_count{labels} {count}")
+            else:
+                value = child if isinstance(metric, CallbackMetric) else child.value
+                lines.append(f"{full}{_labels(metric.labelnames, values)} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------- лаг event loop ----------
+LOOP_LAG = histogram(
+    "event_loop_lag_seconds",
+    "Насколько позже запланированного просыпается контрольная задача — "
+    "столько цикл был занят синхронной работой",
+)
+
+
+async def monitor_loop_lag(interval: float) -> None:
+    """Фоновая задача: спит interval и записывает опоздание пробуждения."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        LOOP_LAG.observe(max(loop.time() - started - interval, 0.0))
@@ -0,0 +1,110 @@
+# app/middleware.py
+"""
+Чистый ASGI-middleware (без BaseHTTPMiddleware: тот оборачивает тело
+ответа в лишние задачи и потоки памяти) — время, статус и число
+запросов к БД на каждый HTTP-запрос: одной записью в лог и в метрики
+по шаблону маршрута. Повторы одной формы SQL (N+1) — отдельным
+предупреждением.
+"""
+import time
+
+try:
+    from fastapi.routing import iter_route_contexts
+except ImportError:  # старые FastAPI копируют маршруты, route.path уже с префиксом
+    iter_route_contexts = None
+
+from app import config, metrics
+from app.logger import logger
+from app.querylog import RequestQueries, current_queries, request_observers
+
+IN_FLIGHT = metrics.gauge("http_requests_in_flight", "HTTP-запросы в обработке")
+REQUESTS = metrics.counter(
+    "http_requests_total", "HTTP-запросы по маршрутам и статусам", ("method", "route", "status"),
+)
+DURATION = metrics.histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса", ("method", "route"),
+)
+QUERIES = metrics.histogram(
+    "http_request_db_queries", "SQL-выражений на HTTP-запрос", ("route",),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+N_PLUS_ONE = metrics.counter(
+    "http_n_plus_one_total", "Запросы, где одна форма SQL повторилась N_PLUS_ONE_THRESHOLD раз", ("route",),
+)
+
+# шаблоны маршрутов, которые дёргаются постоянно (пробы балансировщика)
+SAMPLED_ROUTES = {"/api/health"}
+
+
+class RequestTimingMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self._templates = None
+
+    def route_template(self, scope) -> str:
+        """
+        Шаблон маршрута с префиксами роутеров ("/api/surveys/{survey_id}").
+        Включённые роутеры в новых FastAPI не копируют маршруты, и у
+        scope["route"] путь без префикса — полный берём из контекстов.
+        """
+        route = scope.get("route")
+        if route is None:
+            return "<unmatched>"
+        if self._templates is None:
+            contexts = iter_route_contexts(scope["app"].routes) if iter_route_contexts else ()
+            self._templates = {id(c.original_route): c.path_format for c in contexts}
+        return self._templates.get(id(route)) or getattr(route, "path_format", route.path)
+
+    @staticmethod
+    def report_repeats(template: str, queries: RequestQueries) -> None:
+        for shape, repeats in queries.repeated(config.N_PLUS_ONE_THRESHOLD):
+            N_PLUS_ONE.labels(template).inc()
+            logger.warning(
+                "n+1 suspected",
+                extra={"route": template, "statement": shape[:1000], "repeats": repeats},
+            )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries(route=lambda: self.route_template(scope))
+        token = current_queries.set(queries)
+        IN_FLIGHT.inc()
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - started
+            current_queries.reset(token)
+            IN_FLIGHT.dec()
+            template = self.route_template(scope)
+            method = scope["method"]
+            REQUESTS.labels(method, template, status_code).inc()
+            DURATION.labels(method, template).observe(duration)
+            QUERIES.labels(template).observe(queries.count)
+            self.report_repeats(template, queries)
+            for observer in request_observers:
+                observer(template, queries)
+            logger.info(
+                "request",
+                extra={
+                    "method": method,
+                    "route": template,
+                    "status": status_code,
+                    "duration_ms": round(duration * 1000, 2),
+                    "db_queries": queries.count,
+                    "sample_every": (
+                        config.LOG_HEALTH_SAMPLE_EVERY if template in SAMPLED_ROUTES else 1
+                    ),
+                },
+            )
@@ -0,0 +1,5 @@
+# app/ml/__init__.py
+"""
+Модель категорий респондента по ответам (app/ml/model.py). Модель
+загружается при первом предсказании, а не при импорте пакета.
+"""
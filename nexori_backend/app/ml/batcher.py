@@ -0,0 +1,167 @@
+# app/ml/batcher.py
+"""
+Микро-батчинг предсказаний.
+
+Одиночные запросы (/predict, submit с ML_PREDICT_ON_SUBMIT) не зовут
+модель по одному: predict кладёт ответы в общую пачку и ждёт Future.
+Пачка уходит на инференс, как только набралось max_batch запросов или
+прошло max_wait с первого из них, — одной матрицей признаков на опрос,
+в пуле потоков, чтобы не держать event loop. Пока одна пачка считается,
+следующая уже набирается.
+
+Ожидание ограничено timeout на запрос; при max_pending ожидающих новые
+запросы сразу получают отказ (BatcherSaturated → 503), а не копят
+задержку. Работает в event loop, из которого вызван; отдельного потока
+или фоновой задачи нет.
+"""
+import asyncio
+import time
+from typing import List, Mapping, Optional, Sequence, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app import config, metrics
+from app.logger import logger
+from app.ml import model as ml_model
+
+QUEUE_DEPTH = metrics.gauge(
+    "ml_batch_queue_depth", "Предсказания в ожидании: в наборе пачки и на инференсе"
+)
+BATCH_SIZE = metrics.histogram(
+    "ml_batch_size", "Запросов в одной пачке инференса",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024),
+)
+BATCH_SECONDS = metrics.histogram("ml_batch_seconds", "Инференс одной пачки")
+WAIT_SECONDS = metrics.histogram(
+    "ml_batch_wait_seconds", "От постановки запроса до результата пачки"
+)
+REJECTED = metrics.counter("ml_batch_rejected_total", "Отказы предсказания", ("reason",))
+
+
+class BatcherSaturated(RuntimeError):
+    pass
+
+
+_Item = Tuple[Mapping[int, float], Tuple[int, ...], asyncio.Future]
+
+
+class PredictionBatcher:
+    def __init__(self, max_batch: int, max_wait: float, max_pending: int):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self.pending = 0          # меняется только из event loop
+        self.batches = 0
+        self._items: List[_Item] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._running: set = set()      # ссылки на задачи пачек, чтобы их не собрал GC
+
+    async def predict(self, answers: Mapping[int, float], question_order: Sequence[int],
+                      timeout: Optional[float] = None) -> dict:
+        """
+        Предсказание для одного словаря ответов — как ml_model.predict,
+        но в общей пачке. asyncio.TimeoutError, если результата нет за timeout.
+        """
+        if self.pending >= self.max_pending:
+            REJECTED.labels("saturated").inc()
+            raise BatcherSaturated("prediction queue is saturated")
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # новый цикл (перезапуск, тестовый клиент): прежняя пачка ему не принадлежит
+            self._loop, self._items, self._flush_handle = loop, [], None
+            self.pending = 0
+
+        future = loop.create_future()
+        self._items.append((answers, tuple(question_order), future))
+        self.pending += 1
+        QUEUE_DEPTH.set(self.pending)
+        if len(self._items) >= self.max_batch or not self._running:
+            # инференс простаивает — ждать добора незачем; пока пачка
+            # считается, следующие запросы копятся до max_batch или max_wait
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+
+        queued_at = time.perf_counter()
+        # таймаут — таймером на сам Future, а не wait_for: без лишней задачи
+        # на каждый запрос; пачку он не трогает, результат просто не нужен
+        expire = loop.call_later(timeout, _expire, future) if timeout else None
+        try:
+            return await future
+        finally:
+            if expire is not None:
+                expire.cancel()
+            WAIT_SECONDS.observe(time.perf_counter() - queued_at)
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._items = self._items, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: List[_Item]) -> None:
+        BATCH_SIZE.observe(len(batch))
+        started = time.perf_counter()
+        try:
+            outcomes = await run_in_threadpool(_score, batch)
+        except Exception as exc:
+            logger.exception("prediction batch failed", extra={"size": len(batch)})
+            outcomes = [exc] * len(batch)
+        BATCH_SECONDS.observe(time.perf_counter() - started)
+        self.batches += 1
+
+        for (_, _, future), outcome in zip(batch, outcomes):
+            if not future.done():
+                if isinstance(outcome, Exception):
+                    future.set_exception(outcome)
+                else:
+                    future.set_result(outcome)
+        if asyncio.get_running_loop() is self._loop:
+            self.pending -= len(batch)
+            QUEUE_DEPTH.set(self.pending)
+
+
+def _score(batch: List[_Item]) -> list:
+    """
+    Инференс пачки: одна матрица на каждый порядок вопросов (опрос).
+    Ошибка модели на одном опросе не задевает запросы к другим.
+    """
+    groups = {}
+    for position, (_, order, _) in enumerate(batch):
+        groups.setdefault(order, []).append(position)
+
+    outcomes: list = [None] * len(batch)
+    for order, positions in groups.items():
+        try:
+            features = ml_model.preprocess_input([batch[p][0] for p in positions], order)
+            results = ml_model.predict_features(features)
+        except ValueError as exc:
+            results = [exc] * len(positions)
+        for position, result in zip(positions, results):
+            outcomes[position] = result
+    return outcomes
+
+
+def _expire(future: asyncio.Future) -> None:
+    if not future.done():
+        REJECTED.labels("timeout").inc()
+        future.set_exception(asyncio.TimeoutError())
+
+
+_batcher: Optional[PredictionBatcher] = None
+
+
+def get_prediction_batcher() -> PredictionBatcher:
+    global _batcher
+    if _batcher is None:
+        _batcher = PredictionBatcher(
+            max_batch=config.ML_BATCH_MAX_SIZE,
+            max_wait=config.ML_BATCH_MAX_WAIT_MS / 1000,
+            max_pending=config.ML_BATCH_MAX_PENDING,
+        )
+    return _batcher
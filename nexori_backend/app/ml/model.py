@@ -0,0 +1,163 @@
+# app/ml/model.py
+"""
+Категория респондента по ответам: мультиномиальная логистическая
+регрессия (softmax) на NumPy.
+
+Файл модели — JSON {categories, coef, intercept}: coef — матрица
+категорий × признаков. Признаки — ответы в порядке вопросов опроса
+(по возрастанию id). Если у coef один столбец, вес применяется к
+среднему ответу, и такая модель подходит опросу с любым числом вопросов
+(так устроена встроенная default_model.json).
+
+Модель читается из ML_MODEL_PATH один раз на процесс, при первом
+предсказании. predict_proba векторизован: тысячи ответов — одно
+матричное умножение.
+"""
+import json
+import threading
+import time
+from pathlib import Path
+from typing import List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+from app import config, metrics
+from app.logger import logger
+
+DEFAULT_MODEL_PATH = Path(__file__).with_name("default_model.json")
+
+PREDICTIONS = metrics.counter("ml_predictions_total", "Предсказания категории респондента")
+
+Answers = Mapping[int, float]
+
+
+class SoftmaxModel:
+    def __init__(self, categories: Sequence[str], coef, intercept):
+        self.categories = list(categories)
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = np.asarray(intercept, dtype=np.float64)
+        if self.coef.ndim != 2 or self.coef.shape[0] != len(self.categories) \
+                or self.intercept.shape != (len(self.categories),):
+            raise ValueError("coef must be categories × features, intercept — one per category")
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "SoftmaxModel":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["categories"], data["coef"], data["intercept"])
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        """features (n × признаков) → вероятности (n × категорий)."""
+        if self.coef.shape[1] == 1:
+            # общий вес: признак — средний ответ
+            mean = features.mean(axis=1) if features.shape[1] else np.zeros(len(features))
+            logits = mean[:, None] * self.coef[:, 0] + self.intercept
+        elif features.shape[1] == self.coef.shape[1]:
+            logits = features @ self.coef.T + self.intercept
+        else:
+            raise ValueError(
+                f"Model expects {self.coef.shape[1]} answers, got {features.shape[1]}"
+            )
+        logits -= logits.max(axis=1, keepdims=True)
+        np.exp(logits, out=logits)
+        logits /= logits.sum(axis=1, keepdims=True)
+        return logits
+
+
+# ---------- загрузка ----------
+_model: Optional[SoftmaxModel] = None
+_lock = threading.Lock()
+
+
+def get_model() -> SoftmaxModel:
+    """Модель процесса; первый вызов читает файл, остальные — без блокировки."""
+    global _model
+    if _model is None:
+        with _lock:
+            if _model is None:
+                path = config.ML_MODEL_PATH or DEFAULT_MODEL_PATH
+                started = time.perf_counter()
+                _model = SoftmaxModel.load(path)
+                logger.info("ml model loaded", extra={
+                    "path": str(path), "categories": len(_model.categories),
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                })
+    return _model
+
+
+def reset_model() -> None:
+    """Следующее предсказание перечитает файл модели (тесты, смена ML_MODEL_PATH)."""
+    global _model
+    with _lock:
+        _model = None
+
+
+# ---------- признаки и предсказание ----------
+def preprocess_input(data: Union[Answers, Sequence[Answers]],
+                     question_order: Optional[Sequence] = None) -> np.ndarray:
+    """
+    Ответы {вопрос: значение} (один словарь или список) → матрица
+    признаков n × вопросов в порядке question_order (по умолчанию — порядок
+    ключей первого словаря). Пропущенный ответ заменяется средним
+    остальных ответов той же строки.
+    """
+    rows = [data] if isinstance(data, Mapping) else list(data)
+    if question_order is None:
+        question_order = list(rows[0]) if rows else []
+    features = np.array(
+        [[row.get(q, np.nan) for q in question_order] for row in rows],
+        dtype=np.float64,
+    ).reshape(len(rows), len(question_order))
+    return _fill_missing(features)
+
+
+def preprocess_rows(rows: Sequence[Sequence[Optional[float]]], columns: Sequence,
+                    question_order: Sequence) -> np.ndarray:
+    """
+    Пакет в виде матрицы: rows[n][k] — ответ на вопрос columns[k], None —
+    нет ответа. Столбцы переставляются в question_order, вопросы не из
+    опроса отбрасываются. Без словарей на строку: 100 тыс. ответов — доли
+    секунды.
+    """
+    matrix = np.array(rows, dtype=np.float64).reshape(len(rows), len(columns))
+    position = {q: i for i, q in enumerate(columns)}
+    features = np.full((len(rows), len(question_order)), np.nan)
+    for target, question_id in enumerate(question_order):
+        source = position.get(question_id)
+        if source is not None:
+            features[:, target] = matrix[:, source]
+    return _fill_missing(features)
+
+
+def _fill_missing(features: np.ndarray) -> np.ndarray:
+    """Пропуски (NaN) — средним остальных ответов строки, пустая строка — нулями."""
+    missing = np.isnan(features)
+    if missing.any():
+        answered = (~missing).sum(axis=1)
+        sums = np.where(missing, 0.0, features).sum(axis=1)
+        fill = np.divide(sums, answered, out=np.zeros_like(sums), where=answered > 0)
+        features = np.where(missing, fill[:, None], features)
+    return features
+
+
+def predict_features(features: np.ndarray) -> List[dict]:
+    """Матрица признаков → [{predicted_category, probabilities (в %)}] по строкам."""
+    model = get_model()
+    percent = model.predict_proba(features) * 100
+    best = percent.argmax(axis=1)
+    PREDICTIONS.inc(len(percent))
+    categories = model.categories
+    return [
+        {"predicted_category": categories[i], "probabilities": dict(zip(categories, row))}
+        for i, row in zip(best.tolist(), percent.tolist())
+    ]
+
+
+def predict(data: Union[Answers, Sequence[Answers]],
+            question_order: Optional[Sequence] = None) -> Union[dict, List[dict]]:
+    """
+    Предсказание для одного словаря ответов (→ dict) или списка (→ список
+    в том же порядке).
+    """
+    results = predict_features(preprocess_input(data, question_order))
+    return results[0] if isinstance(data, Mapping) else results
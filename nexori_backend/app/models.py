@@ -1,6 +1,8 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime
+import ast
+import json
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
-from datetime import datetime
+from datetime import datetime, timezone
 from app.database import Base
 
 class User(Base):
@@ -18,6 +20,10 @@ class User(Base):
 # ---------- опросы ----------
 class Survey(Base):
     __tablename__ = "surveys"
+    __table_args__ = (
+        # keyset-пагинация каталога: ORDER BY created_at, id
+        Index("ix_surveys_created_at_id", "created_at", "id"),
+    )
 
     id          = Column(Integer, primary_key=True, index=True)
     title       = Column(String, nullable=False)
@@ -59,9 +65,13 @@ class SurveyResultRange(Base):
 # ---------- ответы ----------
 class SurveyResponse(Base):
     __tablename__ = "survey_responses"
+    # выборки ответов опроса за период (выгрузка, пересчёт rollup)
+    __table_args__ = (
+        Index("ix_survey_responses_survey_created_at", "survey_id", "created_at"),
+    )
 
     id        = Column(Integer, primary_key=True, index=True)
-    survey_id = Column(Integer, ForeignKey("surveys.id", ondelete="CASCADE"))
+    survey_id = Column(Integer, ForeignKey("surveys.id", ondelete="CASCADE"), index=True)
     user_id   = Column(Integer, ForeignKey("users.id",    ondelete="SET NULL"))
     respondent_name = Column(String, nullable=False)
 
@@ -69,8 +79,148 @@ class SurveyResponse(Base):
     recommendation  = Column(Text,    nullable=True)
     created_at      = Column(DateTime, default=datetime.utcnow)
 
-    # JSON-строка «{question_id: answer_value, …}»
-    answers_raw = Column(Text, nullable=False)
+    # Устаревшее хранилище: JSON-строка «{question_id: answer_value, …}».
+    # Новые ответы пишутся в survey_answers, старые переносит app.backfill.
+    # Пустая строка — blob'а нет (перенесён или не было): колонка остаётся
+    # NOT NULL, как в уже созданных базах, миграция схемы не нужна.
+    answers_raw = Column(Text, nullable=False, default="")
 
     survey = relationship("Survey", back_populates="responses")
     user   = relationship("User",   back_populates="responses")
+    answer_items = relationship("SurveyAnswer", back_populates="response",
+                                cascade="all, delete-orphan", passive_deletes=True)
+
+    @property
+    def answers(self) -> dict[int, int]:
+        """
+        Словарь {question_id: answer_value}. Пока строка не перенесена
+        backfill'ом, читаем старый blob.
+        """
+        if self.answer_items:
+            return {a.question_id: a.value for a in self.answer_items}
+        return decode_answers_raw(self.answers_raw)
+
+class SurveyAnswer(Base):
+    """
+    Один ответ на один вопрос. survey_id продублирован, чтобы аналитика
+    по опросу была GROUP BY по одной таблице (покрывающий индекс).
+    question_id без FK: при замене вопросов история ответов сохраняется.
+    """
+    __tablename__ = "survey_answers"
+    __table_args__ = (
+        Index("ix_survey_answers_survey_question_value",
+              "survey_id", "question_id", "value"),
+    )
+
+    response_id = Column(Integer, ForeignKey("survey_responses.id", ondelete="CASCADE"),
+                         primary_key=True)
+    question_id = Column(Integer, primary_key=True)
+    survey_id   = Column(Integer, ForeignKey("surveys.id", ondelete="CASCADE"),
+                         nullable=False)
+    value       = Column(Integer, nullable=False)
+
+    response = relationship("SurveyResponse", back_populates="answer_items")
+
+
+def decode_answers_raw(raw: str | None) -> dict[int, int]:
+    """
+    Разбирает старый blob ответов. Встречаются и JSON, и str(dict) —
+    так ответы писали до появления survey_answers. Непарсящийся blob или
+    не словарь целых — ValueError.
+    """
+    if not raw:
+        return {}
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        try:
+            data = ast.literal_eval(raw)
+        except (SyntaxError, ValueError, TypeError) as exc:
+            raise ValueError(f"unparsable answers blob: {exc}") from exc
+    if not isinstance(data, dict):
+        raise ValueError(f"answers blob is {type(data).__name__}, not a dict")
+    try:
+        return {int(k): int(v) for k, v in data.items()}
+    except (TypeError, ValueError) as exc:
+        raise ValueError(f"non-integer answer in blob: {exc}") from exc
+
+def utc_naive(moment: datetime | None) -> datetime | None:
+    """
+    Момент с часовым поясом → наивное UTC, в котором хранятся created_at
+    (datetime.utcnow при submit). Наивный считается уже UTC.
+    """
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+# ---------- агрегаты ----------
+class SurveyQuestionStats(Base):
+    """
+    Накопительная статистика по вопросу опроса. Обновляется в той же
+    транзакции, что и submit; пересчитывается командой rebuild-stats.
+    """
+    __tablename__ = "survey_question_stats"
+
+    survey_id   = Column(Integer, ForeignKey("surveys.id", ondelete="CASCADE"),
+                         primary_key=True)
+    question_id = Column(Integer, primary_key=True)
+    count       = Column(Integer, nullable=False, default=0)
+    total       = Column(Integer, nullable=False, default=0)   # сумма значений
+    total_sq    = Column(Integer, nullable=False, default=0)   # сумма квадратов
+    min_value   = Column(Integer, nullable=True)
+    max_value   = Column(Integer, nullable=True)
+    # JSON-строка «{value: count, …}»
+    histogram   = Column(Text, nullable=False, default="{}")
+
+class SurveyRollup(Base):
+    """
+    Ответы опроса, сведённые по интервалам времени (час и сутки, UTC, и
+    один интервал «за всё время»). Обновляется в транзакции submit,
+    пересчитывается командой rebuild-rollups; временные ряды и перцентили
+    total_score аналитики читаются отсюда.
+    """
+    __tablename__ = "survey_rollups"
+
+    survey_id    = Column(Integer, ForeignKey("surveys.id", ondelete="CASCADE"),
+                          primary_key=True)
+    bucket       = Column(String, primary_key=True)          # hour / day / all
+    bucket_start = Column(DateTime, primary_key=True)
+    count        = Column(Integer, nullable=False, default=0)
+    score_total  = Column(Integer, nullable=False, default=0)
+    # JSON-строки «{total_score: count, …}» и «{recommendation: count, …}»
+    score_histogram = Column(Text, nullable=False, default="{}")
+    recommendations = Column(Text, nullable=False, default="{}")
+
+# ---------- импорт ----------
+class ImportJob(Base):
+    """
+    Загрузка исторических ответов (app/importer.py). rows_done — контрольная
+    точка: столько строк источника обработано и закоммичено вместе с
+    ответами; повторный запуск с тем же заданием их пропускает.
+    """
+    __tablename__ = "import_jobs"
+
+    id         = Column(Integer, primary_key=True)
+    survey_id  = Column(Integer, ForeignKey("surveys.id", ondelete="CASCADE"), nullable=False)
+    format     = Column(String, nullable=False)
+    source     = Column(String, nullable=True)
+    status     = Column(String, nullable=False, default="running")   # running / done / failed
+    rows_done  = Column(Integer, nullable=False, default=0)
+    imported   = Column(Integer, nullable=False, default=0)
+    rejected   = Column(Integer, nullable=False, default=0)
+    # JSON-список первых IMPORT_MAX_REJECTS отклонённых строк [{row, error}, …]
+    rejects    = Column(Text, nullable=False, default="[]")
+    error      = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# ---------- служебное ----------
+class CacheVersion(Base):
+    """
+    Счётчик версий для межпроцессной инвалидации кэшей: запись увеличивает
+    version, воркеры раз в CACHE_VERSION_POLL_INTERVAL сверяют значение.
+    """
+    __tablename__ = "cache_versions"
+
+    name    = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,109 @@
+# app/passwords.py
+"""
+Хэширование и проверка паролей вне event loop.
+
+bcrypt нарочно медленный (~250 мс на 12 раундах), поэтому работа идёт в
+отдельном ограниченном пуле потоков (bcrypt отпускает GIL на время
+вычисления). Очередь тоже ограничена: при утреннем наплыве логинов
+лишние запросы сразу получают отказ (PasswordPoolSaturated → 503),
+а не копятся, растягивая задержку для всех.
+
+passlib импортируется, а CryptContext создаётся при первом хэшировании,
+а не при импорте: старт воркера за это не платит.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Optional, Tuple, TypeVar
+
+from app import config, metrics
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+T = TypeVar("T")
+
+HASH_SECONDS = metrics.histogram(
+    "password_hash_seconds", "Время одной операции bcrypt в пуле"
+)
+WAIT_SECONDS = metrics.histogram(
+    "password_queue_wait_seconds", "Ожидание свободного потока пула паролей"
+)
+PENDING = metrics.gauge("password_pool_pending", "Операции в пуле паролей: в работе и в очереди")
+REJECTED = metrics.counter("password_pool_rejected_total", "Отказы из-за переполнения пула паролей")
+REHASHED = metrics.counter("password_rehashed_total", "Пароли, перехэшированные при входе")
+
+
+def make_context(rounds: int) -> "CryptContext":
+    from passlib.context import CryptContext
+
+    # хэши с другим числом раундов needs_update считает устаревшими
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+
+
+class PasswordPoolSaturated(RuntimeError):
+    pass
+
+
+class PasswordPool:
+    def __init__(self, context: Optional["CryptContext"], workers: int, max_pending: int,
+                 rounds: int = 12):
+        # None — контекст (и импорт passlib) создаётся при первом обращении
+        self._context = context
+        self.rounds = rounds
+        self.max_pending = max_pending
+        self.pending = 0          # меняется только из event loop
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="passwords")
+
+    @property
+    def context(self) -> "CryptContext":
+        if self._context is None:
+            self._context = make_context(self.rounds)
+        return self._context
+
+    @context.setter
+    def context(self, value: "CryptContext") -> None:
+        self._context = value
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        if self.pending >= self.max_pending:
+            REJECTED.inc()
+            raise PasswordPoolSaturated("password pool is saturated")
+        self.pending += 1
+        PENDING.set(self.pending)
+        queued_at = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            WAIT_SECONDS.observe(started - queued_at)
+            try:
+                return fn(*args)
+            finally:
+                HASH_SECONDS.observe(time.perf_counter() - started)
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            self.pending -= 1
+            PENDING.set(self.pending)
+
+    async def hash(self, password: str) -> str:
+        return await self.run(self.context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """
+        (верен ли пароль, новый хэш или None). Новый хэш возвращается,
+        если сохранённый устарел (другая схема или число раундов).
+        """
+        ok, new_hash = await self.run(self.context.verify_and_update, password, hashed)
+        if new_hash is not None:
+            REHASHED.inc()
+        return ok, new_hash
+
+
+password_pool = PasswordPool(
+    None,
+    workers=config.PASSWORD_WORKERS,
+    max_pending=config.PASSWORD_MAX_PENDING,
+    rounds=config.BCRYPT_ROUNDS,
+)
@@ -0,0 +1,130 @@
+# app/querylog.py
+"""
+Наблюдение за SQL на уровне движка (before/after_cursor_execute).
+
+- время каждого выражения → db_statement_duration_seconds;
+- выражения дольше SLOW_QUERY_MS → предупреждение в лог с формой
+  параметров (типы, без значений) и маршрутом, который их выполнил;
+- учёт запросов текущего HTTP-запроса (RequestQueries в contextvar):
+  сколько всего и сколько раз повторилась каждая форма выражения.
+  Одна форма N_PLUS_ONE_THRESHOLD раз и больше за запрос — почти
+  наверняка N+1 (ленивая догрузка в цикле); middleware пишет об этом.
+
+Формы сравниваются после нормализации: списки плейсхолдеров
+IN (?, ?, ?) и многострочные VALUES сворачиваются, чтобы selectinload
+разного размера и пачки вставок считались одним выражением.
+"""
+import re
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import config, metrics
+from app.logger import logger
+
+STATEMENT_SECONDS = metrics.histogram(
+    "db_statement_duration_seconds", "Время выполнения SQL-выражения", ("engine", "operation"),
+)
+SLOW_QUERIES = metrics.counter("db_slow_queries_total", "Выражения дольше SLOW_QUERY_MS", ("engine",))
+OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "PRAGMA", "BEGIN", "COMMIT", "ROLLBACK"}
+
+_PLACEHOLDER_LIST = re.compile(r"\((?:\s*(?:\?|%s|\$\d+|:\w+)\s*,)+\s*(?:\?|%s|\$\d+|:\w+)\s*\)")
+_REPEATED_ROWS = re.compile(r"(\([^()]*\))(?:\s*,\s*\1)+")
+_SPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def statement_shape(statement: str) -> str:
+    shape = _SPACES.sub(" ", statement).strip()
+    shape = _PLACEHOLDER_LIST.sub("(?...)", shape)
+    return _REPEATED_ROWS.sub(r"\1, ...", shape)
+
+
+def params_shape(parameters, executemany: bool = False) -> str:
+    """Типы параметров без значений: в логе не должно быть персональных данных."""
+    if executemany:
+        rows = list(parameters or ())
+        return f"{len(rows)} x {params_shape(rows[0])}" if rows else "0 rows"
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        if len(parameters) > 20:
+            types = sorted({type(v).__name__ for v in parameters})
+            return f"[{len(parameters)} x {'|'.join(types)}]"
+        return "[" + ", ".join(type(v).__name__ for v in parameters) + "]"
+    return type(parameters).__name__
+
+
+def _operation(statement: str) -> str:
+    # метка должна быть из короткого списка, а не текстом запроса
+    word = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return word if word in OPERATIONS else "OTHER"
+
+
+# ---------- учёт запросов текущего HTTP-запроса ----------
+class RequestQueries:
+    __slots__ = ("count", "shapes", "_route")
+
+    def __init__(self, route: Callable[[], str] = lambda: "<background>"):
+        self.count = 0
+        self.shapes = defaultdict(int)
+        self._route = route
+
+    @property
+    def route(self) -> str:
+        return self._route()
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Формы, выполненные threshold раз и больше, — кандидаты в N+1."""
+        return sorted(
+            ((shape, n) for shape, n in self.shapes.items() if n >= threshold),
+            key=lambda item: -item[1],
+        )
+
+
+# Middleware кладёт сюда учёт своего запроса; контекст копируется и в пул
+# потоков, и в greenlet run_sync, так что запросы из run_db видны.
+current_queries: ContextVar[Optional[RequestQueries]] = ContextVar("current_queries", default=None)
+
+# вызываются middleware по окончании каждого запроса: (маршрут, учёт);
+# так тесты проверяют число запросов на эндпоинт
+request_observers: List[Callable[[str, RequestQueries], None]] = []
+
+
+def install_statement_hooks(sync_engine: Engine, label: str) -> None:
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        queries = current_queries.get()
+        if queries is not None:
+            queries.count += 1
+            queries.shapes[statement_shape(statement)] += 1
+        conn.info.setdefault("statement_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["statement_started"].pop()
+        STATEMENT_SECONDS.labels(label, _operation(statement)).observe(elapsed)
+        if elapsed * 1000 >= config.SLOW_QUERY_MS:
+            SLOW_QUERIES.labels(label).inc()
+            queries = current_queries.get()
+            logger.warning(
+                "slow query",
+                extra={
+                    "duration_ms": round(elapsed * 1000, 2),
+                    "engine": label,
+                    "statement": statement_shape(statement)[:1000],
+                    "params": params_shape(parameters, executemany),
+                    "route": queries.route if queries is not None else "<background>",
+                },
+            )
+
+    @event.listens_for(sync_engine, "handle_error")
+    def on_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("statement_started"):
+            conn.info["statement_started"].pop()
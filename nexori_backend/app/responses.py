@@ -0,0 +1,58 @@
+# app/responses.py
+"""
+Быстрая отдача JSON.
+
+Ответы с response_model FastAPI уже сериализует сам, сразу в байты через
+ядро Pydantic, но только пока у маршрута нет своего response_class —
+поэтому глобально класс ответа не меняем. Маршрутам, которые отдают
+словари без схемы (аналитика, метрики, служебные ручки админки),
+FastJSONResponse назначается явно: orjson, а без него — обычный json
+(даты и типы NumPy — как у orjson).
+
+Чтения опросов дополнительно кэшируют готовые байты ответа
+(survey_cache, ключ с версией): попадание отдаётся как есть, без ORM
+и без Pydantic.
+"""
+import json
+from datetime import date, datetime, time
+from typing import Any, Mapping, Optional
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # необязательная зависимость
+    orjson = None
+
+
+def _json_default(value: Any) -> Any:
+    """
+    Типы, которые orjson пишет сам, для запасного пути через json:
+    даты — в ISO 8601, как orjson, скаляры и массивы NumPy — в числа и списки.
+    """
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return json.dumps(
+                content, default=_json_default, ensure_ascii=False,
+                allow_nan=False, indent=None, separators=(",", ":"),
+            ).encode("utf-8")
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+def render(adapter: TypeAdapter, value: Any) -> bytes:
+    """Объекты ORM/снимки → JSON-байты по схеме адаптера (from_attributes)."""
+    return adapter.dump_json(adapter.validate_python(value, from_attributes=True))
+
+
+def json_bytes_response(body: bytes, headers: Optional[Mapping[str, str]] = None) -> Response:
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,78 +1,216 @@
 # app/routes/admin.py
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+import tempfile
+from datetime import datetime
+from typing import Literal, Optional
 
-from app import models, schemas
-from app.dependencies import get_db, get_current_user
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from app import crud, export, importer, metrics, models, schemas
+from app.config import DB_ASYNC, IMPORT_LEASE_SECONDS
+from app.database import async_engine, engine, engine_settings
+from app.responses import FastJSONResponse
+from app.survey_cache import get_survey_snapshot, survey_cache
+from app.dependencies import (
+    DbSession, admin_required, get_session, run_db, token_cache,
+)
+from app.user_cache import Principal, user_cache
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
-def admin_required(user=Depends(get_current_user)):
-    if user.role != "admin":
-        raise HTTPException(status_code=403, detail="Admins only")
-    return user
+def checked_survey(questions, ranges) -> list[str]:
+    """
+    Проверка вопросов и диапазонов до записи: ошибки → 422,
+    предупреждения возвращаются вместе с сохранённым опросом.
+    """
+    from app import scoring     # NumPy — при первом создании опроса, не при старте
+
+    errors, warnings = scoring.check_survey(questions, ranges)
+    if errors:
+        raise HTTPException(422, errors)
+    return warnings
+
+def admin_survey_out(survey, warnings) -> schemas.AdminSurveyOut:
+    out = schemas.AdminSurveyOut.model_validate(survey)
+    out.warnings = warnings
+    return out
 
 # ---------- управление опросами ----------
-@router.post("/surveys", response_model=schemas.SurveyOut, status_code=201)
-def create_survey(
+@router.post("/surveys", response_model=schemas.AdminSurveyOut, status_code=201)
+async def create_survey(
     survey_in: schemas.SurveyCreate,
-    db: Session = Depends(get_db),
-    _: models.User = Depends(admin_required),
+    db: DbSession = Depends(get_session),
+    _: Principal = Depends(admin_required),
 ):
-    survey = models.Survey(
-        title=survey_in.title,
-        description=survey_in.description,
-        questions=[
-            models.SurveyQuestion(**q.model_dump()) for q in survey_in.questions
-        ],
-        ranges=[
-            models.SurveyResultRange(**r.model_dump()) for r in survey_in.ranges
-        ],
-    )
-    db.add(survey)
-    db.commit()
-    db.refresh(survey)
-    return survey
+    warnings = checked_survey(survey_in.questions, survey_in.ranges)
+    survey = await run_db(db, crud.create_survey, survey_in)
+    survey_cache.invalidate()
+    return admin_survey_out(survey, warnings)
 
-@router.put("/surveys/{survey_id}", response_model=schemas.SurveyOut)
-def update_survey(
+@router.put("/surveys/{survey_id}", response_model=schemas.AdminSurveyOut)
+async def update_survey(
     survey_id: int,
     patch: schemas.SurveyUpdate,
-    db: Session = Depends(get_db),
-    _: models.User = Depends(admin_required),
+    db: DbSession = Depends(get_session),
+    _: Principal = Depends(admin_required),
 ):
-    survey = db.get(models.Survey, survey_id)
-    if not survey:
+    current = await get_survey_snapshot(db, survey_id)
+    if not current:
         raise HTTPException(404, "Survey not found")
+    warnings = checked_survey(
+        current.questions if patch.questions is None else patch.questions,
+        current.ranges if patch.ranges is None else patch.ranges,
+    )
 
-    if patch.title is not None:
-        survey.title = patch.title
-    if patch.description is not None:
-        survey.description = patch.description
-
-    if patch.questions is not None:
-        survey.questions.clear()
-        survey.questions.extend(
-            models.SurveyQuestion(**q.model_dump()) for q in patch.questions
-        )
-    if patch.ranges is not None:
-        survey.ranges.clear()
-        survey.ranges.extend(
-            models.SurveyResultRange(**r.model_dump()) for r in patch.ranges
-        )
-
-    db.commit()
-    db.refresh(survey)
-    return survey
+    survey = await run_db(db, crud.update_survey, survey_id, patch)
+    survey_cache.invalidate()
+    if not survey:
+        raise HTTPException(404, "Survey not found")
+    return admin_survey_out(survey, warnings)
 
 @router.delete("/surveys/{survey_id}", status_code=204)
-def delete_survey(
+async def delete_survey(
+    survey_id: int,
+    db: DbSession = Depends(get_session),
+    _: Principal = Depends(admin_required),
+):
+    deleted = await run_db(db, crud.delete_survey, survey_id)
+    survey_cache.invalidate()
+    if not deleted:
+        raise HTTPException(404, "Survey not found")
+    return Response(status_code=204)
+
+# ---------- выгрузка ответов ----------
+EXPORT_MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+@router.get("/surveys/{survey_id}/responses/export")
+async def export_responses(
+    survey_id: int,
+    format: Literal["csv", "ndjson"] = "csv",
+    gzip: bool = False,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    db: DbSession = Depends(get_session),
+    _: Principal = Depends(admin_required),
+):
+    survey = await get_survey_snapshot(db, survey_id)
+    if not survey:
+        raise HTTPException(404, "Survey not found")
+    question_ids = [q.id for q in survey.questions]
+
+    # генератор синхронный, со своей сессией: Starlette крутит его в пуле потоков
+    chunks = export.iter_export(survey_id, question_ids, format,
+                                models.utc_naive(date_from), models.utc_naive(date_to))
+    filename = f"survey-{survey_id}-responses.{format}"
+    media_type = EXPORT_MEDIA_TYPES[format]
+    if gzip:
+        chunks = export.gzip_chunks(chunks)
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+# ---------- импорт ответов ----------
+@router.post(
+    "/surveys/{survey_id}/responses/import",
+    response_model=schemas.ImportJobOut,
+    status_code=202,
+)
+async def import_responses(
     survey_id: int,
-    db: Session = Depends(get_db),
-    _: models.User = Depends(admin_required),
+    request: Request,
+    background: BackgroundTasks,
+    format: Literal["csv", "ndjson"] = "csv",
+    gzip: bool = False,
+    job_id: Optional[int] = None,
+    db: DbSession = Depends(get_session),
+    _: Principal = Depends(admin_required),
 ):
-    survey = db.get(models.Survey, survey_id)
+    """
+    Тело запроса — сам файл (CSV или NDJSON, при gzip=true сжатый), без
+    multipart. Загрузка спулится на диск, импорт идёт в фоне; состояние —
+    GET /admin/imports/{job_id}. Чтобы продолжить прерванный импорт,
+    загрузите тот же файл с job_id: записанные строки будут пропущены.
+    Пока задание выполняется (аренда IMPORT_LEASE_SECONDS не истекла),
+    продолжение отклоняется с 409.
+    """
+    survey = await get_survey_snapshot(db, survey_id)
     if not survey:
         raise HTTPException(404, "Survey not found")
-    db.delete(survey)
-    db.commit()
+    if job_id is None:
+        job = await run_db(db, crud.create_import_job, survey_id, format,
+                           request.headers.get("x-filename"))
+    else:
+        job = await run_db(db, crud.get_import_job, job_id)
+        if job is None or job.survey_id != survey_id or job.format != format:
+            raise HTTPException(404, "Import job not found")
+        if job.status == "done":
+            raise HTTPException(409, "Import job is already finished")
+        # забираем задание до постановки в фон: два продолжения одного
+        # задания иначе импортировали бы одни и те же строки дважды
+        job = await run_db(db, crud.claim_import_job, job_id, IMPORT_LEASE_SECONDS)
+        if job is None:
+            raise HTTPException(409, "Import job is already running")
+
+    spool = tempfile.TemporaryFile()
+    try:
+        async for chunk in request.stream():
+            await run_in_threadpool(spool.write, chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    background.add_task(importer.import_file, job.id, survey, spool, format, gzip)
+    return job
+
+@router.get("/imports/{job_id}", response_model=schemas.ImportJobOut)
+async def import_status(
+    job_id: int,
+    db: DbSession = Depends(get_session),
+    _: Principal = Depends(admin_required),
+):
+    job = await run_db(db, crud.get_import_job, job_id)
+    if job is None:
+        raise HTTPException(404, "Import job not found")
+    return job
+
+# ---------- пользователи ----------
+@router.put("/users/{user_id}/role", response_model=schemas.UserOut)
+async def set_user_role(
+    user_id: int,
+    role_in: schemas.UserRoleUpdate,
+    db: DbSession = Depends(get_session),
+    _: Principal = Depends(admin_required),
+):
+    user = await run_db(db, crud.update_user_role, user_id, role_in.role)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    user_cache.invalidate()
+    return user
+
+# ---------- настройки БД ----------
+@router.get("/db/settings", response_class=FastJSONResponse, summary="Фактические настройки пула и PRAGMA")
+async def db_settings(_: Principal = Depends(admin_required)):
+    return {
+        "db_async": DB_ASYNC,
+        "sync": await run_in_threadpool(engine_settings, engine),
+        "async": engine_settings(async_engine.sync_engine, read_pragmas=False),
+    }
+
+# ---------- кэши ----------
+@router.get("/cache/stats", response_class=FastJSONResponse, summary="Счётчики кэшей процесса")
+async def cache_stats(_: Principal = Depends(admin_required)):
+    return {
+        "surveys": survey_cache.stats(),
+        "users": user_cache.stats(),
+        "tokens": token_cache.stats(),
+    }
+
+# ---------- метрики ----------
+@router.get("/metrics", response_class=FastJSONResponse, summary="Снимок метрик процесса (JSON)")
+async def metrics_snapshot(_: Principal = Depends(admin_required)):
+    return metrics.snapshot()
@@ -1,51 +1,214 @@
 # app/routes/analytics.py
-import json
-from collections import defaultdict
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app import crud
-from app.database import SessionLocal
-
-router = APIRouter()
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+from datetime import datetime, timedelta
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app import aggregates, config, metrics
+from app.cache import LRUTTLCache
+from app.dependencies import DbSession, admin_required, get_session, run_db, run_in_session
+from app.models import utc_naive
+from app.responses import FastJSONResponse
+from app.survey_cache import get_survey_snapshot
+
+# app.analytics (NumPy) импортируется в обработчиках — при первом запросе
+# к тяжёлой аналитике, а не при старте воркера
+
+# ответы — словари без response_model: рендерим через orjson; статистика
+# ответов — только администраторам, как и сами ответы в админке
+router = APIRouter(
+    prefix="/analytics", tags=["analytics"], default_response_class=FastJSONResponse,
+    dependencies=[Depends(admin_required)],
+)
 
 @router.get("/surveys", summary="Аналитика по опросам")
-def get_surveys_analytics(db: Session = Depends(get_db)):
-    surveys = crud.get_surveys(db=db)
-    if not surveys:
+async def get_surveys_analytics(db: DbSession = Depends(get_session)):
+    analytics = await run_db(db, aggregates.get_survey_stats)
+    if not analytics:
         raise HTTPException(status_code=404, detail="No surveys found")
-    
-    aggregated = {}
-    distribution = {}
-    for survey in surveys:
-        try:
-            answers = json.loads(survey.answers)
-        except Exception:
-            continue
-        for question, score in answers.items():
-            if question not in aggregated:
-                aggregated[question] = {'total': 0, 'count': 0, 'min': score, 'max': score}
-                distribution[question] = defaultdict(int)
-            aggregated[question]['total'] += score
-            aggregated[question]['count'] += 1
-            aggregated[question]['min'] = min(aggregated[question]['min'], score)
-            aggregated[question]['max'] = max(aggregated[question]['max'], score)
-            distribution[question][score] += 1
-
-    analytics = {}
-    for question, data in aggregated.items():
-        avg = data['total'] / data['count'] if data['count'] > 0 else 0
-        analytics[question] = {
-            'average': avg,
-            'min': data['min'],
-            'max': data['max'],
-            'count': data['count'],
-            'distribution': dict(distribution[question])
-        }
     return analytics
+
+
+@router.get("/surveys/{survey_id}", summary="Аналитика по одному опросу")
+async def get_survey_analytics(survey_id: int, db: DbSession = Depends(get_session)):
+    analytics = await run_db(db, aggregates.get_survey_stats, survey_id)
+    if not analytics:
+        raise HTTPException(status_code=404, detail="No answers for this survey")
+    return analytics
+
+
+@router.get("/surveys/{survey_id}/detailed",
+            summary="Подробная статистика по опросу (точные перцентили)")
+async def get_survey_detailed_analytics(survey_id: int):
+    from app.analytics import compute_question_stats
+
+    # полный проход считает NumPy — в пуле потоков, не в event loop
+    analytics = await run_in_session(compute_question_stats, survey_id)
+    if not analytics:
+        raise HTTPException(status_code=404, detail="No answers for this survey")
+    return analytics
+
+
+# окно по умолчанию, если from не задан
+TIMESERIES_WINDOW = {"hour": timedelta(days=7), "day": timedelta(days=365)}
+
+
+@router.get("/surveys/{survey_id}/timeseries",
+            summary="Ответы, средний балл и рекомендации по часам или дням")
+async def get_survey_timeseries(
+    survey_id: int,
+    bucket: Literal["hour", "day"] = "day",
+    date_from: Optional[datetime] = Query(None, alias="from"),
+    date_to: Optional[datetime] = Query(None, alias="to"),
+    db: DbSession = Depends(get_session),
+):
+    """
+    Читается только из survey_rollups (UTC). Интервалы без ответов
+    пропускаются; по умолчанию — последние 7 дней по часам или год по дням.
+    """
+    if not await get_survey_snapshot(db, survey_id):
+        raise HTTPException(status_code=404, detail="Survey not found")
+    end = utc_naive(date_to) or datetime.utcnow()
+    start = utc_naive(date_from) or end - TIMESERIES_WINDOW[bucket]
+    if start >= end:
+        raise HTTPException(status_code=422, detail="'from' must be earlier than 'to'")
+    if (end - start) / aggregates.BUCKETS[bucket] > config.TIMESERIES_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Range exceeds {config.TIMESERIES_MAX_BUCKETS} {bucket} buckets",
+        )
+    points = await run_db(db, aggregates.get_timeseries, survey_id, bucket, start, end)
+    return {"survey_id": survey_id, "bucket": bucket, "from": start, "to": end, "points": points}
+
+
+def _quantile_summary(distribution, percentiles) -> dict:
+    from app.analytics import histogram_percentiles
+
+    return {"count": sum(distribution.values()),
+            "percentiles": histogram_percentiles(distribution, percentiles)}
+
+
+@router.get("/surveys/{survey_id}/quantiles",
+            summary="Медиана и перцентили total_score и ответов по вопросам")
+async def get_survey_quantiles(
+    survey_id: int,
+    p: Optional[List[float]] = Query(
+        None, description="Перцентили, 0..100; по умолчанию 10, 25, 50, 75, 90"
+    ),
+    exact: bool = False,
+    questions: bool = Query(True, description="Перцентили ответов по каждому вопросу"),
+    date_from: Optional[datetime] = Query(None, alias="from"),
+    date_to: Optional[datetime] = Query(None, alias="to"),
+    db: DbSession = Depends(get_session),
+):
+    """
+    По умолчанию — из накопленных гистограмм (survey_rollups для
+    total_score, survey_question_stats для вопросов): баллы и ответы целые,
+    поэтому гистограмма — точная и сливаемая сводка, погрешность 0, время не
+    зависит от числа ответов. from/to расширяются до целых суток и
+    применимы только к total_score: агрегаты по вопросам — за всё время,
+    поэтому период с questions=true без exact — 422.
+
+    exact=true — проход по самим ответам порциями (память O(разных
+    значений)); нужен, если агрегаты не пересчитаны после ручной правки
+    данных, и учитывает from/to до секунды и для total_score, и для вопросов.
+    """
+    from app.analytics import PERCENTILES, compute_question_stats, scan_score_histogram
+
+    p = p or list(PERCENTILES)
+    if any(not 0 <= value <= 100 for value in p):
+        raise HTTPException(status_code=422, detail="Percentiles must be within [0, 100]")
+    if not await get_survey_snapshot(db, survey_id):
+        raise HTTPException(status_code=404, detail="Survey not found")
+    start = utc_naive(date_from)
+    end = utc_naive(date_to)
+    if questions and not exact and (start is not None or end is not None):
+        raise HTTPException(
+            status_code=422,
+            detail="Per-question quantiles for a period need exact=true (or questions=false)",
+        )
+
+    per_question = {}
+    if exact:
+        scores = await run_in_session(scan_score_histogram, survey_id, start, end)
+        if questions:
+            per_question = await run_in_session(compute_question_stats, survey_id, start, end)
+    else:
+        scores = await run_db(db, aggregates.get_score_histogram, survey_id, start, end)
+        if questions:
+            per_question = await run_db(db, aggregates.get_survey_stats, survey_id)
+    return {
+        "survey_id": survey_id,
+        "source": "scan" if exact else "rollups",
+        "error_bound": 0,
+        "total_score": _quantile_summary(scores, p),
+        "questions": {
+            question_id: _quantile_summary(stats["distribution"], p)
+            for question_id, stats in per_question.items()
+        },
+    }
+
+
+# ---------- связь между вопросами ----------
+# готовые корреляции и таблицы сопряжённости под ключом (опрос, версия
+# опросов, последний id ответа, запрос): новый ответ или правка опроса дают
+# новый ключ; в кэше — только результаты, O(вопросов²) на запись
+correlation_cache = LRUTTLCache(config.ANALYTICS_CACHE_SIZE, config.ANALYTICS_CACHE_TTL)
+metrics.register_cache("analytics", correlation_cache)
+
+
+async def _snapshot_and_watermark(db: DbSession, survey_id: int):
+    """Снимок опроса и последний id ответа — ключ кэша готовых результатов."""
+    from app.analytics import latest_response_id
+
+    snapshot = await get_survey_snapshot(db, survey_id)
+    if not snapshot:
+        raise HTTPException(status_code=404, detail="Survey not found")
+    return snapshot, await run_db(db, latest_response_id, survey_id)
+
+
+@router.get("/surveys/{survey_id}/correlations",
+            summary="Матрица корреляций ответов между вопросами")
+async def get_survey_correlations(
+    survey_id: int,
+    method: Literal["pearson", "spearman"] = "pearson",
+    db: DbSession = Depends(get_session),
+):
+    """
+    matrix[i][j] — корреляция вопросов question_ids[i] и question_ids[j]
+    по ответам, где отвечены оба (их число — pairs[i][j]); null — не
+    определена. Повторные запросы без новых ответов берутся из кэша.
+    """
+    from app.analytics import compute_correlations
+
+    snapshot, watermark = await _snapshot_and_watermark(db, survey_id)
+    key = (survey_id, snapshot.version, watermark, method)
+    result = correlation_cache.get(key)
+    if result is None:
+        try:
+            result = await run_in_session(
+                compute_correlations, survey_id, sorted(snapshot.question_ids), method,
+                until=watermark,
+            )
+        except ValueError as exc:
+            raise HTTPException(status_code=422, detail=str(exc))
+        correlation_cache.set(key, result)
+    return {"survey_id": survey_id, "method": method, **result}
+
+
+@router.get("/surveys/{survey_id}/crosstab",
+            summary="Таблица сопряжённости ответов на два вопроса")
+async def get_survey_crosstab(
+    survey_id: int, x: int, y: int, db: DbSession = Depends(get_session),
+):
+    """counts[r][c] — число ответов со значением x_values[r] на x и y_values[c] на y."""
+    from app.analytics import compute_crosstab
+
+    snapshot, watermark = await _snapshot_and_watermark(db, survey_id)
+    if x not in snapshot.question_ids or y not in snapshot.question_ids:
+        raise HTTPException(status_code=404, detail="Question not found in this survey")
+    key = (survey_id, snapshot.version, watermark, "crosstab", x, y)
+    table = correlation_cache.get(key)
+    if table is None:
+        table = await run_in_session(compute_crosstab, survey_id, x, y, until=watermark)
+        correlation_cache.set(key, table)
+    return {"survey_id": survey_id, "x": x, "y": y, **table}
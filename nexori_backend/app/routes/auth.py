@@ -1,39 +1,68 @@
+import time
+
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
 
-from app import models, schemas
-from app.dependencies import get_db, create_access_token
+from app import crud, metrics, schemas
+from app.dependencies import DbSession, get_session, get_current_user, run_db, user_token
+from app.passwords import PasswordPoolSaturated, password_pool
+from app.user_cache import Principal
 
 router = APIRouter(prefix="/auth", tags=["auth"])
-pwd_ctx = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+LOGIN_SECONDS = metrics.histogram("login_seconds", "Полное время обработки POST /auth/token")
+LOGIN_FAILURES = metrics.counter("login_failures_total", "Неудачные попытки входа")
+
+
+def pool_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many concurrent logins, retry later",
+        headers={"Retry-After": "1"},
+    )
 
 
 # ---------- регистрация ----------
 @router.post("/register", response_model=schemas.UserOut)
-def register(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
-    if db.query(models.User).filter(models.User.username == user_in.username).first():
+async def register(user_in: schemas.UserCreate, db: DbSession = Depends(get_session)):
+    if await run_db(db, crud.get_user_by_username, user_in.username):
         raise HTTPException(status_code=400, detail="Username already taken")
 
-    hashed = pwd_ctx.hash(user_in.password)
-    db_user = models.User(
-        username=user_in.username,
-        email=user_in.email,
-        password=hashed,
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
+    # bcrypt занимает CPU ~250 мс — в ограниченном пуле, не в event loop
+    try:
+        hashed = await password_pool.hash(user_in.password)
+    except PasswordPoolSaturated:
+        raise pool_busy()
+    return await run_db(db, crud.create_user, user_in, hashed)
 
 
 # ---------- логин ----------
 @router.post("/token", response_model=schemas.Token)
-def login(form: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.username == form.username).first()
-    if not user or not pwd_ctx.verify(form.password, user.password):
-        raise HTTPException(status_code=400, detail="Incorrect username or password")
+async def login(form: OAuth2PasswordRequestForm = Depends(), db: DbSession = Depends(get_session)):
+    started = time.perf_counter()
+    try:
+        user = await run_db(db, crud.get_user_by_username, form.username)
+        ok, new_hash = False, None
+        if user:
+            try:
+                ok, new_hash = await password_pool.verify_and_update(form.password, user.password)
+            except PasswordPoolSaturated:
+                raise pool_busy()
+        if not ok:
+            LOGIN_FAILURES.inc()
+            raise HTTPException(status_code=400, detail="Incorrect username or password")
+        if new_hash is not None:
+            # сохранённый хэш устарел (сменился BCRYPT_ROUNDS) — обновляем
+            await run_db(db, crud.update_user_password, user.id, new_hash)
+
+        token = user_token(user)
+        return {"access_token": token, "token_type": "bearer", "role": user.role}
+    finally:
+        LOGIN_SECONDS.observe(time.perf_counter() - started)
+
 
-    token = create_access_token({"sub": user.username})
-    return {"access_token": token, "token_type": "bearer", "role": user.role}
+# ---------- текущий пользователь ----------
+@router.get("/me", response_model=schemas.UserOut)
+async def me(principal: Principal = Depends(get_current_user)):
+    """Данные из токена — без обращения к БД."""
+    return principal
@@ -0,0 +1,14 @@
+# app/routes/metrics.py
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app import metrics
+
+router = APIRouter(tags=["metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", response_class=PlainTextResponse, summary="Метрики в формате Prometheus")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,60 +1,298 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+import asyncio
+import base64
 import json
+from datetime import datetime
+from typing import Literal, Optional, Union
 
-from app import models, schemas
-from app.dependencies import get_db, get_current_user
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import TypeAdapter
+
+from app import crud, models, schemas, submissions
+from app.config import (
+    ML_BATCH_ENABLED, ML_PREDICT_ON_SUBMIT, ML_PREDICT_TIMEOUT, PREDICT_BATCH_MAX,
+    SUBMIT_BATCH_MAX, SUBMIT_QUEUE_ENABLED, SUBMIT_QUEUE_TIMEOUT,
+)
+from app.dependencies import DbSession, get_session, get_current_user, run_db
+from app.submit_queue import QueueFull, get_submission_queue
+from app.responses import FastJSONResponse, json_bytes_response, render
+from app.survey_cache import current_version, get_survey_count, get_survey_snapshot, survey_cache
+from app.user_cache import Principal
 
 router = APIRouter(prefix="/surveys", tags=["surveys"])
 
 # ---------- CRUD опросов (админ) ----------
 
-@router.get("/", response_model=list[schemas.SurveyOut])
-def list_surveys(db: Session = Depends(get_db)):
-    return db.query(models.Survey).all()
+def encode_cursor(survey: models.Survey) -> str:
+    raw = json.dumps([survey.created_at.isoformat(), survey.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, survey_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(survey_id)
+    except (ValueError, TypeError):
+        raise HTTPException(400, "Invalid cursor")
+
+
+SURVEY_OUT = TypeAdapter(schemas.SurveyOut)
+CATALOG_PAGE = {
+    "full": TypeAdapter(list[schemas.SurveyOut]),
+    "summary": TypeAdapter(list[schemas.SurveySummaryOut]),
+}
+
+
+@router.get(
+    "/",
+    response_model=Union[list[schemas.SurveyOut], list[schemas.SurveySummaryOut]],
+)
+async def list_surveys(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor предыдущей страницы"),
+    fields: Literal["full", "summary"] = Query(
+        "full", description="summary — без вопросов"
+    ),
+    db: DbSession = Depends(get_session),
+):
+    """
+    Каталог опросов постранично (keyset по created_at, id).
+    Курсор следующей страницы — в заголовке X-Next-Cursor,
+    общее число опросов — в X-Total-Count.
+    Готовая страница кэшируется байтами до следующей правки опросов.
+    """
+    key = ("page", limit, cursor, fields, await current_version(db))
+    cached = survey_cache.entries.get(key)
+    if cached is None:
+        after = decode_cursor(cursor) if cursor else None
+        page = await run_db(db, crud.get_surveys_page, limit, after, fields == "full")
+
+        headers = {"X-Total-Count": str(await get_survey_count(db))}
+        if len(page) > limit:
+            page = page[:limit]
+            headers["X-Next-Cursor"] = encode_cursor(page[-1])
+        cached = (render(CATALOG_PAGE[fields], page), headers)
+        survey_cache.entries.set(key, cached)
+    body, headers = cached
+    return json_bytes_response(body, headers)
 
 
 @router.get("/{survey_id}", response_model=schemas.SurveyOut)
-def get_survey(survey_id: int, db: Session = Depends(get_db)):
-    survey = db.get(models.Survey, survey_id)
+async def get_survey(survey_id: int, db: DbSession = Depends(get_session)):
+    survey = await get_survey_snapshot(db, survey_id)
     if not survey:
         raise HTTPException(status_code=404, detail="Survey not found")
-    return survey
+    key = ("json", survey_id, survey.version)
+    body = survey_cache.entries.get(key)
+    if body is None:
+        body = render(SURVEY_OUT, survey)
+        survey_cache.entries.set(key, body)
+    return json_bytes_response(body)
 
 
 # ---------- отправка результатов ----------
 
 @router.post("/{survey_id}/submit", response_model=schemas.SurveyResponseOut)
-def submit(
+async def submit(
     survey_id: int,
     payload: schemas.SurveySubmit,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    db: DbSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_user),
 ):
-    survey = db.get(models.Survey, survey_id)
+    survey = await get_survey_snapshot(db, survey_id)
     if not survey:
         raise HTTPException(404, "Survey not found")
+    question_ids = survey.question_ids
 
-    # 1. валидируем диапазоны
-    answers_dict = {a.question_id: a.answer_value for a in payload.answers}
-    total = sum(answers_dict.values())
-
-    # 2. ищем рекомендацию
-    recommendation = None
-    for rng in survey.ranges:
-        if rng.min_score <= total <= rng.max_score:
-            recommendation = rng.message
-            break
-
-    response = models.SurveyResponse(
-        survey_id=survey_id,
-        user_id=current_user.id,
-        respondent_name=payload.respondent_name,
-        answers_raw=json.dumps(answers_dict),
-        total_score=total,
-        recommendation=recommendation,
-    )
-    db.add(response)
-    db.commit()
-    db.refresh(response)
+    # 1. валидируем ответы, 2. считаем сумму и ищем рекомендацию
+    try:
+        prepared = survey.plan.prepare(payload, current_user.id)
+    except submissions.SubmissionError as exc:
+        raise HTTPException(422, str(exc))
+
+    if SUBMIT_QUEUE_ENABLED:
+        # групповая запись: ждём commit своей группы
+        try:
+            future = get_submission_queue().submit(survey_id, question_ids, prepared)
+        except QueueFull as exc:
+            raise HTTPException(503, str(exc), headers={"Retry-After": "1"})
+        committed = asyncio.wrap_future(future)
+        try:
+            # shield: отмена ожидания не должна отменять саму запись
+            response = await asyncio.wait_for(asyncio.shield(committed), SUBMIT_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            # писатель ещё не взял ответ — снимаем его с очереди: ничего не
+            # записано, и повтор клиента безопасен
+            if future.cancel():
+                raise HTTPException(
+                    503, "Submission queue is busy, nothing was written",
+                    headers={"Retry-After": "1"},
+                )
+            # ответ уже пишется: дожидаемся commit, иначе повтор дал бы дубликат
+            response = await committed
+    else:
+        (response,) = await run_db(
+            db, submissions.commit_submissions, survey_id, question_ids, [prepared]
+        )
+    (response,) = await with_predictions(survey, [prepared], [response])
     return response
+
+
+@router.post("/{survey_id}/submit/batch", response_model=schemas.SurveyBatchResult)
+async def submit_batch(
+    survey_id: int,
+    payloads: list[schemas.SurveySubmit],
+    db: DbSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Пакетная отправка (планшеты, офлайн-клиенты): опрос загружается один
+    раз, все корректные ответы пишутся одной транзакцией, по каждому
+    элементу возвращается результат или ошибка.
+    """
+    if len(payloads) > SUBMIT_BATCH_MAX:
+        raise HTTPException(
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            f"Batch is limited to {SUBMIT_BATCH_MAX} submissions",
+        )
+    survey = await get_survey_snapshot(db, survey_id)
+    if not survey:
+        raise HTTPException(404, "Survey not found")
+    question_ids = survey.question_ids
+
+    results = []
+    prepared, prepared_index = [], []
+    for index, item in enumerate(survey.plan.prepare_many(payloads, current_user.id)):
+        if isinstance(item, submissions.SubmissionError):
+            results.append(schemas.SurveyBatchItemResult(index=index, error=str(item)))
+        else:
+            prepared.append(item)
+            prepared_index.append(index)
+
+    saved = await run_db(
+        db, submissions.commit_submissions, survey_id, question_ids, prepared
+    )
+    saved = await with_predictions(survey, prepared, saved)
+
+    results.extend(
+        schemas.SurveyBatchItemResult(index=index, response=response)
+        for index, response in zip(prepared_index, saved)
+    )
+    results.sort(key=lambda r: r.index)
+    return schemas.SurveyBatchResult(
+        created=len(saved), failed=len(payloads) - len(saved), results=results
+    )
+
+
+# ---------- предсказание категории (app/ml) ----------
+
+# app.ml (NumPy, модель) импортируется при первом предсказании, не при старте
+
+async def predict_one(survey, answers: dict) -> dict:
+    """
+    Одиночное предсказание: через общую пачку микро-батчера (app/ml/batcher.py)
+    или, при ML_BATCH_ENABLED=0, прямым вызовом модели.
+    """
+    from app.ml import batcher, model as ml_model
+
+    if ML_BATCH_ENABLED:
+        return await batcher.get_prediction_batcher().predict(
+            answers, survey.question_order, timeout=ML_PREDICT_TIMEOUT
+        )
+    return ml_model.predict(answers, survey.question_order)
+
+
+async def with_predictions(survey, prepared, responses):
+    """
+    При ML_PREDICT_ON_SUBMIT добавляет к сохранённым ответам категорию по
+    модели: одиночный submit — через микро-батчер, пакетный — одним
+    векторным вызовом. Запись от модели не зависит: при ошибке, отказе или
+    таймауте ответ отдаётся без категории.
+    """
+    if not ML_PREDICT_ON_SUBMIT or not responses:
+        return responses
+    from app.ml import model as ml_model
+    from app.ml.batcher import BatcherSaturated
+
+    try:
+        if len(prepared) == 1:
+            predictions = [await predict_one(survey, prepared[0].answers)]
+        else:
+            predictions = ml_model.predict([p.answers for p in prepared], survey.question_order)
+    except (ValueError, BatcherSaturated, asyncio.TimeoutError):
+        return responses
+    return [
+        response.model_copy(update={"prediction": schemas.PredictionOut(**prediction)})
+        for response, prediction in zip(responses, predictions)
+    ]
+
+
+def answers_of(payload: schemas.PredictionIn) -> dict:
+    return {a.question_id: a.answer_value for a in payload.answers}
+
+
+@router.post("/{survey_id}/predict", response_model=schemas.PredictionOut)
+async def predict(
+    survey_id: int,
+    payload: schemas.PredictionIn,
+    db: DbSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Категория респондента по ответам; ответы не сохраняются. Признаки —
+    ответы в порядке вопросов опроса, ответы на чужие вопросы игнорируются.
+    Одновременные запросы считаются общей пачкой.
+    """
+    from app.ml.batcher import BatcherSaturated
+
+    survey = await get_survey_snapshot(db, survey_id)
+    if not survey:
+        raise HTTPException(404, "Survey not found")
+    try:
+        return await predict_one(survey, answers_of(payload))
+    except ValueError as exc:
+        raise HTTPException(422, str(exc))
+    except BatcherSaturated as exc:
+        raise HTTPException(503, str(exc), headers={"Retry-After": "1"})
+    except asyncio.TimeoutError:
+        raise HTTPException(504, "Prediction timed out")
+
+
+@router.post("/{survey_id}/predict/batch", response_model=list[schemas.PredictionOut])
+async def predict_batch(
+    survey_id: int,
+    payload: schemas.PredictionBatchIn,
+    db: DbSession = Depends(get_session),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Пакетное предсказание (переоценка истории, выгрузки). Тело — матрица
+    ответов, а не список объектов: разбор 100 тыс. строк не упирается в
+    валидацию миллиона вложенных моделей. Признаки и умножение — одной
+    матрицей на весь пакет, в пуле потоков; результаты — в порядке строк.
+    """
+    if len(payload.rows) > PREDICT_BATCH_MAX:
+        raise HTTPException(
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            f"Batch is limited to {PREDICT_BATCH_MAX} rows",
+        )
+    survey = await get_survey_snapshot(db, survey_id)
+    if not survey:
+        raise HTTPException(404, "Survey not found")
+    from app.ml import model as ml_model
+
+    order = survey.question_order
+    columns = payload.question_ids if payload.question_ids is not None else order
+
+    def score():
+        features = ml_model.preprocess_rows(payload.rows, columns, order)
+        return ml_model.predict_features(features)
+
+    try:
+        results = await run_in_threadpool(score)
+    except ValueError as exc:
+        # строки разной длины или модель не подходит к опросу
+        raise HTTPException(422, str(exc))
+    # готовые словари: без повторной валидации response_model на больших пакетах
+    return FastJSONResponse(results)
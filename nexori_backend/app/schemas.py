@@ -1,7 +1,10 @@
 # app/schemas.py
 
-from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field
+import json
+from datetime import datetime
+from typing import List, Literal, Optional, Dict, Any
+
+from pydantic import BaseModel, Field, field_validator
 
 
 # --------------------------------------------
@@ -25,6 +28,10 @@ class UserOut(UserBase):
         from_attributes = True
 
 
+class UserRoleUpdate(BaseModel):
+    role: Literal["user", "admin"]
+
+
 # --------------------------------------------
 #  Token Schemas (пример, если уже были)
 # --------------------------------------------
@@ -45,6 +52,22 @@ class TokenData(BaseModel):
 # (если вы окончательно отказались от Test, их можно удалить)
 
 
+# --------------------------------------------
+#  Диапазоны результатов (баллы → рекомендация)
+# --------------------------------------------
+class ResultRangeBase(BaseModel):
+    min_score: int
+    max_score: int
+    message: str
+    
+class ResultRangeCreate(ResultRangeBase):
+    survey_id: int
+    
+class ResultRangeOut(ResultRangeBase):
+    id: int
+    class Config: from_attributes = True
+
+
 # --------------------------------------------
 #  Survey Schemas
 # --------------------------------------------
@@ -108,6 +131,9 @@ class SurveyCreate(SurveyBase):
     questions: List[SurveyQuestionCreate] = Field(
         ..., description="Список вопросов для опроса"
     )
+    ranges: List[ResultRangeBase] = Field(
+        [], description="Диапазоны баллов и рекомендации"
+    )
 
 
 class SurveyUpdate(BaseModel):
@@ -120,6 +146,9 @@ class SurveyUpdate(BaseModel):
     questions: Optional[List[SurveyQuestionCreate]] = Field(
         None, description="Новый список вопросов"
     )
+    ranges: Optional[List[ResultRangeBase]] = Field(
+        None, description="Новый список диапазонов"
+    )
 
 
 class SurveyOut(SurveyBase):
@@ -135,6 +164,26 @@ class SurveyOut(SurveyBase):
         from_attributes = True
 
 
+class SurveySummaryOut(SurveyBase):
+    """
+    Краткая карточка опроса для каталога (fields=summary): без вопросов.
+    """
+    id: int
+    created_at: Optional[Any] = Field(None, description="Дата/время создания")
+
+    class Config:
+        from_attributes = True
+
+
+class AdminSurveyOut(SurveyOut):
+    """
+    Ответ админских ручек: опрос с диапазонами и предупреждениями
+    проверки (дыры между диапазонами, непокрытые суммы).
+    """
+    ranges: List[ResultRangeOut] = []
+    warnings: List[str] = []
+
+
 # --------------------------------------------
 #  SurveyResponse Schemas (ответ пользователя)
 # --------------------------------------------
@@ -156,6 +205,32 @@ class SurveySubmit(BaseModel):
     answers: List[SurveyAnswer] = Field(..., description="Список ответов на вопросы")
 
 
+class PredictionIn(BaseModel):
+    """
+    Ответы для предсказания категории — как в SurveySubmit, без имени.
+    Неотвеченные вопросы допускаются.
+    """
+    answers: List[SurveyAnswer] = Field(..., description="Список ответов на вопросы")
+
+
+class PredictionOut(BaseModel):
+    """
+    Предсказанная категория и вероятности всех категорий в процентах.
+    """
+    predicted_category: str
+    probabilities: Dict[str, float] = Field(..., description="{категория: вероятность, %}")
+
+
+class PredictionBatchIn(BaseModel):
+    """
+    Пакет для предсказания матрицей: rows[i][k] — ответ i-го респондента
+    на вопрос question_ids[k] (null — нет ответа). Без question_ids
+    столбцы — вопросы опроса по возрастанию id.
+    """
+    question_ids: Optional[List[int]] = Field(None, description="Вопросы столбцов rows")
+    rows: List[List[Optional[int]]] = Field(..., description="Ответы построчно")
+
+
 class SurveyResponseOut(BaseModel):
     """
     Схема, которую возвращаем после удачной записи ответов:
@@ -168,20 +243,67 @@ class SurveyResponseOut(BaseModel):
     total_score: int
     recommendation: Optional[str] = None
     created_at: Optional[Any] = None
+    prediction: Optional[PredictionOut] = Field(
+        None, description="Категория по модели, если включён ML_PREDICT_ON_SUBMIT"
+    )
 
     class Config:
         from_attributes = True
 
 
 
-class ResultRangeBase(BaseModel):
-    min_score: int
-    max_score: int
-    message: str
-    
-class ResultRangeCreate(ResultRangeBase):
-    survey_id: int
-    
-class ResultRangeOut(ResultRangeBase):
+class SurveyBatchItemResult(BaseModel):
+    """
+    Результат по одному элементу пакетной отправки:
+    либо сохранённый ответ, либо текст ошибки.
+    """
+    index: int = Field(..., description="Позиция элемента в запросе")
+    response: Optional[SurveyResponseOut] = None
+    error: Optional[str] = None
+
+
+class SurveyBatchResult(BaseModel):
+    """
+    Ответ на пакетную отправку: сколько сохранено, сколько отклонено
+    и результаты по каждому элементу в исходном порядке.
+    """
+    created: int
+    failed: int
+    results: List[SurveyBatchItemResult]
+
+
+# --------------------------------------------
+#  Импорт ответов
+# --------------------------------------------
+class ImportReject(BaseModel):
+    row: int = Field(..., description="Номер строки данных источника (с 1, без заголовка)")
+    error: str
+
+
+class ImportJobOut(BaseModel):
+    """
+    Состояние задания импорта. rows_done — контрольная точка: при повторной
+    загрузке того же источника с job_id эти строки пропускаются.
+    """
     id: int
-    class Config: from_attributes = True
+    survey_id: int
+    format: str
+    source: Optional[str] = None
+    status: str
+    rows_done: int
+    imported: int
+    rejected: int
+    rejects: List[ImportReject] = Field(
+        default_factory=list, description="Первые IMPORT_MAX_REJECTS отклонённых строк"
+    )
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    @field_validator("rejects", mode="before")
+    @classmethod
+    def decode_rejects(cls, value):
+        return json.loads(value) if isinstance(value, str) else value
+
+    class Config:
+        from_attributes = True
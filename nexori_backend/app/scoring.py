@@ -0,0 +1,208 @@
+# app/scoring.py
+"""
+Скомпилированный план оценки опроса.
+
+План строится один раз на версию опроса (хранится в SurveySnapshot) и
+содержит всё, что нужно submit: таблицу question_id → (min, max) для
+проверки ответа за O(1) и отсортированные диапазоны результатов для
+поиска рекомендации бисекцией. prepare_many оценивает сразу много
+ответов массивами NumPy (пакетная отправка, импорт).
+
+check_survey проверяет вопросы и диапазоны при сохранении опроса:
+пересечения диапазонов — ошибка, дыры и непокрытые суммы — предупреждения.
+"""
+from bisect import bisect_right
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from app import schemas
+from app.submissions import PreparedSubmission, SubmissionError
+
+
+class ScoringPlan:
+    def __init__(self, questions: Iterable, ranges: Iterable):
+        questions = list(questions)
+        ranges = list(ranges)
+        self.bounds = {q.id: (q.min_value, q.max_value) for q in questions}
+
+        # массивы для векторного пути, по возрастанию question_id
+        ordered_q = sorted(questions, key=lambda q: q.id)
+        self._q_ids = np.array([q.id for q in ordered_q], dtype=np.int64)
+        self._q_min = np.array([_or(q.min_value, np.iinfo(np.int64).min) for q in ordered_q],
+                               dtype=np.int64)
+        self._q_max = np.array([_or(q.max_value, np.iinfo(np.int64).max) for q in ordered_q],
+                               dtype=np.int64)
+
+        ordered_r = sorted(ranges, key=lambda r: (r.min_score, r.max_score))
+        self._starts = [r.min_score for r in ordered_r]
+        self._ends = [r.max_score for r in ordered_r]
+        self._messages = [r.message for r in ordered_r]
+        self._starts_arr = np.array(self._starts, dtype=np.int64)
+        self._ends_arr = np.array(self._ends, dtype=np.int64)
+        # Старые опросы могли сохраниться с пересечениями — для них
+        # сохраняем прежнюю семантику «первый подходящий по порядку».
+        self._legacy_ranges = ranges if _has_overlaps(ordered_r) else None
+
+    # ---------- один ответ ----------
+    def recommend(self, total: int) -> Optional[str]:
+        if self._legacy_ranges is not None:
+            for rng in self._legacy_ranges:
+                if rng.min_score <= total <= rng.max_score:
+                    return rng.message
+            return None
+        i = bisect_right(self._starts, total) - 1
+        if i >= 0 and total <= self._ends[i]:
+            return self._messages[i]
+        return None
+
+    def prepare(self, payload: schemas.SurveySubmit,
+                user_id: Optional[int] = None) -> PreparedSubmission:
+        """Проверяет ответы, считает сумму и подбирает рекомендацию."""
+        answers = {}
+        bounds = self.bounds
+        for a in payload.answers:
+            limits = bounds.get(a.question_id)
+            if limits is None:
+                raise SubmissionError(f"Unknown question_id {a.question_id}")
+            if a.question_id in answers:
+                raise SubmissionError(f"Duplicate answer for question_id {a.question_id}")
+            low, high = limits
+            if (low is not None and a.answer_value < low) or \
+                    (high is not None and a.answer_value > high):
+                raise SubmissionError(
+                    f"Answer {a.answer_value} for question_id {a.question_id} "
+                    f"is outside [{low}, {high}]"
+                )
+            answers[a.question_id] = a.answer_value
+        total = sum(answers.values())
+        return PreparedSubmission(payload.respondent_name, answers, total,
+                                  self.recommend(total), user_id)
+
+    # ---------- много ответов сразу ----------
+    def prepare_many(
+        self, payloads: Sequence[schemas.SurveySubmit], user_id: Optional[int] = None
+    ) -> List[Union[PreparedSubmission, SubmissionError]]:
+        """
+        Векторный вариант prepare: проверка границ, суммы и поиск
+        рекомендаций — операциями над массивами. Возвращает по элементу
+        на payload: PreparedSubmission или SubmissionError.
+        """
+        n = len(payloads)
+        if not n:
+            return []
+        sub_idx = np.repeat(np.arange(n), [len(p.answers) for p in payloads])
+        q_ids = np.fromiter((a.question_id for p in payloads for a in p.answers),
+                            dtype=np.int64, count=len(sub_idx))
+        values = np.fromiter((a.answer_value for p in payloads for a in p.answers),
+                             dtype=np.int64, count=len(sub_idx))
+
+        if len(self._q_ids):
+            col = np.minimum(np.searchsorted(self._q_ids, q_ids), len(self._q_ids) - 1)
+            known = self._q_ids[col] == q_ids
+        else:
+            col = np.zeros_like(q_ids)
+            known = np.zeros(len(q_ids), dtype=bool)
+        outside = known & ((values < self._q_min[col]) | (values > self._q_max[col])) \
+            if len(self._q_ids) else known
+
+        # повтор вопроса внутри одного ответа: второе и следующие вхождения
+        pair = sub_idx * (len(self._q_ids) + 1) + np.where(known, col, len(self._q_ids))
+        order = np.argsort(pair, kind="stable")
+        repeated = np.zeros(len(pair), dtype=bool)
+        repeated[order[1:]] = pair[order[1:]] == pair[order[:-1]]
+        repeated &= known
+
+        # как в prepare: ошибка по первому проблемному ответу, проверки
+        # в порядке «неизвестный вопрос → повтор → выход за границы»
+        errors = [None] * n
+        for i in np.flatnonzero(~known | repeated | outside):
+            s = sub_idx[i]
+            if errors[s] is not None:
+                continue
+            q_id, value = int(q_ids[i]), int(values[i])
+            if not known[i]:
+                errors[s] = SubmissionError(f"Unknown question_id {q_id}")
+            elif repeated[i]:
+                errors[s] = SubmissionError(f"Duplicate answer for question_id {q_id}")
+            else:
+                low, high = self.bounds[q_id]
+                errors[s] = SubmissionError(
+                    f"Answer {value} for question_id {q_id} is outside [{low}, {high}]"
+                )
+
+        totals = np.bincount(sub_idx, weights=values, minlength=n).astype(np.int64)
+        messages = self._recommend_many(totals)
+
+        result = []
+        offsets = np.concatenate(([0], np.cumsum([len(p.answers) for p in payloads])))
+        for i, payload in enumerate(payloads):
+            if errors[i] is not None:
+                result.append(errors[i])
+                continue
+            start, end = offsets[i], offsets[i + 1]
+            answers = dict(zip(q_ids[start:end].tolist(), values[start:end].tolist()))
+            result.append(PreparedSubmission(payload.respondent_name, answers,
+                                             int(totals[i]), messages[i], user_id))
+        return result
+
+    def _recommend_many(self, totals: np.ndarray) -> List[Optional[str]]:
+        if self._legacy_ranges is not None:
+            return [self.recommend(int(t)) for t in totals]
+        i = np.searchsorted(self._starts_arr, totals, side="right") - 1
+        hit = (i >= 0) & (totals <= self._ends_arr[np.maximum(i, 0)]) if len(self._starts) \
+            else np.zeros(len(totals), dtype=bool)
+        return [self._messages[j] if ok else None for j, ok in zip(i.tolist(), hit.tolist())]
+
+
+def _or(value, default):
+    return default if value is None else value
+
+
+def _has_overlaps(ordered_ranges) -> bool:
+    return any(
+        nxt.min_score <= cur.max_score
+        for cur, nxt in zip(ordered_ranges, ordered_ranges[1:])
+    )
+
+
+def check_survey(questions: Iterable, ranges: Iterable) -> Tuple[List[str], List[str]]:
+    """
+    Проверка опроса перед сохранением. Возвращает (ошибки, предупреждения).
+    Ошибки: перевёрнутые границы вопросов/диапазонов, пересечения диапазонов.
+    Предупреждения: дыры между диапазонами и суммы, не покрытые ни одним.
+    """
+    errors, warnings = [], []
+    questions = list(questions)
+    for i, q in enumerate(questions):
+        if q.min_value is not None and q.max_value is not None and q.min_value > q.max_value:
+            errors.append(f"Question #{i + 1}: min_value {q.min_value} > max_value {q.max_value}")
+
+    ordered = sorted(ranges, key=lambda r: (r.min_score, r.max_score))
+    for r in ordered:
+        if r.min_score > r.max_score:
+            errors.append(f"Range [{r.min_score}, {r.max_score}]: min_score > max_score")
+    for cur, nxt in zip(ordered, ordered[1:]):
+        if nxt.min_score <= cur.max_score:
+            errors.append(
+                f"Ranges [{cur.min_score}, {cur.max_score}] and "
+                f"[{nxt.min_score}, {nxt.max_score}] overlap"
+            )
+        elif nxt.min_score > cur.max_score + 1:
+            warnings.append(
+                f"Scores {cur.max_score + 1}..{nxt.min_score - 1} have no recommendation"
+            )
+
+    if ordered and questions and all(
+        q.min_value is not None and q.max_value is not None for q in questions
+    ):
+        lowest = sum(q.min_value for q in questions)
+        highest = sum(q.max_value for q in questions)
+        if ordered[0].min_score > lowest:
+            warnings.append(
+                f"Scores {lowest}..{ordered[0].min_score - 1} have no recommendation"
+            )
+        top = max(r.max_score for r in ordered)
+        if top < highest:
+            warnings.append(f"Scores {top + 1}..{highest} have no recommendation")
+    return errors, warnings
@@ -0,0 +1,127 @@
+# app/submissions.py
+"""
+Сохранение ответов на опрос.
+
+Проверку и оценку делает ScoringPlan (app/scoring.py), а
+save_submissions пишет любое количество подготовленных ответов пачкой:
+один executemany в survey_responses, один в survey_answers и одно
+обновление агрегатов по вопросам и по интервалам времени. Одиночный submit — частный случай пачки из одного,
+импорт (app/importer.py) — пачки по несколько тысяч через insert_submissions.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app import aggregates, models, schemas
+
+
+class SubmissionError(ValueError):
+    """Ответ не прошёл проверку; текст уходит клиенту."""
+
+
+@dataclass
+class PreparedSubmission:
+    respondent_name: str
+    answers: Dict[int, int]
+    total_score: int
+    recommendation: Optional[str]
+    user_id: Optional[int] = None
+    created_at: Optional[datetime] = None     # задаётся при импорте истории
+
+
+def insert_submissions(
+    db: Session,
+    survey_id: int,
+    question_ids: Set[int],
+    prepared: List[PreparedSubmission],
+) -> List[int]:
+    """
+    Пишет подготовленные ответы в текущую транзакцию (commit — на вызывающем)
+    и возвращает их id в том же порядке. Ответам без created_at проставляется
+    текущее время.
+    """
+    if not prepared:
+        return []
+    now = datetime.utcnow()
+    for p in prepared:
+        if p.created_at is None:
+            p.created_at = now
+    # Core-вставки через соединение сессии: ORM-путь bulk insert на пачках
+    # в тысячи строк тратит на разбор параметров больше, чем сама запись
+    conn = db.connection()
+    response = models.SurveyResponse.__table__
+    ids = _insert_returning_ids(conn, response, [
+        {
+            "survey_id": survey_id,
+            "user_id": p.user_id,
+            "respondent_name": p.respondent_name,
+            "total_score": p.total_score,
+            "recommendation": p.recommendation,
+            "created_at": p.created_at,
+        }
+        for p in prepared
+    ])
+
+    answer_rows = [
+        {"response_id": response_id, "survey_id": survey_id,
+         "question_id": question_id, "value": value}
+        for response_id, p in zip(ids, prepared)
+        for question_id, value in p.answers.items()
+    ]
+    if answer_rows:
+        conn.execute(insert(models.SurveyAnswer.__table__), answer_rows)
+    aggregates.update_question_stats(db, survey_id, question_ids,
+                                     [p.answers for p in prepared])
+    aggregates.update_rollups(db, survey_id, [
+        (p.created_at, p.total_score, p.recommendation) for p in prepared
+    ])
+    return ids
+
+
+def _insert_returning_ids(conn, table, rows: List[dict]) -> List[int]:
+    """id вставленных строк в порядке rows."""
+    if conn.dialect.name == "sqlite":
+        # С sort_by_parameter_order SQLite выполняет INSERT построчно. Под
+        # блокировкой записи rowid выдаются подряд в порядке VALUES, так что
+        # пачке хватает обычного RETURNING и сортировки.
+        return sorted(row.id for row in conn.execute(insert(table).returning(table.c.id), rows))
+    stmt = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+    return [row.id for row in conn.execute(stmt, rows)]
+
+
+def save_submissions(
+    db: Session,
+    survey_id: int,
+    question_ids: Set[int],
+    prepared: List[PreparedSubmission],
+) -> List[schemas.SurveyResponseOut]:
+    """
+    Как insert_submissions, но возвращает готовые SurveyResponseOut.
+    """
+    ids = insert_submissions(db, survey_id, question_ids, prepared)
+    return [
+        schemas.SurveyResponseOut(
+            id=response_id,
+            respondent_name=p.respondent_name,
+            answers=p.answers,
+            total_score=p.total_score,
+            recommendation=p.recommendation,
+            created_at=p.created_at,
+        )
+        for response_id, p in zip(ids, prepared)
+    ]
+
+
+def commit_submissions(
+    db: Session,
+    survey_id: int,
+    question_ids: Set[int],
+    prepared: List[PreparedSubmission],
+) -> List[schemas.SurveyResponseOut]:
+    """save_submissions + commit — одна единица работы для run_db."""
+    saved = save_submissions(db, survey_id, question_ids, prepared)
+    db.commit()
+    return saved
@@ -0,0 +1,235 @@
+# app/submit_queue.py
+"""
+Групповая запись ответов (group commit).
+
+Обработчик submit кладёт уже проверенный ответ в очередь и ждёт Future.
+Фоновый поток-писатель собирает ответы, пока не наберётся max_batch или
+не пройдёт max_delay, и пишет всю группу одной транзакцией через
+submissions.save_submissions. Клиент получает ответ только после commit
+своей группы. Переполненная очередь сразу отказывает (QueueFull), при
+остановке очередь дописывается до конца.
+
+Писатель забирает ответ в группу через Future.set_running_or_notify_cancel:
+пока ответ не забран, его Future можно отменить (cancel() == True), и
+тогда он не будет записан; после этого cancel() уже не проходит.
+
+Включается через SUBMIT_QUEUE_ENABLED.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from dataclasses import dataclass, field
+from typing import List, Optional, Set
+
+from app import config
+from app.database import SessionLocal
+from app.logger import logger
+from app.submissions import PreparedSubmission, save_submissions
+
+
+class QueueFull(Exception):
+    """Очередь записи переполнена — клиенту стоит повторить позже."""
+
+
+@dataclass
+class _Item:
+    survey_id: int
+    question_ids: Set[int]
+    prepared: PreparedSubmission
+    future: Future = field(default_factory=Future)
+
+
+_STOP = object()
+
+
+class SubmissionQueue:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        max_batch: int = 200,
+        max_delay: float = 0.005,
+        max_size: int = 5000,
+    ):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: queue.Queue = queue.Queue(maxsize=max_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self.batches_committed = 0
+
+    # ---------- сторона обработчиков ----------
+    def submit(
+        self,
+        survey_id: int,
+        question_ids: Set[int],
+        prepared: PreparedSubmission,
+        put_timeout: float = 0,
+    ) -> Future:
+        """
+        Ставит ответ в очередь. Future получает SurveyResponseOut после
+        commit группы или исключение, если запись не удалась. Успешный
+        future.cancel() снимает ответ с очереди — он не будет записан.
+        """
+        if self._closed:
+            raise QueueFull("Submission queue is shutting down")
+        self._ensure_started()
+        item = _Item(survey_id, question_ids, prepared)
+        try:
+            if put_timeout:
+                self._queue.put(item, timeout=put_timeout)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            raise QueueFull("Submission queue is full")
+        return item.future
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._closed:
+                raise QueueFull("Submission queue is shutting down")
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="submission-writer", daemon=True
+                )
+                self._thread.start()
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Перестаёт принимать ответы и дописывает всё, что уже в очереди.
+        """
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    # ---------- поток-писатель ----------
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            if not _claim(item):
+                continue
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 \
+                        else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                if _claim(item):
+                    batch.append(item)
+            self._commit(batch)
+
+        # то, что успело попасть в очередь после _STOP
+        leftovers = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP and _claim(item):
+                leftovers.append(item)
+        for start in range(0, len(leftovers), self.max_batch):
+            self._commit(leftovers[start:start + self.max_batch])
+
+    def _commit(self, batch: List[_Item]) -> None:
+        try:
+            results = self._write(batch)
+        except Exception:
+            logger.exception("Групповая запись не удалась, пишем по одному (%s)", len(batch))
+            for item in batch:
+                try:
+                    (result,) = self._write([item])
+                except Exception as exc:
+                    _resolve(item.future, exception=exc)
+                else:
+                    _resolve(item.future, result)
+            return
+        for item, result in zip(batch, results):
+            _resolve(item.future, result)
+
+    def _write(self, batch: List[_Item]) -> list:
+        """
+        Одна транзакция на всю группу; внутри — по пачке на опрос.
+        Возвращает результаты в порядке batch.
+        """
+        by_survey = {}
+        for position, item in enumerate(batch):
+            by_survey.setdefault(item.survey_id, []).append(position)
+
+        results = [None] * len(batch)
+        db = self.session_factory()
+        try:
+            for survey_id, positions in by_survey.items():
+                saved = save_submissions(
+                    db,
+                    survey_id,
+                    batch[positions[0]].question_ids,
+                    [batch[p].prepared for p in positions],
+                )
+                for position, result in zip(positions, saved):
+                    results[position] = result
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        self.batches_committed += 1
+        return results
+
+
+def _claim(item: _Item) -> bool:
+    """Забирает ответ в запись; False — ожидающий уже отменил его Future."""
+    return item.future.set_running_or_notify_cancel()
+
+
+def _resolve(future: Future, result=None, exception: Optional[BaseException] = None) -> None:
+    """Ожидающий мог уже отменить Future — тогда результат просто не нужен."""
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+_submission_queue: Optional[SubmissionQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_submission_queue() -> SubmissionQueue:
+    global _submission_queue
+    if _submission_queue is None:
+        with _queue_lock:
+            if _submission_queue is None:
+                _submission_queue = SubmissionQueue(
+                    max_batch=config.SUBMIT_QUEUE_MAX_BATCH,
+                    max_delay=config.SUBMIT_QUEUE_MAX_DELAY_MS / 1000,
+                    max_size=config.SUBMIT_QUEUE_MAX_SIZE,
+                )
+    return _submission_queue
+
+
+def shutdown_submission_queue(timeout: Optional[float] = None) -> None:
+    global _submission_queue
+    with _queue_lock:
+        current, _submission_queue = _submission_queue, None
+    if current is not None:
+        current.close(timeout)
@@ -0,0 +1,152 @@
+# app/survey_cache.py
+"""
+Кэш определений опросов в памяти процесса.
+
+Опрос, его вопросы и диапазоны меняются раз в неделю, а читаются тысячи
+раз в минуту (GET /surveys/{id}, каждый submit). Здесь хранятся
+неизменяемые снимки SurveySnapshot (вместе со скомпилированным планом
+оценки) в LRU+TTL-кэше с ключом
+(survey_id, версия). Версия — строка "surveys" в cache_versions, её
+увеличивает каждая запись админки. Воркер сверяет версию не чаще раза в
+CACHE_VERSION_POLL_INTERVAL: при изменении кэш сбрасывается, так что
+правка в одном воркере видна остальным не позже чем через интервал.
+Горячие опросы между сверками читаются без обращения к БД.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from functools import cached_property
+from typing import TYPE_CHECKING, FrozenSet, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app import config, crud, metrics
+from app.cache import VersionedCache
+from app.dependencies import run_db
+
+if TYPE_CHECKING:
+    from app.scoring import ScoringPlan
+
+SURVEYS_VERSION = "surveys"
+
+
+@dataclass(frozen=True)
+class QuestionSnapshot:
+    id: int
+    text: str
+    min_value: int
+    max_value: int
+
+
+@dataclass(frozen=True)
+class RangeSnapshot:
+    id: int
+    min_score: int
+    max_score: int
+    message: str
+
+
+@dataclass(frozen=True)
+class SurveySnapshot:
+    id: int
+    title: str
+    description: Optional[str]
+    created_at: Optional[datetime]
+    version: int
+    questions: Tuple[QuestionSnapshot, ...]
+    ranges: Tuple[RangeSnapshot, ...]
+
+    @cached_property
+    def question_ids(self) -> FrozenSet[int]:
+        return frozenset(q.id for q in self.questions)
+
+    @cached_property
+    def question_order(self) -> Tuple[int, ...]:
+        """Порядок вопросов для признаков модели (app/ml): по возрастанию id."""
+        return tuple(sorted(self.question_ids))
+
+    @cached_property
+    def plan(self) -> "ScoringPlan":
+        """План оценки компилируется один раз на снимок (версию) опроса."""
+        # NumPy — при первом submit, а не при импорте (чтение опросов без него)
+        from app.scoring import ScoringPlan
+
+        return ScoringPlan(self.questions, self.ranges)
+
+
+def load_survey_snapshot(db: Session, survey_id: int, version: int) -> Optional[SurveySnapshot]:
+    survey = crud.get_survey_full(db, survey_id)
+    if survey is None:
+        return None
+    return SurveySnapshot(
+        id=survey.id,
+        title=survey.title,
+        description=survey.description,
+        created_at=survey.created_at,
+        version=version,
+        questions=tuple(
+            QuestionSnapshot(q.id, q.text, q.min_value, q.max_value)
+            for q in survey.questions
+        ),
+        ranges=tuple(
+            RangeSnapshot(r.id, r.min_score, r.max_score, r.message)
+            for r in survey.ranges
+        ),
+    )
+
+
+class SurveyCache(VersionedCache):
+    def get_sync(self, db: Session, survey_id: int) -> Optional[SurveySnapshot]:
+        """Вариант для синхронного кода (CLI, фоновые задачи)."""
+        if self.poll_due():
+            self.observe_version(crud.get_cache_version(db, SURVEYS_VERSION))
+        key = (survey_id, self.version)
+        snapshot = self.entries.get(key)
+        if snapshot is None:
+            snapshot = load_survey_snapshot(db, survey_id, self.version)
+            if snapshot is not None:
+                self.entries.set(key, snapshot)
+        return snapshot
+
+
+survey_cache = SurveyCache(
+    maxsize=config.SURVEY_CACHE_SIZE,
+    ttl=config.SURVEY_CACHE_TTL,
+    poll_interval=config.CACHE_VERSION_POLL_INTERVAL,
+)
+metrics.register_cache("surveys", survey_cache.entries)
+
+
+async def current_version(db) -> Optional[int]:
+    """Версия опросов с ленивой сверкой: БД — не чаще раза в интервал."""
+    cache = survey_cache
+    if cache.poll_due():
+        cache.observe_version(await run_db(db, crud.get_cache_version, SURVEYS_VERSION))
+    return cache.version
+
+
+async def get_survey_snapshot(db, survey_id: int) -> Optional[SurveySnapshot]:
+    """
+    Снимок опроса для обработчиков. БД трогается только при промахе
+    или когда подошло время сверить версию.
+    """
+    version = await current_version(db)
+    key = (survey_id, version)
+    snapshot = survey_cache.entries.get(key)
+    if snapshot is None:
+        snapshot = await run_db(db, load_survey_snapshot, survey_id, version)
+        if snapshot is not None:
+            survey_cache.entries.set(key, snapshot)
+    return snapshot
+
+
+async def get_survey_count(db) -> int:
+    """
+    Число опросов для X-Total-Count. Меняется только записями админки,
+    которые увеличивают версию, поэтому кэшируется под той же версией.
+    """
+    key = ("count", await current_version(db))
+    count = survey_cache.entries.get(key)
+    if count is None:
+        count = await run_db(db, crud.count_surveys)
+        survey_cache.entries.set(key, count)
+    return count
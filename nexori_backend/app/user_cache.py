@@ -0,0 +1,58 @@
+# app/user_cache.py
+"""
+Принципал запроса и кэш пользователей.
+
+Обычный запрос строит принципал из claims токена (uid, sub, role) без
+обращения к БД. Строка пользователя нужна только там, где роль из токена
+недостаточна (админские ручки) или токен выпущен до появления claims;
+такие чтения идут через UserCache. Его версия — строка "users" в
+cache_versions, её увеличивает crud.update_user_role, так что смена роли
+видна всем воркерам не позже чем через CACHE_VERSION_POLL_INTERVAL.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app import config, crud, metrics
+from app.cache import VersionedCache
+
+USERS_VERSION = "users"
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Кто выполняет запрос. Поля совпадают с models.User там, где их читают обработчики."""
+    id: int
+    username: str
+    role: str
+
+
+class UserCache(VersionedCache):
+    def peek(self, user_id: int) -> Optional[Principal]:
+        """Попадание без БД; None — если пора сверять версию или записи нет."""
+        if self.poll_due():
+            return None
+        return self.entries.get((user_id, self.version))
+
+    def load(self, db: Session, user_id: int) -> Optional[Principal]:
+        """Синхронная часть промаха: сверка версии и чтение строки."""
+        if self.poll_due():
+            self.observe_version(crud.get_cache_version(db, USERS_VERSION))
+        key = (user_id, self.version)
+        principal = self.entries.get(key)
+        if principal is None:
+            user = crud.get_user_by_id(db, user_id)
+            if user is None:
+                return None
+            principal = Principal(user.id, user.username, user.role)
+            self.entries.set(key, principal)
+        return principal
+
+
+user_cache = UserCache(
+    maxsize=config.USER_CACHE_SIZE,
+    ttl=config.USER_CACHE_TTL,
+    poll_interval=config.CACHE_VERSION_POLL_INTERVAL,
+)
+metrics.register_cache("users", user_cache.entries)
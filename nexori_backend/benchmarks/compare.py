@@ -0,0 +1,68 @@
+# benchmarks/compare.py
+"""
+Сравнение двух отчётов benchmarks.run.
+
+Регрессия — p95 вырос или rps упал больше чем на --threshold (доля),
+либо в новом прогоне появились ошибки. Код выхода 1 при любой
+регрессии, чтобы сравнение можно было ставить в CI.
+
+    python -m benchmarks.compare results/base.json results/new.json --threshold 0.10
+"""
+import argparse
+import json
+import sys
+from typing import List, Tuple
+
+
+def compare(base: dict, new: dict, threshold: float) -> Tuple[List[tuple], List[str]]:
+    """→ (строки таблицы, описания регрессий)."""
+    rows, regressions = [], []
+    for name, old in base["scenarios"].items():
+        cur = new["scenarios"].get(name)
+        if cur is None:
+            continue
+        p95_change = cur["p95_ms"] / old["p95_ms"] - 1 if old["p95_ms"] else 0.0
+        rps_change = cur["rps"] / old["rps"] - 1 if old["rps"] else 0.0
+        problems = []
+        if p95_change > threshold:
+            problems.append(f"p95 +{p95_change:.0%}")
+        if rps_change < -threshold:
+            problems.append(f"rps {rps_change:.0%}")
+        if cur.get("errors", 0) > old.get("errors", 0):
+            problems.append(f"ошибок {cur['errors']}")
+        rows.append((name, old["rps"], cur["rps"], rps_change,
+                     old["p95_ms"], cur["p95_ms"], p95_change, problems))
+        regressions += [f"{name}: {p}" for p in problems]
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    if base["meta"]["size"] != new["meta"]["size"]:
+        print(f"Внимание: разные наборы ({base['meta']['size']} и {new['meta']['size']})")
+
+    rows, regressions = compare(base, new, args.threshold)
+    print(f"{'сценарий':<20} {'rps':>20} {'Δ':>7} {'p95, мс':>20} {'Δ':>7}")
+    for name, old_rps, rps, d_rps, old_p95, p95, d_p95, problems in rows:
+        mark = "  РЕГРЕССИЯ" if problems else ""
+        print(f"{name:<20} {old_rps:>9.0f} → {rps:<8.0f} {d_rps:>+7.1%} "
+              f"{old_p95:>9.1f} → {p95:<8.1f} {d_p95:>+7.1%}{mark}")
+    if regressions:
+        print("\nРегрессии (порог {:.0%}):".format(args.threshold))
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
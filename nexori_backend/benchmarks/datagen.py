@@ -0,0 +1,179 @@
+# benchmarks/datagen.py
+"""
+Детерминированный генератор данных для бенчмарков.
+
+Пользователи, опросы с вопросами и диапазонами и ответы пишутся
+core-вставками пачками (без ORM-объектов), id задаются явно — ответам
+на вопросы не нужен RETURNING. Одинаковые seed и размер дают одинаковые
+данные (кроме соли bcrypt: хэш один на всех пользователей, пароль
+BENCH_PASSWORD). После загрузки пересчитываются агрегаты и rollup.
+
+    python -m benchmarks.datagen --db bench.db --size 1m
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+BENCH_PASSWORD = "bench-password"
+BASE_DATE = datetime(2024, 1, 1)
+BATCH = 20_000
+
+# размеры наборов: число ответов и сколько к ним пользователей и опросов
+SIZES = {
+    "10k": {"users": 1_000, "surveys": 20, "questions": 5, "responses": 10_000},
+    "1m": {"users": 10_000, "surveys": 100, "questions": 5, "responses": 1_000_000},
+    "10m": {"users": 100_000, "surveys": 200, "questions": 5, "responses": 10_000_000},
+}
+
+
+def _batches(rows, size=BATCH):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def generate(db_engine, users: int, surveys: int, questions: int, responses: int,
+             seed: int = 42, days: int = 90, log=print) -> dict:
+    """
+    Заполняет пустую базу. Возвращает описание набора: id опросов,
+    вопросов по опросам и имена пользователей для сценариев.
+    """
+    from sqlalchemy import insert
+    from sqlalchemy.orm import Session
+
+    from app import aggregates, models
+    from app.database import Base
+    from app.passwords import password_pool
+
+    rng = random.Random(seed)
+    Base.metadata.create_all(bind=db_engine)
+    started = time.perf_counter()
+    password = password_pool.context.hash(BENCH_PASSWORD)
+
+    def load(table, rows):
+        written = 0
+        with db_engine.begin() as conn:
+            for batch in _batches(rows):
+                conn.execute(insert(table), batch)
+                written += len(batch)
+        return written
+
+    load(models.User.__table__, (
+        {"id": i, "username": f"user{i}", "email": None, "password": password,
+         "role": "admin" if i == 1 else "user"}
+        for i in range(1, users + 1)
+    ))
+
+    survey_questions = {}
+    question_rows, range_rows = [], []
+    max_total = questions * 10
+    for s in range(1, surveys + 1):
+        ids = [(s - 1) * questions + q for q in range(1, questions + 1)]
+        survey_questions[s] = ids
+        question_rows += [
+            {"id": q, "survey_id": s, "text": f"Вопрос {q}", "min_value": 0, "max_value": 10}
+            for q in ids
+        ]
+        third = max_total // 3
+        range_rows += [
+            {"id": (s - 1) * 3 + i + 1, "survey_id": s,
+             "min_score": low, "max_score": high, "message": message}
+            for i, (low, high, message) in enumerate((
+                (0, third, "низкий"), (third + 1, 2 * third, "средний"),
+                (2 * third + 1, max_total, "высокий"),
+            ))
+        ]
+    load(models.Survey.__table__, (
+        {"id": s, "title": f"Опрос {s}", "description": None,
+         "created_at": BASE_DATE + timedelta(minutes=s)}
+        for s in range(1, surveys + 1)
+    ))
+    load(models.SurveyQuestion.__table__, question_rows)
+    load(models.SurveyResultRange.__table__, range_rows)
+
+    span = days * 86_400
+
+    def response_rows():
+        for r in range(1, responses + 1):
+            survey_id = rng.randint(1, surveys)
+            values = [rng.randint(0, 10) for _ in range(questions)]
+            yield survey_id, values, {
+                "id": r, "survey_id": survey_id, "user_id": rng.randint(1, users),
+                "respondent_name": f"respondent{r}", "total_score": sum(values),
+                "recommendation": None, "answers_raw": "",
+                "created_at": BASE_DATE + timedelta(seconds=rng.randrange(span)),
+            }
+
+    written = 0
+    with db_engine.begin() as conn:
+        for batch in _batches(response_rows()):
+            conn.execute(insert(models.SurveyResponse.__table__), [row for _, _, row in batch])
+            conn.execute(insert(models.SurveyAnswer.__table__), [
+                {"response_id": row["id"], "question_id": q, "survey_id": survey_id, "value": v}
+                for survey_id, values, row in batch
+                for q, v in zip(survey_questions[survey_id], values)
+            ])
+            written += len(batch)
+            if written % 500_000 < BATCH:
+                log(f"  ответов: {written:,}")
+
+    with Session(db_engine) as db:
+        aggregates.rebuild_question_stats(db)
+        aggregates.rebuild_rollups(db)
+
+    log(f"Готово за {time.perf_counter() - started:.1f} с")
+    return {
+        "seed": seed,
+        "users": users,
+        "surveys": surveys,
+        "questions": questions,
+        "responses": responses,
+        "survey_questions": survey_questions,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", required=True, help="путь к файлу SQLite (должен не существовать)")
+    parser.add_argument("--size", choices=sorted(SIZES), default="10k")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.db):
+        parser.error(f"{args.db} уже существует")
+    # config читается при импорте приложения: URL — до импорта
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(args.db)}"
+    from app.database import engine
+
+    dataset = generate(engine, seed=args.seed, **SIZES[args.size])
+    engine.dispose()
+    write_dataset(args.db, dataset)
+
+
+def dataset_path(db_path: str) -> str:
+    return db_path + ".json"
+
+
+def write_dataset(db_path: str, dataset: dict) -> None:
+    """Описание набора рядом с базой: сценариям не нужно его вычислять."""
+    with open(dataset_path(db_path), "w") as f:
+        json.dump(dataset, f)
+
+
+def read_dataset(db_path: str) -> dict:
+    with open(dataset_path(db_path)) as f:
+        dataset = json.load(f)
+    dataset["survey_questions"] = {int(k): v for k, v in dataset["survey_questions"].items()}
+    return dataset
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# benchmarks/load_concurrency.py
+"""
+Нагрузочный тест конкурентности: синхронный путь (DB_ASYNC=0) против
+async-слоя БД (DB_ASYNC=1) на одних и тех же запросах.
+
+Каждый режим запускается в отдельном процессе (конфиг читается при
+импорте) со своей временной SQLite-базой; приложение вызывается
+в процессе через httpx.ASGITransport, поэтому сеть и сервер не мешают
+измерению — видно именно ограничение пула потоков.
+
+    python -m benchmarks.load_concurrency --concurrency 200 --requests 4000
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.stats import percentile
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+async def _worker(concurrency: int, requests: int) -> dict:
+    import httpx
+
+    from app.database import Base, SessionLocal, engine
+    from app.main import app
+    from app import models
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    survey = models.Survey(
+        title="load", questions=[models.SurveyQuestion(text=f"q{i}") for i in range(10)]
+    )
+    db.add(survey)
+    db.commit()
+    path = f"/api/surveys/{survey.id}"
+    db.close()
+
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - started)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "rps": requests / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def run_mode(db_async: bool, concurrency: int, requests: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DB_ASYNC="1" if db_async else "0",
+                   PYTHONPATH=str(ROOT))
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.load_concurrency", "--worker",
+             "--concurrency", str(concurrency), "--requests", str(requests)],
+            cwd=tmp, env=env, check=True, capture_output=True, text=True,
+        )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(asyncio.run(_worker(args.concurrency, args.requests))))
+        return
+
+    results = {
+        "sync": run_mode(False, args.concurrency, args.requests),
+        "async": run_mode(True, args.concurrency, args.requests),
+    }
+    results["rps_gain"] = results["async"]["rps"] / results["sync"]["rps"]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# benchmarks/run.py
+"""
+Воспроизводимый прогон бенчмарков на локальной SQLite.
+
+Набор данных нужного размера генерируется один раз (benchmarks/.data,
+отдельным процессом) и дальше переиспользуется; каждый прогон работает
+на свежей копии базы, так что submit не накапливает ответы между
+прогонами. Результат — JSON с описанием окружения и сводкой по
+сценариям; два таких файла сравнивает benchmarks.compare.
+
+    python -m benchmarks.run --size 1m --out results/base.json
+    python -m benchmarks.run --size 10k --scenarios survey_read,submit --scale 0.1
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.datagen import SIZES, dataset_path, read_dataset
+from benchmarks.scenarios import SCENARIOS, run_scenarios
+
+ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = ROOT / "benchmarks" / ".data"
+
+
+def ensure_dataset(data_dir: Path, size: str, seed: int) -> Path:
+    db_path = data_dir / f"bench-{size}-{seed}.db"
+    if db_path.exists():
+        return db_path
+    data_dir.mkdir(parents=True, exist_ok=True)
+    partial = data_dir / f"{db_path.name}.partial"
+    for stale in (partial, Path(dataset_path(str(partial)))):
+        stale.unlink(missing_ok=True)
+    # stdout занят JSON-отчётом: прогресс — в stderr
+    print(f"Генерация набора {size} (seed={seed})...", file=sys.stderr)
+    subprocess.run(
+        [sys.executable, "-m", "benchmarks.datagen", "--db", str(partial),
+         "--size", size, "--seed", str(seed)],
+        cwd=ROOT, check=True, stdout=sys.stderr,
+    )
+    # описание — первым: база без него считается недогенерированной
+    os.replace(dataset_path(str(partial)), dataset_path(str(db_path)))
+    os.replace(partial, db_path)
+    return db_path
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", choices=sorted(SIZES), default="10k")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help="через запятую: " + ", ".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="множитель числа запросов каждого сценария")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    parser.add_argument("--out", type=Path, help="куда записать JSON (по умолчанию stdout)")
+    args = parser.parse_args(argv)
+
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"неизвестные сценарии: {', '.join(unknown)}")
+
+    pristine = ensure_dataset(args.data_dir, args.size, args.seed)
+    dataset = read_dataset(str(pristine))
+    workdir = tempfile.mkdtemp(prefix="nexori-bench-")
+    working = os.path.join(workdir, "bench.db")
+    shutil.copyfile(pristine, working)
+    # config читается при импорте приложения: URL — до импорта
+    os.environ["DATABASE_URL"] = f"sqlite:///{working}"
+    # лог каждого запроса и медленных выражений — заметная доля времени
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+    try:
+        from app import config
+        from app.main import app
+        from app.submit_queue import shutdown_submission_queue
+
+        print(f"Прогон {args.size}, concurrency={args.concurrency}:", file=sys.stderr)
+        results = asyncio.run(run_scenarios(
+            app, dataset, names, args.concurrency, args.scale, args.seed,
+            log=lambda line: print(line, file=sys.stderr),
+        ))
+        shutdown_submission_queue()     # lifespan через ASGITransport не запускается
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "size": args.size,
+            "seed": args.seed,
+            "concurrency": args.concurrency,
+            "scale": args.scale,
+            "dataset": {k: dataset[k] for k in ("users", "surveys", "questions", "responses")},
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "db_async": config.DB_ASYNC,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "scenarios": results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
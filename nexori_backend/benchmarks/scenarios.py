@@ -0,0 +1,163 @@
+# benchmarks/scenarios.py
+"""
+Сценарии бенчмарка. Каждый — корутина, которая делает один запрос;
+драйвер запускает её requests раз с ограничением concurrency и
+сводит латентности. Приложение вызывается в процессе через
+httpx.ASGITransport: измеряется сервис, а не сеть.
+
+Последовательность запросов детерминирована: у каждого сценария свой
+random.Random(seed).
+"""
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Dict
+
+from benchmarks.datagen import BENCH_PASSWORD
+from benchmarks.stats import summarize
+
+Request = Callable[[], Awaitable[None]]
+
+
+class Scenario:
+    def __init__(self, name: str, requests: int, build: Callable):
+        self.name = name
+        self.requests = requests      # по умолчанию; login и detailed дорогие
+        self.build = build            # (client, dataset, rng) → корутина одного запроса
+
+
+async def login_token(client, username: str) -> str:
+    response = await client.post(
+        "/api/auth/token", data={"username": username, "password": BENCH_PASSWORD}
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def _survey_read(client, dataset, rng):
+    async def one():
+        survey_id = rng.randint(1, dataset["surveys"])
+        (await client.get(f"/api/surveys/{survey_id}")).raise_for_status()
+    return one
+
+
+def _catalog(client, dataset, rng):
+    async def one():
+        (await client.get("/api/surveys/", params={"limit": 50})).raise_for_status()
+    return one
+
+
+def _submit(client, dataset, rng):
+    headers = {}
+
+    async def one():
+        if not headers:
+            headers["Authorization"] = f"Bearer {await login_token(client, 'user2')}"
+        survey_id = rng.randint(1, dataset["surveys"])
+        answers = [
+            {"question_id": q, "answer_value": rng.randint(0, 10)}
+            for q in dataset["survey_questions"][survey_id]
+        ]
+        response = await client.post(
+            f"/api/surveys/{survey_id}/submit",
+            json={"respondent_name": "bench", "answers": answers},
+            headers=headers,
+        )
+        response.raise_for_status()
+    return one
+
+
+def _predict(client, dataset, rng):
+    headers = {}
+
+    async def one():
+        if not headers:
+            headers["Authorization"] = f"Bearer {await login_token(client, 'user2')}"
+        survey_id = rng.randint(1, dataset["surveys"])
+        answers = [
+            {"question_id": q, "answer_value": rng.randint(0, 10)}
+            for q in dataset["survey_questions"][survey_id]
+        ]
+        response = await client.post(
+            f"/api/surveys/{survey_id}/predict", json={"answers": answers}, headers=headers,
+        )
+        response.raise_for_status()
+    return one
+
+
+def _login(client, dataset, rng):
+    async def one():
+        await login_token(client, f"user{rng.randint(1, dataset['users'])}")
+    return one
+
+
+def _analytics_get(path: str):
+    def build(client, dataset, rng):
+        headers = {}
+
+        async def one():
+            if not headers:
+                # аналитика — только администраторам; user1 в datagen — admin
+                headers["Authorization"] = f"Bearer {await login_token(client, 'user1')}"
+            survey_id = rng.randint(1, dataset["surveys"])
+            response = await client.get(path.format(survey_id=survey_id), headers=headers)
+            response.raise_for_status()
+        return one
+    return build
+
+
+_analytics = _analytics_get("/api/analytics/surveys/{survey_id}")
+_analytics_detailed = _analytics_get("/api/analytics/surveys/{survey_id}/detailed")
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    s.name: s for s in (
+        Scenario("survey_read", 5_000, _survey_read),
+        Scenario("catalog", 2_000, _catalog),
+        Scenario("submit", 2_000, _submit),
+        Scenario("predict", 2_000, _predict),
+        Scenario("login", 200, _login),
+        Scenario("analytics", 2_000, _analytics),
+        Scenario("analytics_detailed", 20, _analytics_detailed),
+    )
+}
+
+
+async def drive(one: Request, requests: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed():
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await one()
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(timed() for _ in range(requests)))
+    result = summarize(latencies, time.perf_counter() - started)
+    result.update(concurrency=concurrency, errors=errors)
+    return result
+
+
+async def run_scenarios(app, dataset: dict, names, concurrency: int, scale: float,
+                        seed: int, log=print) -> dict:
+    import httpx
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for name in names:
+            scenario = SCENARIOS[name]
+            one = scenario.build(client, dataset, random.Random(f"{seed}:{name}"))
+            requests = max(1, int(scenario.requests * scale))
+            await drive(one, min(requests, concurrency), concurrency)     # прогрев кэшей
+            results[name] = await drive(one, requests, concurrency)
+            log(f"  {name}: {results[name]['rps']:.0f} rps, p95 {results[name]['p95_ms']:.1f} мс")
+    return results
@@ -0,0 +1,24 @@
+# benchmarks/stats.py
+"""Сводка латентностей, общая для сценариев и нагрузочных тестов."""
+from typing import List
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+
+def summarize(latencies: List[float], elapsed: float) -> dict:
+    """Секунды на запрос и общее время → rps и перцентили в миллисекундах."""
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "rps": len(values) / elapsed if elapsed else 0.0,
+        "mean_ms": sum(values) / len(values) * 1000 if values else 0.0,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "max_ms": (values[-1] if values else 0.0) * 1000,
+    }
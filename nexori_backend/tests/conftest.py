@@ -0,0 +1,148 @@
+# tests/conftest.py
+from contextlib import contextmanager
+
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.config import N_PLUS_ONE_THRESHOLD
+from app.database import Base, engine, SessionLocal
+from app.dependencies import get_current_user, token_cache
+from app.querylog import request_observers
+from app.routes.analytics import correlation_cache
+from app.survey_cache import survey_cache
+from app.user_cache import user_cache
+from app import models
+
+client = TestClient(app)
+
+# вопросы опроса из фикстуры survey по умолчанию: kwargs SurveyQuestion
+DEFAULT_QUESTIONS = [
+    {"text": "a", "min_value": 0, "max_value": 10},
+    {"text": "b", "min_value": 0, "max_value": 10},
+]
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    # тесты пересоздают БД мимо админки, версии кэшей при этом не растут
+    survey_cache.invalidate()
+    user_cache.invalidate()
+    token_cache.clear()
+    correlation_cache.clear()
+    yield
+
+
+# ---------- БД и опрос ----------
+@pytest.fixture
+def database():
+    """Пустая схема на время теста."""
+    Base.metadata.create_all(bind=engine)
+    try:
+        yield
+    finally:
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def admin(database):
+    """Администратор, от имени которого идут запросы TestClient."""
+    db = SessionLocal()
+    user = models.User(username="admin", password="x", role="admin")
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    db.close()
+    app.dependency_overrides[get_current_user] = lambda: user
+    try:
+        yield user
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
+
+
+@pytest.fixture
+def survey_questions(request):
+    """
+    Вопросы опроса survey. Модуль переопределяет фикстуру целиком, тест —
+    через @pytest.mark.parametrize("survey_questions", [...], indirect=True).
+    """
+    return getattr(request, "param", DEFAULT_QUESTIONS)
+
+
+@pytest.fixture
+def survey_ranges():
+    """Диапазоны рекомендаций опроса survey: kwargs SurveyResultRange."""
+    return []
+
+
+@pytest.fixture
+def survey(admin, survey_questions, survey_ranges):
+    db = SessionLocal()
+    survey = models.Survey(
+        title="Survey",
+        questions=[models.SurveyQuestion(**question) for question in survey_questions],
+        ranges=[models.SurveyResultRange(**result_range) for result_range in survey_ranges],
+    )
+    db.add(survey)
+    db.commit()
+    db.refresh(survey)
+    try:
+        yield survey
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def import_rows(survey):
+    """
+    Загружает строки в survey эндпоинтом импорта и ждёт status=done.
+    Строка — значения по вопросам опроса (None — без ответа), при
+    dated=True первым идёт created_at.
+    """
+    def load(rows, dated=True):
+        columns = ["respondent_name"] + ["created_at"] * dated
+        columns += [f"q_{question.id}" for question in survey.questions]
+        body = ",".join(columns) + "\n" + "".join(
+            ",".join(["r", *("" if value is None else str(value) for value in row)]) + "\n"
+            for row in rows
+        )
+        job = client.post(f"/api/admin/surveys/{survey.id}/responses/import",
+                          content=body.encode()).json()
+        assert client.get(f"/api/admin/imports/{job['id']}").json()["status"] == "done"
+
+    return load
+
+
+@pytest.fixture
+def max_queries():
+    """
+    Бюджет SQL на эндпоинт:
+
+        with max_queries(3):
+            client.get(...)
+
+    Падает, если какой-то HTTP-запрос внутри блока выполнил больше n
+    выражений или повторил одну форму выражения N_PLUS_ONE_THRESHOLD
+    раз (N+1).
+    """
+    seen = []
+
+    def observe(route, queries):
+        seen.append((route, queries))
+
+    @contextmanager
+    def limit(n: int, allow_repeats: bool = False):
+        start = len(seen)
+        yield
+        assert len(seen) > start, "внутри блока не было HTTP-запросов"
+        for route, queries in seen[start:]:
+            shapes = "\n".join(f"  {count} x {shape}" for shape, count in queries.shapes.items())
+            assert queries.count <= n, f"{route}: {queries.count} SQL-выражений (бюджет {n}):\n{shapes}"
+            if not allow_repeats:
+                repeats = queries.repeated(N_PLUS_ONE_THRESHOLD)
+                assert not repeats, f"{route}: похоже на N+1:\n{shapes}"
+
+    request_observers.append(observe)
+    try:
+        yield limit
+    finally:
+        request_observers.remove(observe)
@@ -0,0 +1,78 @@
+# tests/test_admin.py
+from fastapi.testclient import TestClient
+from app.main import app
+from app.dependencies import get_current_user
+from app import models
+
+client = TestClient(app)
+
+
+def test_survey_lifecycle(admin):
+    survey_in = {
+        "title": "Профориентация",
+        "questions": [{"text": "a", "min_value": 0, "max_value": 5},
+                      {"text": "b", "min_value": 0, "max_value": 5}],
+        "ranges": [{"min_score": 0, "max_score": 10, "message": "ok"}],
+    }
+    response = client.post("/api/admin/surveys", json=survey_in)
+    assert response.status_code == 201
+    created = response.json()
+    assert [q["text"] for q in created["questions"]] == ["a", "b"]
+
+    response = client.get(f"/api/surveys/{created['id']}")
+    assert response.status_code == 200
+    assert response.json()["title"] == "Профориентация"
+
+    response = client.put(f"/api/admin/surveys/{created['id']}", json={"title": "New"})
+    assert response.status_code == 200
+    assert response.json()["title"] == "New"
+    assert len(response.json()["questions"]) == 2
+
+    response = client.delete(f"/api/admin/surveys/{created['id']}")
+    assert response.status_code == 204
+    assert client.get(f"/api/surveys/{created['id']}").status_code == 404
+    assert client.delete(f"/api/admin/surveys/{created['id']}").status_code == 404
+
+
+def test_non_admin_is_rejected(admin):
+    app.dependency_overrides[get_current_user] = lambda: models.User(username="u", role="user")
+    try:
+        response = client.post("/api/admin/surveys", json={"title": "x", "questions": []})
+        assert response.status_code == 403
+    finally:
+        app.dependency_overrides[get_current_user] = lambda: admin
+
+
+def test_db_settings_reports_pragmas(admin):
+    response = client.get("/api/admin/db/settings")
+    assert response.status_code == 200
+    settings = response.json()
+    pragmas = settings["sync"]["sqlite_pragmas"]
+    assert pragmas["journal_mode"] == "wal"
+    assert pragmas["foreign_keys"] == 1
+    assert pragmas["busy_timeout"] == 5000
+    assert settings["sync"]["pool"]["pre_ping"] is True
+    assert settings["async"]["driver"] == "aiosqlite"
+
+
+def test_range_checks_at_save_time(admin):
+    survey_in = {
+        "title": "Ranges",
+        "questions": [{"text": "a", "min_value": 0, "max_value": 10}],
+        "ranges": [{"min_score": 0, "max_score": 5, "message": "low"},
+                   {"min_score": 5, "max_score": 10, "message": "high"}],
+    }
+    response = client.post("/api/admin/surveys", json=survey_in)
+    assert response.status_code == 422
+    assert "overlap" in response.json()["detail"][0]
+
+    survey_in["ranges"][1]["min_score"] = 7
+    response = client.post("/api/admin/surveys", json=survey_in)
+    assert response.status_code == 201
+    assert response.json()["warnings"] == ["Scores 6..6 have no recommendation"]
+    assert len(response.json()["ranges"]) == 2
+
+    response = client.put(f"/api/admin/surveys/{response.json()['id']}",
+                          json={"ranges": [{"min_score": 0, "max_score": 10, "message": "all"}]})
+    assert response.status_code == 200
+    assert response.json()["warnings"] == []
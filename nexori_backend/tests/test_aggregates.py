@@ -0,0 +1,93 @@
+# tests/test_aggregates.py
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import SessionLocal, insert_missing
+from app.aggregates import rebuild_question_stats, update_question_stats
+from app import models
+
+client = TestClient(app)
+
+
+def submit(survey_id, answers):
+    payload = {
+        "respondent_name": "r",
+        "answers": [{"question_id": q, "answer_value": v} for q, v in answers.items()],
+    }
+    response = client.post(f"/api/surveys/{survey_id}/submit", json=payload)
+    assert response.status_code == 200
+    return response.json()
+
+
+# пересчёт не должен подменять загруженные в сессию строки агрегатов
+@pytest.mark.filterwarnings("error::sqlalchemy.exc.SAWarning")
+def test_stats_updated_on_submit(survey):
+    qa, qb = (q.id for q in survey.questions)
+    submit(survey.id, {qa: 2, qb: 9})
+    submit(survey.id, {qa: 4, qb: 9})
+    submit(survey.id, {qa: 9})
+
+    response = client.get(f"/api/analytics/surveys/{survey.id}")
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats[str(qa)] == {
+        "average": 5.0, "min": 2, "max": 9, "count": 3,
+        "distribution": {"2": 1, "4": 1, "9": 1},
+    }
+    assert stats[str(qb)]["count"] == 2
+
+    db = SessionLocal()
+    try:
+        row = db.get(models.SurveyQuestionStats, (survey.id, qa))
+        assert (row.total, row.total_sq) == (15, 4 + 16 + 81)
+        assert rebuild_question_stats(db, survey.id) == {"rows": 2, "mismatched": 0}
+        db.refresh(row)
+        assert (row.count, row.total) == (3, 15)
+    finally:
+        db.close()
+
+
+# первый submit по вопросу, когда строку агрегата уже создал другой писатель:
+# без IntegrityError и с сохранением его счётчиков
+def test_first_update_tolerates_concurrently_created_row(survey):
+    qa = survey.questions[0].id
+    other = SessionLocal()
+    try:
+        insert_missing(other, models.SurveyQuestionStats, [
+            {"survey_id": survey.id, "question_id": qa,
+             "count": 0, "total": 0, "total_sq": 0, "histogram": "{}"},
+        ])      # строка уже есть: повторная вставка ничего не меняет
+        other.commit()
+    finally:
+        other.close()
+
+    db = SessionLocal()
+    try:
+        update_question_stats(db, survey.id, {qa}, [{qa: 5}])
+        db.commit()
+        row = db.get(models.SurveyQuestionStats, (survey.id, qa))
+        assert (row.count, row.total) == (1, 5)
+    finally:
+        db.close()
+
+
+def test_replacing_questions_drops_their_stats(survey):
+    response = client.put(
+        f"/api/admin/surveys/{survey.id}",
+        json={"questions": [{"text": "new", "min_value": 0, "max_value": 5}]},
+    )
+    assert response.status_code == 200
+    new_q = response.json()["questions"][0]["id"]
+
+    response = client.get(f"/api/analytics/surveys/{survey.id}")
+    assert response.status_code == 404
+
+    submit(survey.id, {new_q: 3})
+    stats = client.get(f"/api/analytics/surveys/{survey.id}").json()
+    assert list(stats) == [str(new_q)]
+
+    db = SessionLocal()
+    try:
+        assert rebuild_question_stats(db, survey.id) == {"rows": 1, "mismatched": 0}
+    finally:
+        db.close()
@@ -0,0 +1,91 @@
+# tests/test_analytics.py
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import Base, engine, SessionLocal
+from app.analytics import QuestionStatsAccumulator, compute_question_stats
+from app.dependencies import get_current_user
+from app import models
+
+client = TestClient(app)
+
+
+def test_accumulator_matches_numpy():
+    rng = np.random.default_rng(0)
+    question_ids = rng.choice([3, 7, 11], size=5000)
+    values = rng.integers(-2, 40, size=5000)
+
+    acc = QuestionStatsAccumulator([3, 7, 11])
+    for start in range(0, 5000, 777):
+        acc.add(question_ids[start:start + 777], values[start:start + 777])
+    acc.add(np.array([99]), np.array([1000]))   # чужой вопрос игнорируется
+    result = acc.result()
+
+    for q in (3, 7, 11):
+        expected = values[question_ids == q]
+        stats = result[q]
+        assert stats["count"] == len(expected)
+        assert stats["min"] == expected.min() and stats["max"] == expected.max()
+        assert stats["average"] == pytest.approx(expected.mean())
+        assert stats["variance"] == pytest.approx(expected.var())
+        for name, p in (("p10", 10), ("median", 50), ("p90", 90)):
+            assert stats[name] == pytest.approx(np.percentile(expected, p))
+        assert sum(stats["distribution"].values()) == len(expected)
+
+
+@pytest.fixture(scope="module")
+def survey_id():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    survey = models.Survey(title="NumPy", questions=[models.SurveyQuestion(text="q")])
+    admin = models.User(username="admin", password="x", role="admin")
+    db.add_all([survey, admin])
+    db.flush()
+    q_id = survey.questions[0].id
+    for i, value in enumerate([1, 2, 2, 5, 10]):
+        response = models.SurveyResponse(survey_id=survey.id, respondent_name=str(i))
+        db.add(response)
+        db.flush()
+        db.add(models.SurveyAnswer(response_id=response.id, survey_id=survey.id,
+                                   question_id=q_id, value=value))
+    db.commit()
+    app.dependency_overrides[get_current_user] = lambda: admin
+    try:
+        yield survey.id
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+def test_detailed_endpoint_streams_chunks(survey_id):
+    db = SessionLocal()
+    try:
+        chunked = compute_question_stats(db, survey_id, chunk_size=2)
+    finally:
+        db.close()
+
+    response = client.get(f"/api/analytics/surveys/{survey_id}/detailed")
+    assert response.status_code == 200
+    (stats,) = response.json().values()
+    assert stats["count"] == 5
+    assert stats["average"] == 4.0
+    assert stats["median"] == 2.0
+    assert stats["distribution"] == {"1": 1, "2": 2, "5": 1, "10": 1}
+    assert list(chunked.values())[0]["p90"] == stats["p90"]
+
+
+@pytest.mark.parametrize("path", ["", "/{id}", "/{id}/detailed", "/{id}/timeseries",
+                                  "/{id}/quantiles", "/{id}/correlations",
+                                  "/{id}/crosstab?x=1&y=1"])
+def test_analytics_requires_admin(survey_id, path):
+    url = "/api/analytics/surveys" + path.format(id=survey_id)
+    as_admin = app.dependency_overrides.pop(get_current_user)
+    try:
+        assert client.get(url).status_code == 401
+        user = models.User(id=10**6, username="user", role="user")
+        app.dependency_overrides[get_current_user] = lambda: user
+        assert client.get(url).status_code == 403
+    finally:
+        app.dependency_overrides[get_current_user] = as_admin
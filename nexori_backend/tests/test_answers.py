@@ -0,0 +1,135 @@
+# tests/test_answers.py
+import json
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import Base, engine, SessionLocal
+from app.dependencies import get_current_user
+from app.backfill import backfill_answers
+from app.aggregates import rebuild_question_stats
+from app import models
+
+client = TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def survey():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = models.User(username="respondent", password="x")
+    survey = models.Survey(
+        title="Answers",
+        questions=[models.SurveyQuestion(text=f"q{i}") for i in range(3)],
+        ranges=[models.SurveyResultRange(min_score=0, max_score=100, message="ok")],
+    )
+    db.add_all([user, survey])
+    db.commit()
+    app.dependency_overrides[get_current_user] = lambda: user
+    try:
+        yield survey
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+def test_submit_writes_normalized_answers(survey):
+    q1, q2, q3 = (q.id for q in survey.questions)
+    payload = {
+        "respondent_name": "Test User",
+        "answers": [
+            {"question_id": q1, "answer_value": 5},
+            {"question_id": q2, "answer_value": 7},
+            {"question_id": q3, "answer_value": 8},
+        ],
+    }
+    response = client.post(f"/api/surveys/{survey.id}/submit", json=payload)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total_score"] == 20
+    assert body["answers"] == {str(q1): 5, str(q2): 7, str(q3): 8}
+
+    db = SessionLocal()
+    try:
+        rows = db.query(models.SurveyAnswer).filter_by(response_id=body["id"]).all()
+        stored = db.get(models.SurveyResponse, body["id"])
+        assert {r.question_id: r.value for r in rows} == {q1: 5, q2: 7, q3: 8}
+        assert stored.answers_raw == ""
+    finally:
+        db.close()
+
+
+def test_backfill_converts_legacy_blobs(survey):
+    q1, q2, _ = (q.id for q in survey.questions)
+    db = SessionLocal()
+    try:
+        legacy = [
+            models.SurveyResponse(survey_id=survey.id, respondent_name="json",
+                                  answers_raw=json.dumps({q1: 1, q2: 2})),
+            models.SurveyResponse(survey_id=survey.id, respondent_name="repr",
+                                  answers_raw=str({q1: 3, q2: 4})),
+        ]
+        db.add_all(legacy)
+        db.commit()
+        assert legacy[1].answers == {q1: 3, q2: 4}
+
+        assert backfill_answers(db, chunk_size=1) == {"converted": 2, "failed": []}
+        assert backfill_answers(db) == {"converted": 0, "failed": []}
+        db.expire_all()
+        assert legacy[0].answers == {q1: 1, q2: 2}
+        assert legacy[1].answers == {q1: 3, q2: 4}
+        assert legacy[1].answers_raw == ""
+    finally:
+        db.close()
+
+
+def test_backfill_keeps_unparsable_blobs_for_retry(survey):
+    q1 = survey.questions[0].id
+    blobs = ["{1: 5, 2:", "[1, 2]", '{"x": 1}', '{"1": null}']
+    db = SessionLocal()
+    try:
+        bad = [models.SurveyResponse(survey_id=survey.id, respondent_name="bad", answers_raw=b)
+               for b in blobs]
+        good = models.SurveyResponse(survey_id=survey.id, respondent_name="good",
+                                     answers_raw=json.dumps({q1: 2}))
+        db.add_all(bad + [good])
+        db.commit()
+
+        result = backfill_answers(db, chunk_size=2)
+        assert result == {"converted": 1, "failed": [r.id for r in bad]}
+        db.expire_all()
+        # blob не потерян, ответов не появилось — можно исправить и повторить
+        assert [r.answers_raw for r in bad] == blobs
+        assert all(not r.answer_items for r in bad)
+        assert good.answers == {q1: 2} and good.answers_raw == ""
+        assert backfill_answers(db)["failed"] == [r.id for r in bad]
+
+        bad[0].answers_raw = json.dumps({q1: 5})
+        db.commit()
+        assert backfill_answers(db)["converted"] == 1
+        for row in bad + [good]:
+            db.delete(row)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_analytics_after_backfill_rebuild(survey, monkeypatch):
+    q1 = survey.questions[0].id
+    db = SessionLocal()
+    try:
+        rebuild_question_stats(db)
+        admin = models.User(username="analyst", password="x", role="admin")
+        db.add(admin)
+        db.commit()
+        db.refresh(admin)
+    finally:
+        db.close()
+    monkeypatch.setitem(app.dependency_overrides, get_current_user, lambda: admin)
+    response = client.get("/api/analytics/surveys")
+    assert response.status_code == 200
+    stats = response.json()[str(q1)]
+    assert stats["count"] == 3
+    assert stats["min"] == 1
+    assert stats["max"] == 5
+    assert stats["distribution"] == {"1": 1, "3": 1, "5": 1}
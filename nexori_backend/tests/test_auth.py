@@ -3,6 +3,8 @@ import pytest
 from fastapi.testclient import TestClient
 from app.main import app
 from app.database import Base, engine, SessionLocal
+from app.dependencies import create_access_token, token_cache
+from app import crud, models
 
 client = TestClient(app)
 
@@ -27,3 +29,66 @@ def test_registration_and_login(test_db):
     token_data = response.json()
     assert "access_token" in token_data
     assert token_data["token_type"] == "bearer"
+
+
+def login(username, password="secret"):
+    response = client.post("/api/auth/token", data={"username": username, "password": password})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def promote(username):
+    session = SessionLocal()
+    user = crud.get_user_by_username(session, username)
+    crud.update_user_role(session, user.id, "admin")
+    session.close()
+    return user.id
+
+
+def test_principal_comes_from_claims(test_db, monkeypatch):
+    client.post("/api/auth/register", json={"username": "alice", "password": "secret"})
+    headers = login("alice")
+
+    def no_db(*args):
+        raise AssertionError("user row read on the hot path")
+
+    monkeypatch.setattr(crud, "get_user_by_username", no_db)
+    monkeypatch.setattr(crud, "get_user_by_id", no_db)
+    for _ in range(3):
+        response = client.get("/api/auth/me", headers=headers)
+        assert response.json()["username"] == "alice"
+    assert token_cache.hits >= 2
+
+
+def test_invalid_and_missing_tokens(test_db):
+    assert client.get("/api/auth/me").status_code == 401
+    bad = {"Authorization": "Bearer not-a-jwt"}
+    assert client.get("/api/auth/me", headers=bad).status_code == 401
+
+
+def test_legacy_token_without_claims(test_db):
+    token = create_access_token({"sub": "alice"})
+    response = client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.json()["role"] == "user"
+
+
+def test_demoted_admin_loses_access_before_token_expires(test_db):
+    client.post("/api/auth/register", json={"username": "root", "password": "secret"})
+    root_id = promote("root")
+    headers = login("root")
+    assert client.get("/api/admin/cache/stats", headers=headers).status_code == 200
+
+    response = client.put(f"/api/admin/users/{root_id}/role", json={"role": "user"}, headers=headers)
+    assert response.json()["role"] == "user"
+    # токен всё ещё содержит role=admin, но роль сверяется с кэшем пользователей
+    assert client.get("/api/admin/cache/stats", headers=headers).status_code == 403
+
+
+def test_role_change_bumps_users_version(test_db):
+    session = SessionLocal()
+    before = crud.get_cache_version(session, "users")
+    user = crud.get_user_by_username(session, "alice")
+    crud.update_user_role(session, user.id, "admin")
+    assert crud.get_cache_version(session, "users") == before + 1
+    assert session.get(models.User, user.id).role == "admin"
+    session.close()
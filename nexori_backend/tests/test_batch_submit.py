@@ -0,0 +1,75 @@
+# tests/test_batch_submit.py
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import Base, engine, SessionLocal
+from app.dependencies import get_current_user
+from app import models
+
+client = TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def survey():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = models.User(username="kiosk", password="x")
+    survey = models.Survey(
+        title="Batch",
+        questions=[models.SurveyQuestion(text="a"), models.SurveyQuestion(text="b")],
+        ranges=[models.SurveyResultRange(min_score=0, max_score=5, message="low"),
+                models.SurveyResultRange(min_score=6, max_score=20, message="high")],
+    )
+    db.add_all([user, survey])
+    db.commit()
+    app.dependency_overrides[get_current_user] = lambda: user
+    try:
+        yield survey
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+def item(name, answers):
+    return {
+        "respondent_name": name,
+        "answers": [{"question_id": q, "answer_value": v} for q, v in answers],
+    }
+
+
+def test_batch_submit_reports_per_item_results(survey):
+    qa, qb = (q.id for q in survey.questions)
+    payload = [
+        item("one", [(qa, 1), (qb, 2)]),
+        item("bad", [(qa, 1), (9999, 2)]),
+        item("two", [(qa, 4), (qb, 5)]),
+        item("dup", [(qa, 1), (qa, 2)]),
+    ]
+    response = client.post(f"/api/surveys/{survey.id}/submit/batch", json=payload)
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["failed"]) == (2, 2)
+    assert [r["index"] for r in body["results"]] == [0, 1, 2, 3]
+
+    ok, bad, two, dup = body["results"]
+    assert ok["response"]["recommendation"] == "low"
+    assert two["response"]["total_score"] == 9
+    assert two["response"]["recommendation"] == "high"
+    assert "9999" in bad["error"] and bad["response"] is None
+    assert "Duplicate" in dup["error"]
+
+    db = SessionLocal()
+    try:
+        stored = db.get(models.SurveyResponse, two["response"]["id"])
+        assert stored.answers == {qa: 4, qb: 5}
+        stats = db.get(models.SurveyQuestionStats, (survey.id, qa))
+        assert stats.count == 2
+    finally:
+        db.close()
+
+
+def test_single_submit_rejects_unknown_question(survey):
+    response = client.post(f"/api/surveys/{survey.id}/submit",
+                           json=item("x", [(12345, 1)]))
+    assert response.status_code == 422
@@ -0,0 +1,43 @@
+# tests/test_benchmarks.py
+from sqlalchemy import create_engine, func, select
+
+from app import models
+from benchmarks.compare import compare
+from benchmarks.datagen import generate
+
+
+def _generate(seed):
+    db_engine = create_engine("sqlite://")
+    dataset = generate(db_engine, users=5, surveys=3, questions=2, responses=50,
+                       seed=seed, log=lambda line: None)
+    with db_engine.connect() as conn:
+        scores = conn.execute(
+            select(models.SurveyResponse.survey_id, models.SurveyResponse.total_score)
+            .order_by(models.SurveyResponse.id)
+        ).all()
+        answers = conn.execute(select(func.count()).select_from(models.SurveyAnswer)).scalar()
+        stats = conn.execute(select(func.sum(models.SurveyQuestionStats.count))).scalar()
+    return dataset, scores, answers, stats
+
+
+def test_datagen_is_deterministic():
+    dataset, scores, answers, stats = _generate(seed=7)
+    assert dataset["survey_questions"] == {1: [1, 2], 2: [3, 4], 3: [5, 6]}
+    assert len(scores) == 50 and answers == 100
+    assert stats == 100                         # агрегаты пересчитаны после загрузки
+    assert _generate(seed=7)[1] == scores
+    assert _generate(seed=8)[1] != scores
+
+
+def _report(**scenarios):
+    return {"meta": {"size": "10k"}, "scenarios": {
+        name: {"rps": rps, "p95_ms": p95, "errors": 0} for name, (rps, p95) in scenarios.items()
+    }}
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    base = _report(read=(1000, 10.0), submit=(100, 50.0), login=(10, 500.0))
+    new = _report(read=(950, 10.5), submit=(80, 50.0), login=(10, 600.0))
+    _, regressions = compare(base, new, threshold=0.10)
+    assert regressions == ["submit: rps -20%", "login: p95 +20%"]
+    assert compare(base, base, threshold=0.10)[1] == []
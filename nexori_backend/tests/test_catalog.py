@@ -0,0 +1,65 @@
+# tests/test_catalog.py
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import Base, engine, SessionLocal
+from app import models
+
+client = TestClient(app)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def catalog():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    base = datetime(2024, 1, 1)
+    # у первых двух одинаковый created_at — порядок решает id
+    stamps = [base, base] + [base + timedelta(minutes=i) for i in range(1, 6)]
+    db.add_all([
+        models.Survey(
+            title=f"S{i}",
+            created_at=stamp,
+            questions=[models.SurveyQuestion(text=f"q{i}")],
+        )
+        for i, stamp in enumerate(stamps)
+    ])
+    db.commit()
+    db.close()
+    try:
+        yield
+    finally:
+        Base.metadata.drop_all(bind=engine)
+
+
+def test_pages_cover_catalog_without_gaps():
+    titles, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": 3}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/surveys/", params=params)
+        assert response.status_code == 200
+        assert response.headers["X-Total-Count"] == "7"
+        titles += [s["title"] for s in response.json()]
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert titles == [f"S{i}" for i in range(7)]
+    assert pages == 3
+
+
+def test_summary_omits_questions():
+    full = client.get("/api/surveys/", params={"limit": 1}).json()
+    summary = client.get("/api/surveys/", params={"limit": 1, "fields": "summary"}).json()
+    assert full[0]["questions"][0]["text"] == "q0"
+    assert "questions" not in summary[0]
+    assert summary[0]["title"] == "S0"
+
+
+def test_bad_cursor_and_limit():
+    assert client.get("/api/surveys/", params={"cursor": "!!!"}).status_code == 400
+    assert client.get("/api/surveys/", params={"limit": 0}).status_code == 422
+    assert client.get("/api/surveys/", params={"limit": 501}).status_code == 422
@@ -0,0 +1,156 @@
+# tests/test_correlations.py
+import random
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.analytics import (
+    PairMomentsAccumulator, PairRanksAccumulator, compute_correlations, compute_crosstab,
+)
+from app.database import SessionLocal
+from app.routes.analytics import correlation_cache
+from app import config
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def survey_questions():
+    return [{"text": t, "min_value": 0, "max_value": 6} for t in "abc"]
+
+
+def random_rows(n, seed=5):
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(n):
+        a = rng.randint(0, 6)
+        b = min(6, max(0, a + rng.randint(-1, 1)))       # следует за a
+        c = rng.randint(0, 6)
+        rows.append((a, b if rng.random() > 0.1 else None, c if rng.random() > 0.2 else None))
+    return rows
+
+
+def midranks(values):
+    values = np.asarray(values)
+    return np.array([(values < v).sum() + ((values == v).sum() + 1) / 2 for v in values])
+
+
+def reference(rows, i, j, method):
+    pairs = np.array([(r[i], r[j]) for r in rows if r[i] is not None and r[j] is not None])
+    x, y = pairs[:, 0], pairs[:, 1]
+    if method == "spearman":
+        x, y = midranks(x), midranks(y)
+    return np.corrcoef(x, y)[0, 1], len(pairs)
+
+
+def accumulate(question_ids, rows, method, block_cells):
+    """Оба прохода вручную, одной порцией с мелкими блоками."""
+    flat = np.array([(n, question_ids[i], v) for n, row in enumerate(rows)
+                     for i, v in enumerate(row) if v is not None])
+    chunk = (flat[:, 0], flat[:, 1], flat[:, 2])
+    acc = PairMomentsAccumulator(question_ids)
+    if method == "spearman":
+        pair_ranks = PairRanksAccumulator(question_ids)
+        pair_ranks.add(*chunk, block_cells=block_cells)
+        acc = PairMomentsAccumulator.for_ranks(pair_ranks)
+    acc.add(*chunk, block_cells=block_cells)
+    return acc.correlations()
+
+
+@pytest.mark.parametrize("method", ["pearson", "spearman"])
+def test_correlations_match_numpy_across_chunks_and_blocks(survey, import_rows, method):
+    rows = random_rows(500)
+    import_rows(rows, dated=False)
+    question_ids = [q.id for q in survey.questions]
+    db = SessionLocal()
+    try:
+        whole = compute_correlations(db, survey.id, question_ids, method)
+        chunked = compute_correlations(db, survey.id, question_ids, method, chunk_size=37)
+    finally:
+        db.close()
+    blocked = accumulate(question_ids, rows, method, block_cells=50)
+
+    assert whole["question_ids"] == question_ids
+    for result in (whole, chunked, blocked):
+        for i in range(3):
+            for j in range(3):
+                expected, n = reference(rows, i, j, method)
+                assert result["pairs"][i][j] == n
+                assert result["matrix"][i][j] == pytest.approx(expected)
+
+
+def test_memory_does_not_grow_with_scale_width(survey):
+    # шкала 0..1000: суммы Пирсона — по-прежнему вопросов × вопросов
+    rows = [(v, 1000 - v, v % 7) for v in range(0, 1001, 10)]
+    question_ids = [q.id for q in survey.questions]
+    flat = np.array([(n, question_ids[i], v) for n, row in enumerate(rows)
+                     for i, v in enumerate(row)])
+    acc = PairMomentsAccumulator(question_ids)
+    acc.add(flat[:, 0], flat[:, 1], flat[:, 2])
+    assert {a.shape for a in (acc.n, acc.sx, acc.sxx, acc.sxy)} == {(3, 3)}
+    assert acc.correlations()["matrix"][0][1] == pytest.approx(-1)
+
+    # гистограммы рангов Спирмена ограничены CORRELATION_MAX_RANK_CELLS
+    with pytest.raises(ValueError, match="method=pearson"):
+        PairRanksAccumulator(question_ids, max_cells=3 * 3 * 100).add(
+            flat[:, 0], flat[:, 1], flat[:, 2])
+
+
+def test_correlations_endpoint_is_cached_by_watermark(survey, import_rows):
+    rows = random_rows(200)
+    import_rows(rows, dated=False)
+    url = f"/api/analytics/surveys/{survey.id}/correlations"
+
+    first = client.get(url, params={"method": "spearman"}).json()
+    assert first["question_ids"] == [q.id for q in survey.questions]
+    assert first["matrix"][0][1] == pytest.approx(reference(rows, 0, 1, "spearman")[0])
+    assert first["matrix"][0][1] > 0.8
+    assert client.get(url).json()["matrix"][0][1] == \
+        pytest.approx(reference(rows, 0, 1, "pearson")[0])
+    hits = correlation_cache.hits
+    assert client.get(url, params={"method": "spearman"}).json() == first
+    assert correlation_cache.hits == hits + 1
+
+    # новый ответ сдвигает водяной знак
+    import_rows([(0, 6, 3)], dated=False)
+    after = client.get(url).json()
+    assert after["pairs"][0][1] == first["pairs"][0][1] + 1
+    assert after["matrix"][0][1] == \
+        pytest.approx(reference(rows + [(0, 6, 3)], 0, 1, "pearson")[0])
+
+
+def test_crosstab_and_undefined_correlation(survey, import_rows):
+    qa, qb, qc = (q.id for q in survey.questions)
+    import_rows([(1, 2, 4), (1, 2, 4), (3, 2, None), (3, 5, 4)], dated=False)
+    table = client.get(f"/api/analytics/surveys/{survey.id}/crosstab",
+                       params={"x": qa, "y": qb}).json()
+    assert table["x_values"] == [1, 3] and table["y_values"] == [2, 5]
+    assert table["counts"] == [[2, 0], [1, 1]] and table["total"] == 4
+
+    result = client.get(f"/api/analytics/surveys/{survey.id}/correlations").json()
+    assert result["matrix"][0][2] is None            # c везде 4 — дисперсия 0
+    assert result["pairs"][0][2] == 3
+
+    db = SessionLocal()
+    try:
+        assert compute_crosstab(db, survey.id, qa, qb) == {k: table[k] for k in
+                                                           ("x_values", "y_values", "counts", "total")}
+        # водяной знак: ответы новее until не учитываются
+        assert compute_crosstab(db, survey.id, qa, qb, until=0)["total"] == 0
+    finally:
+        db.close()
+
+    missing = client.get(f"/api/analytics/surveys/{survey.id}/crosstab",
+                         params={"x": qa, "y": 999999})
+    assert missing.status_code == 404
+    assert client.get("/api/analytics/surveys/999999/correlations").status_code == 404
+
+
+def test_spearman_over_rank_limit_is_rejected(survey, import_rows, monkeypatch):
+    import_rows([(1, 2, 4), (3, 5, 6)], dated=False)
+    monkeypatch.setattr(config, "CORRELATION_MAX_RANK_CELLS", 10)
+    url = f"/api/analytics/surveys/{survey.id}/correlations"
+    response = client.get(url, params={"method": "spearman"})
+    assert response.status_code == 422 and "method=pearson" in response.text
+    assert client.get(url).status_code == 200
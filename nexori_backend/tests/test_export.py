@@ -0,0 +1,79 @@
+# tests/test_export.py
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import SessionLocal
+from app import export, models
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def survey(survey):
+    db = SessionLocal()
+    try:
+        qa, qb = (q.id for q in survey.questions)
+        for day, answers in ((1, {qa: 1, qb: 2}), (2, {qa: 3}), (3, {qa: 5, qb: 6})):
+            response = models.SurveyResponse(
+                survey_id=survey.id, respondent_name=f"r{day}",
+                total_score=sum(answers.values()), created_at=datetime(2024, 1, day),
+            )
+            db.add(response)
+            db.flush()
+            db.add_all(
+                models.SurveyAnswer(response_id=response.id, survey_id=survey.id,
+                                    question_id=q, value=v)
+                for q, v in answers.items()
+            )
+        # ответ в старом формате, ещё без backfill
+        db.add(models.SurveyResponse(survey_id=survey.id, respondent_name="legacy",
+                                     created_at=datetime(2024, 1, 4),
+                                     answers_raw=json.dumps({qb: 9})))
+        db.commit()
+    finally:
+        db.close()
+    return survey
+
+
+def test_csv_export_flattens_answers(survey, monkeypatch):
+    monkeypatch.setattr(export, "FLUSH_BYTES", 1)   # по блоку на строку
+    qa, qb = (q.id for q in survey.questions)
+    response = client.get(f"/api/admin/surveys/{survey.id}/responses/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [r["respondent_name"] for r in rows] == ["r1", "r2", "r3", "legacy"]
+    assert (rows[1][f"q_{qa}"], rows[1][f"q_{qb}"]) == ("3", "")
+    assert rows[3][f"q_{qb}"] == "9"
+
+
+def test_ndjson_gzip_with_date_range(survey):
+    response = client.get(
+        f"/api/admin/surveys/{survey.id}/responses/export",
+        params={"format": "ndjson", "gzip": True,
+                "date_from": "2024-01-02T00:00:00", "date_to": "2024-01-04T00:00:00"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    lines = gzip.decompress(response.content).decode().splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [r["respondent_name"] for r in records] == ["r2", "r3"]
+    assert records[1]["total_score"] == 11
+
+
+def test_date_range_with_offset_is_converted_to_utc(survey):
+    # 2024-01-02 03:00+03:00 = 2024-01-02 00:00 UTC: то же окно, что и выше
+    response = client.get(
+        f"/api/admin/surveys/{survey.id}/responses/export",
+        params={"format": "ndjson",
+                "date_from": "2024-01-02T03:00:00+03:00", "date_to": "2024-01-03T19:00:00-05:00"},
+    )
+    assert response.status_code == 200
+    assert [json.loads(line)["respondent_name"] for line in response.text.splitlines()] == \
+        ["r2", "r3"]
@@ -0,0 +1,138 @@
+# tests/test_import.py
+import gzip
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func
+from app.main import app
+from app.database import SessionLocal
+from app import cli, config, models, submissions
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def survey_questions():
+    return [{"text": t, "min_value": 0, "max_value": 5} for t in "ab"]
+
+
+@pytest.fixture
+def survey_ranges():
+    return [{"min_score": 0, "max_score": 4, "message": "low"},
+            {"min_score": 5, "max_score": 10, "message": "high"}]
+
+
+def csv_body(survey, rows):
+    qa, qb = (q.id for q in survey.questions)
+    lines = [f"respondent_name,created_at,q_{qa},q_{qb}"]
+    lines += [",".join(str(v) for v in row) for row in rows]
+    return ("\n".join(lines) + "\n").encode()
+
+
+def stored(survey_id):
+    db = SessionLocal()
+    try:
+        responses = (db.query(models.SurveyResponse)
+                     .filter_by(survey_id=survey_id).order_by(models.SurveyResponse.id).all())
+        answers = db.query(func.count()).select_from(models.SurveyAnswer).scalar()
+        stats = db.query(func.sum(models.SurveyQuestionStats.count)).scalar()
+        return responses, answers, stats
+    finally:
+        db.close()
+
+
+def test_csv_import_scores_rows_and_reports_rejects(survey):
+    body = csv_body(survey, [
+        ("ann", "2019-05-01T10:00:00", 1, 2),
+        ("bob", "", 4, 5),
+        ("eve", "2019-05-02", 9, 1),          # вне [0, 5]
+        ("", "2019-05-03", 1, 1),             # без имени
+        ("dan", "yesterday", 1, 1),
+        ("kim", "2019-05-04", 3, ""),         # неотвеченный вопрос
+    ])
+    response = client.post(f"/api/admin/surveys/{survey.id}/responses/import", content=body)
+    assert response.status_code == 202
+    job = client.get(f"/api/admin/imports/{response.json()['id']}").json()
+    assert job["status"] == "done"
+    assert (job["rows_done"], job["imported"], job["rejected"]) == (6, 3, 3)
+    assert [r["row"] for r in job["rejects"]] == [3, 4, 5]
+    assert "outside" in job["rejects"][0]["error"]
+
+    responses, answers, stats = stored(survey.id)
+    assert [(r.respondent_name, r.total_score, r.recommendation) for r in responses] == [
+        ("ann", 3, "low"), ("bob", 9, "high"), ("kim", 3, "low"),
+    ]
+    assert responses[0].created_at == datetime(2019, 5, 1, 10)
+    assert answers == 5 and stats == 5
+
+
+def test_failed_import_resumes_from_checkpoint(survey, monkeypatch):
+    monkeypatch.setattr(config, "IMPORT_CHUNK_SIZE", 2)
+    monkeypatch.setattr(config, "IMPORT_CHUNK_PAUSE_MS", 0)
+    body = csv_body(survey, [(f"r{i}", "", i % 5, 1) for i in range(7)])
+    insert = submissions.insert_submissions
+    calls = []
+
+    def flaky(*args):
+        calls.append(1)
+        if len(calls) == 3:
+            raise RuntimeError("disk full")
+        return insert(*args)
+
+    monkeypatch.setattr(submissions, "insert_submissions", flaky)
+    job = client.post(f"/api/admin/surveys/{survey.id}/responses/import", content=body).json()
+    job = client.get(f"/api/admin/imports/{job['id']}").json()
+    assert job["status"] == "failed" and "disk full" in job["error"]
+    assert (job["rows_done"], job["imported"]) == (4, 4)
+
+    resumed = client.post(
+        f"/api/admin/surveys/{survey.id}/responses/import",
+        params={"job_id": job["id"]}, content=body,
+    )
+    assert resumed.status_code == 202
+    job = client.get(f"/api/admin/imports/{job['id']}").json()
+    assert job["status"] == "done" and (job["rows_done"], job["imported"]) == (7, 7)
+    assert [r.respondent_name for r in stored(survey.id)[0]] == [f"r{i}" for i in range(7)]
+
+    again = client.post(f"/api/admin/surveys/{survey.id}/responses/import",
+                        params={"job_id": job["id"]}, content=body)
+    assert again.status_code == 409
+
+
+def test_resume_is_refused_while_job_holds_its_lease(survey):
+    body = csv_body(survey, [(f"r{i}", "", 1, 1) for i in range(3)])
+    db = SessionLocal()
+    try:
+        # задание «выполняется» в другом процессе: running, свежий updated_at
+        job = models.ImportJob(survey_id=survey.id, format="csv", status="running")
+        db.add(job)
+        db.commit()
+        url = f"/api/admin/surveys/{survey.id}/responses/import"
+
+        busy = client.post(url, params={"job_id": job.id}, content=body)
+        assert busy.status_code == 409 and "running" in busy.json()["detail"]
+        assert stored(survey.id)[0] == []
+
+        # процесс умер: коммитов нет дольше аренды — задание можно забрать
+        job.updated_at = datetime.utcnow() - timedelta(seconds=config.IMPORT_LEASE_SECONDS + 1)
+        db.commit()
+        resumed = client.post(url, params={"job_id": job.id}, content=body)
+        assert resumed.status_code == 202
+        assert client.get(f"/api/admin/imports/{job.id}").json()["imported"] == 3
+    finally:
+        db.close()
+
+
+def test_cli_imports_gzipped_ndjson(survey, tmp_path, capsys):
+    qa, qb = (q.id for q in survey.questions)
+    path = tmp_path / "legacy.ndjson.gz"
+    with gzip.open(path, "wt") as f:
+        f.write(json.dumps({"respondent_name": "x", f"q_{qa}": 5, f"q_{qb}": 5}) + "\n\n")
+        f.write(json.dumps({"respondent_name": "y", "answers": {str(qa): 0}}) + "\n")
+        f.write("{broken\n")
+    cli.main(["import-responses", "--survey-id", str(survey.id), "--file", str(path)])
+    out = capsys.readouterr().out
+    assert "Импортировано: 2, отклонено: 1" in out and "строка 3: Invalid JSON" in out
+    assert [r.total_score for r in stored(survey.id)[0]] == [10, 0]
@@ -0,0 +1,80 @@
+# tests/test_logging.py
+import json
+import logging
+import queue
+
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import Base, engine, SessionLocal
+from app.logger import DROPPED, DroppingQueueHandler, JsonFormatter, SamplingFilter, logger
+from app import models
+
+client = TestClient(app)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def captured():
+    handler = ListHandler()
+    handler.addFilter(SamplingFilter())
+    logger.addHandler(handler)
+    try:
+        yield handler.records
+    finally:
+        logger.removeHandler(handler)
+
+
+@pytest.fixture(scope="module")
+def survey_id():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    survey = models.Survey(title="Logged", questions=[models.SurveyQuestion(text="q")])
+    db.add(survey)
+    db.commit()
+    try:
+        yield survey.id
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+def test_json_formatter_includes_extra_fields():
+    record = logger.makeRecord("nexori", logging.INFO, __file__, 1, "hello %s", ("world",), None,
+                               extra={"route": "/api/x", "status": 200})
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["msg"] == "hello world"
+    assert (entry["route"], entry["status"], entry["level"]) == ("/api/x", 200, "INFO")
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    dropped = DROPPED.value
+    for _ in range(3):
+        handler.handle(logger.makeRecord("nexori", logging.INFO, __file__, 1, "x", (), None))
+    assert handler.queue.qsize() == 1
+    assert DROPPED.value == dropped + 2
+
+
+def test_health_checks_are_sampled(captured):
+    for _ in range(10):
+        assert client.get("/api/health").status_code == 200
+    health = [r for r in captured if r.msg == "Health check accessed"]
+    assert len(health) == 1
+
+
+def test_request_log_has_route_template_and_query_count(survey_id, captured):
+    assert client.get(f"/api/surveys/{survey_id}").status_code == 200
+    (record,) = [r for r in captured if r.msg == "request"]
+    assert record.route == "/api/surveys/{survey_id}"
+    assert (record.method, record.status) == ("GET", 200)
+    assert record.db_queries >= 1
+    assert record.duration_ms > 0
@@ -0,0 +1,77 @@
+# tests/test_metrics.py
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import Base, engine, SessionLocal
+from app.metrics import Counter, Histogram, registry, render_prometheus
+from app.middleware import REQUESTS
+from app import models
+
+client = TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def survey_id():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    survey = models.Survey(title="Metered", questions=[models.SurveyQuestion(text="q")])
+    db.add(survey)
+    db.commit()
+    try:
+        yield survey.id
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+def test_sharded_recording_sums_across_threads():
+    hist = Histogram("t_hist", "h", ("route",), buckets=(1, 10))
+    count = Counter("t_count", "c")
+
+    def work():
+        for i in range(1000):
+            hist.labels("/x").observe(i % 20)
+            count.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    counts, total, sum_ = hist.labels("/x").totals()
+    assert total == 4000 and count.value == 4000
+    assert counts == [4 * 100, 4 * 450, 4 * 450]     # ≤1, (1, 10], +Inf
+    assert sum_ == 4 * 50 * sum(range(20))
+
+
+def test_prometheus_text_format(monkeypatch):
+    hist = Histogram("t_latency", 'with "quotes"', ("route",), buckets=(0.1,))
+    hist.labels('/a"b').observe(0.05)
+    hist.labels('/a"b').observe(0.5)
+    monkeypatch.setitem(registry, "t_latency", hist)
+    text = render_prometheus()
+    assert '# HELP nexori_t_latency with \\"quotes\\"' in text
+    assert "# TYPE nexori_t_latency histogram" in text
+    assert 'nexori_t_latency_bucket{route="/a\\"b",le="0.1"} 1' in text
+    assert 'nexori_t_latency_bucket{route="/a\\"b",le="+Inf"} 2' in text
+    assert 'nexori_t_latency_count{route="/a\\"b"} 2' in text
+
+
+def test_metrics_endpoint(survey_id):
+    route = "/api/surveys/{survey_id}"
+    before = REQUESTS.labels("GET", route, 200).value
+    for _ in range(3):
+        assert client.get(f"/api/surveys/{survey_id}").status_code == 200
+    response = client.get("/api/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert f'nexori_http_requests_total{{method="GET",route="{route}",status="200"}} {before + 3}' in text
+    assert f'nexori_http_request_duration_seconds_count{{method="GET",route="{route}"}}' in text
+    assert 'nexori_db_statement_duration_seconds_count{engine=' in text
+    assert 'nexori_db_pool_connections{engine="sync",state="size"}' in text
+    assert 'nexori_cache_hit_ratio{cache="surveys"}' in text
+    # сам запрос /metrics ещё в обработке
+    assert "nexori_http_requests_in_flight 1" in text
@@ -0,0 +1,108 @@
+# tests/test_ml_batcher.py
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import Base, engine, SessionLocal
+from app.dependencies import get_current_user
+from app.ml import batcher as ml_batcher
+from app.ml import model as ml_model
+from app.ml.batcher import BatcherSaturated, PredictionBatcher
+from app import config, models
+
+ORDER = (1, 2, 3)
+
+
+def answers(i):
+    return {1: i % 11, 2: (i * 3) % 11, 3: 5}
+
+
+def test_concurrent_requests_share_batches():
+    batcher = PredictionBatcher(max_batch=4, max_wait=0.01, max_pending=100)
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.predict(answers(i), ORDER) for i in range(10)))
+
+    results = asyncio.run(scenario())
+    assert results == ml_model.predict([answers(i) for i in range(10)], ORDER)
+    # первый уходит сразу (инференс простаивал), дальше — пачки по 4 и остаток по таймеру
+    assert batcher.batches == 4
+    assert batcher.pending == 0
+
+
+def test_model_error_fails_only_its_survey(tmp_path, monkeypatch):
+    path = tmp_path / "model.json"
+    path.write_text(json.dumps({"categories": ["a", "b"], "coef": [[1, 0, 0], [0, 1, 0]],
+                                "intercept": [0, 0]}))
+    monkeypatch.setattr(config, "ML_MODEL_PATH", str(path))
+    ml_model.reset_model()
+    batcher = PredictionBatcher(max_batch=8, max_wait=0.01, max_pending=100)
+
+    async def scenario():
+        return await asyncio.gather(
+            batcher.predict({1: 1, 2: 9, 3: 0}, ORDER),
+            batcher.predict({1: 1, 2: 9}, (1, 2)),
+            batcher.predict({1: 9, 2: 1, 3: 0}, ORDER),
+            return_exceptions=True,
+        )
+
+    try:
+        good, bad, other = asyncio.run(scenario())
+    finally:
+        ml_model.reset_model()
+    assert good["predicted_category"] == "b" and other["predicted_category"] == "a"
+    assert isinstance(bad, ValueError)
+
+
+def test_timeout_and_saturation(monkeypatch):
+    score = ml_batcher._score
+
+    def slow(batch):
+        time.sleep(0.2)
+        return score(batch)
+
+    monkeypatch.setattr(ml_batcher, "_score", slow)
+    batcher = PredictionBatcher(max_batch=8, max_wait=0.001, max_pending=1)
+
+    async def scenario():
+        first = asyncio.ensure_future(batcher.predict(answers(1), ORDER, timeout=0.05))
+        await asyncio.sleep(0)
+        with pytest.raises(BatcherSaturated):
+            await batcher.predict(answers(2), ORDER)
+        with pytest.raises(asyncio.TimeoutError):
+            await first
+        assert batcher.pending == 1            # пачка ещё считается
+        await asyncio.sleep(0.3)
+        assert batcher.pending == 0
+        return await batcher.predict(answers(3), ORDER, timeout=1)
+
+    assert asyncio.run(scenario()) == ml_model.predict(answers(3), ORDER)
+
+
+def test_predict_endpoint_maps_batcher_errors(monkeypatch):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = models.User(username="u", password="x")
+    survey = models.Survey(title="s", questions=[models.SurveyQuestion(text="a")])
+    db.add_all([user, survey])
+    db.commit()
+    db.refresh(user)
+    db.refresh(survey)
+    app.dependency_overrides[get_current_user] = lambda: user
+    client = TestClient(app)
+    url = f"/api/surveys/{survey.id}/predict"
+    body = {"answers": [{"question_id": survey.questions[0].id, "answer_value": 9}]}
+    try:
+        assert client.post(url, json=body).json()["predicted_category"] == "high"
+
+        full = PredictionBatcher(max_batch=8, max_wait=0.001, max_pending=0)
+        monkeypatch.setattr(ml_batcher, "get_prediction_batcher", lambda: full)
+        response = client.post(url, json=body)
+        assert response.status_code == 503 and response.headers["Retry-After"] == "1"
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
+        db.close()
+        Base.metadata.drop_all(bind=engine)
@@ -0,0 +1,62 @@
+# tests/test_passwords.py
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import SessionLocal
+from app.passwords import PasswordPool, PasswordPoolSaturated, make_context, password_pool
+from app import metrics, models
+
+client = TestClient(app)
+
+
+def test_saturated_pool_rejects_instead_of_queueing():
+    pool = PasswordPool(make_context(4), workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def scenario():
+        busy = asyncio.ensure_future(pool.run(release.wait))
+        await asyncio.sleep(0.01)
+        with pytest.raises(PasswordPoolSaturated):
+            await pool.hash("secret")
+        release.set()
+        await busy
+        return await pool.hash("secret")
+
+    hashed = asyncio.run(scenario())
+    assert hashed.startswith("$2b$04$")
+    assert pool.pending == 0
+
+
+def test_login_rehashes_stale_hash(database, monkeypatch):
+    monkeypatch.setattr(password_pool, "context", make_context(5))
+    db = SessionLocal()
+    user = models.User(username="old", password=make_context(4).hash("secret"))
+    db.add(user)
+    db.commit()
+
+    response = client.post("/api/auth/token", data={"username": "old", "password": "secret"})
+    assert response.status_code == 200
+    db.refresh(user)
+    assert user.password.startswith("$2b$05$")
+    db.close()
+
+
+def test_login_returns_503_when_pool_is_full(database, monkeypatch):
+    client.post("/api/auth/register", json={"username": "busy", "password": "secret"})
+    monkeypatch.setattr(password_pool, "max_pending", 0)
+    response = client.post("/api/auth/token", data={"username": "busy", "password": "secret"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_admin_metrics_snapshot(admin):
+    response = client.get("/api/admin/metrics")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["login_seconds"]["count"] >= 1
+    assert body["password_rehashed_total"] >= 1
+    assert "event_loop_lag_seconds" in body
+    assert set(metrics.registry) <= set(body)
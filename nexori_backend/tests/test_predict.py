@@ -0,0 +1,133 @@
+# tests/test_predict.py
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import Base, engine, SessionLocal
+from app.dependencies import get_current_user
+from app.ml import model as ml_model
+from app.routes import surveys as survey_routes
+from app import config, models
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def survey():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = models.User(username="u", password="x", role="user")
+    survey = models.Survey(
+        title="Mood",
+        questions=[models.SurveyQuestion(text=t, min_value=0, max_value=10) for t in "abc"],
+    )
+    db.add_all([user, survey])
+    db.commit()
+    db.refresh(user)
+    db.refresh(survey)
+    app.dependency_overrides[get_current_user] = lambda: user
+    try:
+        yield survey
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
+        ml_model.reset_model()
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def custom_model(tmp_path, monkeypatch):
+    # явные веса по вопросам: категория «b» — если второй ответ больше первого
+    path = tmp_path / "model.json"
+    path.write_text(json.dumps({
+        "categories": ["a", "b"],
+        "coef": [[1.0, -1.0, 0.0], [-1.0, 1.0, 0.0]],
+        "intercept": [0.0, 0.0],
+    }))
+    monkeypatch.setattr(config, "ML_MODEL_PATH", str(path))
+    ml_model.reset_model()
+
+
+def body(*values, question_ids):
+    return {"answers": [{"question_id": q, "answer_value": v}
+                        for q, v in zip(question_ids, values) if v is not None]}
+
+
+def test_model_is_loaded_once_on_first_prediction(monkeypatch):
+    ml_model.reset_model()
+    loads = []
+    load = ml_model.SoftmaxModel.load
+    monkeypatch.setattr(ml_model.SoftmaxModel, "load",
+                        classmethod(lambda cls, path: loads.append(path) or load(path)))
+    assert ml_model._model is None
+    ml_model.predict({1: 2})
+    ml_model.predict([{1: 9}, {1: 5}])
+    assert loads == [ml_model.DEFAULT_MODEL_PATH]
+
+
+def test_batch_predict_is_vectorized_and_matches_single():
+    rng = np.random.default_rng(1)
+    answers = [dict(zip((1, 2, 3), map(int, row))) for row in rng.integers(0, 11, (500, 3))]
+    answers[0] = {1: 9, 3: 9}                     # пропуск заменяется средним строки
+    batch = ml_model.predict(answers, question_order=(1, 2, 3))
+    assert len(batch) == 500
+    assert batch[0] == ml_model.predict({1: 9, 2: 9, 3: 9})
+    for item, single in zip(batch[:20], answers[:20]):
+        assert item == ml_model.predict(single, question_order=(1, 2, 3))
+        assert sum(item["probabilities"].values()) == pytest.approx(100)
+    assert ml_model.predict({1: 1, 2: 0, 3: 2})["predicted_category"] == "low"
+    assert ml_model.predict({1: 5, 2: 5, 3: 6})["predicted_category"] == "medium"
+
+
+def test_predict_endpoints_use_question_order(survey, custom_model):
+    qa, qb, qc = sorted(q.id for q in survey.questions)
+    url = f"/api/surveys/{survey.id}/predict"
+    # порядок ответов в запросе не важен: признаки — по id вопросов
+    reversed_answers = {"answers": body(2, 8, 0, question_ids=(qa, qb, qc))["answers"][::-1]}
+    single = client.post(url, json=reversed_answers).json()
+    assert single["predicted_category"] == "b"
+    assert single["probabilities"]["b"] == pytest.approx(100 / (1 + np.exp(-12)))
+
+    batch = client.post(url + "/batch", json={"rows": [[2, 8, 0], [9, 1, None]]}).json()
+    assert [item["predicted_category"] for item in batch] == ["b", "a"]
+    assert batch[0] == single
+    # свои столбцы: лишние вопросы отбрасываются, недостающие — пропуски
+    reordered = client.post(url + "/batch", json={
+        "question_ids": [qc, 999999, qb, qa], "rows": [[0, 5, 8, 2]],
+    }).json()
+    assert reordered == batch[:1]
+    ragged = client.post(url + "/batch", json={"rows": [[1, 2, 3], [1]]})
+    assert ragged.status_code == 422
+
+    assert client.post("/api/surveys/999999/predict", json={"answers": []}).status_code == 404
+
+
+def test_predict_rejects_mismatched_model_and_oversized_batch(survey, tmp_path, monkeypatch):
+    path = tmp_path / "two.json"
+    path.write_text(json.dumps({"categories": ["x", "y"], "coef": [[1, 0], [0, 1]],
+                                "intercept": [0, 0]}))
+    monkeypatch.setattr(config, "ML_MODEL_PATH", str(path))
+    ml_model.reset_model()
+    url = f"/api/surveys/{survey.id}/predict"
+    response = client.post(url, json={"answers": []})
+    assert response.status_code == 422 and "expects 2 answers, got 3" in response.text
+
+    monkeypatch.setattr(survey_routes, "PREDICT_BATCH_MAX", 1)
+    assert client.post(url + "/batch", json={"rows": [[1], [2]]}).status_code == 413
+
+
+def test_submit_attaches_prediction_when_enabled(survey, monkeypatch):
+    qa, qb, qc = sorted(q.id for q in survey.questions)
+    url = f"/api/surveys/{survey.id}/submit"
+    payload = dict(respondent_name="r", **body(9, 10, 8, question_ids=(qa, qb, qc)))
+    assert client.post(url, json=payload).json()["prediction"] is None
+
+    monkeypatch.setattr(survey_routes, "ML_PREDICT_ON_SUBMIT", True)
+    response = client.post(url, json=payload).json()
+    assert response["total_score"] == 27
+    assert response["prediction"]["predicted_category"] == "high"
+    batch = client.post(url + "/batch", json=[payload, payload]).json()
+    assert [r["response"]["prediction"]["predicted_category"] for r in batch["results"]] == \
+        ["high", "high"]
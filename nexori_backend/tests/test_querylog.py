@@ -0,0 +1,115 @@
+# tests/test_querylog.py
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.config import N_PLUS_ONE_THRESHOLD
+from app.database import Base, engine, SessionLocal
+from app.dependencies import get_current_user
+from app.logger import logger
+from app.querylog import RequestQueries, current_queries, params_shape, statement_shape
+from app import config, models
+
+client = TestClient(app)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture(scope="module")
+def survey_ids():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = models.User(username="counted", password="x")
+    surveys = [
+        models.Survey(
+            title=f"S{i}",
+            questions=[models.SurveyQuestion(text=f"q{j}") for j in range(3)],
+            ranges=[models.SurveyResultRange(min_score=0, max_score=30, message="ok")],
+        )
+        for i in range(N_PLUS_ONE_THRESHOLD + 3)
+    ]
+    db.add_all([user, *surveys])
+    db.commit()
+    app.dependency_overrides[get_current_user] = lambda: user
+    try:
+        yield [s.id for s in surveys]
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+def test_statement_shape_folds_placeholder_lists():
+    a = statement_shape("SELECT * FROM t WHERE id IN (?, ?, ?)")
+    b = statement_shape("SELECT *  FROM t\n WHERE id IN (?)")
+    assert a == statement_shape("SELECT * FROM t WHERE id IN (?, ?)")
+    assert "IN (?...)" in a and b.endswith("IN (?)")
+    assert statement_shape("INSERT INTO t VALUES (?, ?), (?, ?), (?, ?)") == "INSERT INTO t VALUES (?...), ..."
+
+
+def test_params_shape_hides_values():
+    assert params_shape({"name": "Ivan", "age": 30}) == "{name: str, age: int}"
+    assert params_shape([("a", 1), ("b", 2)], executemany=True) == "2 x [str, int]"
+
+
+def test_lazy_loading_in_a_loop_is_flagged(survey_ids):
+    queries = RequestQueries()
+    token = current_queries.set(queries)
+    db = SessionLocal()
+    try:
+        for survey in db.query(models.Survey).all():
+            survey.ranges                       # ленивая догрузка на каждой итерации
+    finally:
+        db.close()
+        current_queries.reset(token)
+    ((shape, repeats),) = queries.repeated(N_PLUS_ONE_THRESHOLD)
+    assert "survey_result_ranges" in shape and repeats == len(survey_ids)
+
+
+def test_slow_queries_are_logged_with_route(survey_ids, monkeypatch):
+    monkeypatch.setattr(config, "SLOW_QUERY_MS", 0)
+    handler = ListHandler()
+    logger.addHandler(handler)
+    try:
+        client.get(f"/api/surveys/{survey_ids[0]}")
+    finally:
+        logger.removeHandler(handler)
+    slow = [r for r in handler.records if r.msg == "slow query"]
+    assert slow and all(r.route == "/api/surveys/{survey_id}" for r in slow)
+    assert all("counted" not in r.params for r in slow)
+
+
+# ---------- бюджеты запросов на эндпоинты ----------
+def test_catalog_query_budget(survey_ids, max_queries):
+    # версия кэша, страница, selectinload вопросов, count
+    with max_queries(4):
+        client.get("/api/surveys/", params={"limit": 100})
+
+
+def test_survey_read_query_budget(survey_ids, max_queries):
+    # версия кэша, опрос, selectinload вопросов и диапазонов; повтор — из кэша
+    with max_queries(4):
+        client.get(f"/api/surveys/{survey_ids[0]}")
+    with max_queries(0):
+        client.get(f"/api/surveys/{survey_ids[0]}")
+
+
+def test_submit_query_budget(survey_ids, max_queries):
+    survey = client.get(f"/api/surveys/{survey_ids[1]}").json()     # и прогрев снимка
+    answers = [{"question_id": q["id"], "answer_value": 1} for q in survey["questions"]]
+    # ответ, ответы по вопросам, агрегаты и rollup (INSERT недостающих строк,
+    # чтение под блокировкой, запись), строка тестового пользователя
+    with max_queries(9):
+        response = client.post(
+            f"/api/surveys/{survey_ids[1]}/submit",
+            json={"respondent_name": "r", "answers": answers},
+        )
+    assert response.status_code == 200
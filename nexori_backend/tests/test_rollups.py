@@ -0,0 +1,114 @@
+# tests/test_rollups.py
+import json
+from datetime import datetime
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import SessionLocal
+from app import aggregates, models, responses
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def survey_questions():
+    return [{"text": "a", "min_value": 0, "max_value": 10}]
+
+
+@pytest.fixture
+def survey_ranges():
+    return [{"min_score": 0, "max_score": 4, "message": "low"},
+            {"min_score": 5, "max_score": 8, "message": "high"}]
+
+
+def timeseries(survey, **params):
+    response = client.get(f"/api/analytics/surveys/{survey.id}/timeseries", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()["points"]
+
+
+def rollup_rows(survey_id):
+    db = SessionLocal()
+    try:
+        return sorted(
+            (r.bucket, r.bucket_start, r.count, r.score_total, r.score_histogram, r.recommendations)
+            for r in db.query(models.SurveyRollup).filter_by(survey_id=survey_id)
+        )
+    finally:
+        db.close()
+
+
+def test_timeseries_by_hour_and_day(survey, import_rows):
+    import_rows([
+        ("2024-03-01T10:05:00", 2),
+        ("2024-03-01T10:55:00", 6),
+        ("2024-03-01T13:00:00+03:00", 9),       # 10:00 UTC, без рекомендации
+        ("2024-03-01T11:30:00", 6),
+        ("2024-03-02T09:00:00", 1),
+    ])
+    window = {"from": "2024-03-01T00:00:00", "to": "2024-03-03T00:00:00"}
+
+    hours = timeseries(survey, bucket="hour", **window)
+    assert [(p["start"], p["count"]) for p in hours] == [
+        ("2024-03-01T10:00:00", 3), ("2024-03-01T11:00:00", 1), ("2024-03-02T09:00:00", 1),
+    ]
+    assert hours[0]["average_score"] == pytest.approx(17 / 3)
+    assert hours[0]["score_distribution"] == {"2": 1, "6": 1, "9": 1}
+    assert hours[0]["recommendations"] == {"low": 1, "high": 1}
+
+    days = timeseries(survey, bucket="day", **window)
+    assert [(p["start"], p["count"]) for p in days] == [
+        ("2024-03-01T00:00:00", 4), ("2024-03-02T00:00:00", 1),
+    ]
+    assert days[0]["recommendations"] == {"low": 1, "high": 2}
+    # начало окна посреди часа захватывает этот час целиком
+    assert len(timeseries(survey, bucket="hour", **{"from": "2024-03-01T11:45:00",
+                                                    "to": "2024-03-01T12:00:00"})) == 1
+
+
+def test_json_fallback_without_orjson(survey, import_rows, monkeypatch):
+    import_rows([("2024-03-01T10:05:00", 2)])
+    window = {"from": "2024-03-01T00:00:00", "to": "2024-03-02T00:00:00"}
+    expected = client.get(f"/api/analytics/surveys/{survey.id}/timeseries", params=window)
+    body = {"start": datetime(2024, 3, 1, 10), "counts": np.arange(3), "mean": np.float64(0.5)}
+    with_orjson = responses.FastJSONResponse(body).body
+
+    # запасной путь через json: даты и NumPy — так же, как у orjson
+    monkeypatch.setattr(responses, "orjson", None)
+    assert json.loads(responses.FastJSONResponse(body).body) == json.loads(with_orjson)
+    response = client.get(f"/api/analytics/surveys/{survey.id}/timeseries", params=window)
+    assert response.status_code == 200 and response.json() == expected.json()
+
+
+def test_rollups_are_maintained_on_submit(survey):
+    (question,) = survey.questions
+    client.post(f"/api/surveys/{survey.id}/submit", json={
+        "respondent_name": "live", "answers": [{"question_id": question.id, "answer_value": 3}],
+    })
+    (point,) = timeseries(survey, bucket="hour")
+    assert point["count"] == 1 and point["recommendations"] == {"low": 1}
+    assert timeseries(survey)[0]["count"] == 1
+
+
+def test_rebuild_matches_incremental_rollups(survey, import_rows):
+    import_rows([("2024-01-01T00:00:00", 5), ("2024-01-01T00:10:00", 7),
+                         ("2024-01-05T23:59:59", 0)])
+    incremental = rollup_rows(survey.id)
+    db = SessionLocal()
+    try:
+        db.query(models.SurveyRollup).delete()
+        db.commit()
+        assert aggregates.rebuild_rollups(db) == {"surveys": 1, "rows": 5}   # + «за всё время»
+    finally:
+        db.close()
+    assert rollup_rows(survey.id) == incremental
+
+
+def test_timeseries_validates_range(survey):
+    url = f"/api/analytics/surveys/{survey.id}/timeseries"
+    assert client.get(url, params={"from": "2024-02-01", "to": "2024-01-01"}).status_code == 422
+    too_wide = {"bucket": "hour", "from": "2000-01-01", "to": "2024-01-01"}
+    assert client.get(url, params=too_wide).status_code == 422
+    assert client.get("/api/analytics/surveys/999999/timeseries").status_code == 404
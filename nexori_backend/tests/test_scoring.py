@@ -0,0 +1,74 @@
+# tests/test_scoring.py
+import random
+from types import SimpleNamespace as NS
+import pytest
+from app import schemas
+from app.scoring import ScoringPlan, check_survey
+from app.submissions import SubmissionError
+
+QUESTIONS = [NS(id=10, min_value=0, max_value=5), NS(id=20, min_value=1, max_value=3),
+             NS(id=30, min_value=0, max_value=10)]
+RANGES = [NS(min_score=9, max_score=18, message="high"),
+          NS(min_score=0, max_score=4, message="low"),
+          NS(min_score=5, max_score=8, message="mid")]
+
+
+def payload(*answers):
+    return schemas.SurveySubmit(
+        respondent_name="r",
+        answers=[{"question_id": q, "answer_value": v} for q, v in answers],
+    )
+
+
+def test_prepare_validates_bounds_and_finds_range():
+    plan = ScoringPlan(QUESTIONS, RANGES)
+    prepared = plan.prepare(payload((10, 5), (20, 2)), user_id=7)
+    assert (prepared.total_score, prepared.recommendation, prepared.user_id) == (7, "mid", 7)
+    assert plan.recommend(18) == "high" and plan.recommend(19) is None
+
+    with pytest.raises(SubmissionError, match="outside"):
+        plan.prepare(payload((20, 0)))
+    with pytest.raises(SubmissionError, match="Unknown"):
+        plan.prepare(payload((99, 1)))
+    with pytest.raises(SubmissionError, match="Duplicate"):
+        plan.prepare(payload((10, 1), (10, 2)))
+
+
+def test_prepare_many_matches_prepare():
+    rng = random.Random(1)
+    plan = ScoringPlan(QUESTIONS, RANGES)
+    payloads = [
+        payload(*[(rng.choice([10, 20, 30, 99]), rng.randint(-1, 11))
+                  for _ in range(rng.randint(0, 4))])
+        for _ in range(300)
+    ]
+    batch = plan.prepare_many(payloads, user_id=1)
+    for p, got in zip(payloads, batch):
+        try:
+            expected = plan.prepare(p, user_id=1)
+        except SubmissionError as exc:
+            assert isinstance(got, SubmissionError) and str(got) == str(exc)
+        else:
+            assert got == expected
+
+
+def test_legacy_overlapping_ranges_keep_first_match():
+    ranges = [NS(min_score=0, max_score=10, message="first"),
+              NS(min_score=5, max_score=20, message="second")]
+    plan = ScoringPlan(QUESTIONS, ranges)
+    assert plan.recommend(7) == "first"
+    assert plan.recommend(15) == "second"
+
+
+def test_check_survey_reports_overlaps_and_gaps():
+    errors, warnings = check_survey(QUESTIONS, RANGES)
+    assert errors == [] and warnings == []
+
+    errors, _ = check_survey(QUESTIONS, RANGES + [NS(min_score=8, max_score=9, message="x")])
+    assert any("overlap" in e for e in errors)
+
+    _, warnings = check_survey(QUESTIONS, [NS(min_score=2, max_score=4, message="a"),
+                                           NS(min_score=7, max_score=15, message="b")])
+    assert warnings == ["Scores 5..6 have no recommendation",
+                        "Scores 1..1 have no recommendation",
+                        "Scores 16..18 have no recommendation"]
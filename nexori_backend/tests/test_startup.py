@@ -0,0 +1,70 @@
+# tests/test_startup.py
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# бюджет на `import app.main` (кумулятивно, по -X importtime); с запасом
+# на медленный CI, но заметно ниже прежних ~1.4 с с NumPy/jose/passlib
+IMPORT_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "2500"))
+# тяжёлые модули, которые грузятся при первом использовании, а не при старте
+DEFERRED = ("numpy", "jose", "passlib", "app.ml.model", "app.analytics", "app.scoring")
+
+
+def run_python(args, db_path, **env):
+    environ = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}", **env)
+    environ["PYTHONPATH"] = os.pathsep.join(filter(None, [str(ROOT), environ.get("PYTHONPATH")]))
+    return subprocess.run([sys.executable, *args], cwd=ROOT, env=environ,
+                          capture_output=True, text=True, check=True)
+
+
+def import_times(stderr: str) -> dict:
+    """Разбор вывода -X importtime: модуль → кумулятивное время, мкс."""
+    times = {}
+    for line in stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|\s+(\S+)", line)
+        if match:
+            times[match.group(2)] = int(match.group(1))
+    return times
+
+
+def test_import_is_lazy_and_within_budget(tmp_path):
+    db_path = tmp_path / "cold.db"
+    result = run_python(["-X", "importtime", "-c", "import app.main"], db_path)
+    times = import_times(result.stderr)
+
+    assert "app.main" in times
+    assert [name for name in DEFERRED if name in times] == []
+    assert not db_path.exists()                  # импорт не трогает БД
+    assert times["app.main"] / 1000 < IMPORT_BUDGET_MS, \
+        sorted(times.items(), key=lambda item: -item[1])[:15]
+
+
+def test_init_db_command_creates_schema(tmp_path):
+    db_path = tmp_path / "init.db"
+    result = run_python(["-m", "app.cli", "init-db"], db_path)
+    assert "init.db" in result.stdout
+
+    inspector = inspect(create_engine(f"sqlite:///{db_path}"))
+    assert {"users", "surveys", "survey_responses"} <= set(inspector.get_table_names())
+    assert inspector.get_indexes("survey_responses")
+    run_python(["-m", "app.cli", "init-db"], db_path)      # повторно — без ошибок
+
+
+def test_lifespan_creates_schema_when_enabled(tmp_path, monkeypatch):
+    from app import main
+
+    created = []
+    monkeypatch.setattr(main, "init_db", lambda: created.append(True))
+    with TestClient(main.app):
+        pass
+    monkeypatch.setattr(main, "DB_CREATE_SCHEMA", False)
+    with TestClient(main.app):
+        pass
+    assert created == [True]
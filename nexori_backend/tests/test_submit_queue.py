@@ -0,0 +1,154 @@
+# tests/test_submit_queue.py
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import Base, engine, SessionLocal
+from app.dependencies import get_current_user
+from app.routes import surveys as surveys_route
+from app.submissions import PreparedSubmission
+from app.submit_queue import QueueFull, SubmissionQueue, get_submission_queue
+from app import models
+
+client = TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def survey():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    user = models.User(username="student", password="x")
+    survey = models.Survey(title="Queue", questions=[models.SurveyQuestion(text="q")])
+    db.add_all([user, survey])
+    db.commit()
+    app.dependency_overrides[get_current_user] = lambda: user
+    try:
+        yield survey
+    finally:
+        app.dependency_overrides.pop(get_current_user, None)
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+
+def prepared(q_id, value):
+    return PreparedSubmission(f"r{value}", {q_id: value}, value, None)
+
+
+def test_queue_coalesces_concurrent_submissions(survey):
+    q_id = survey.questions[0].id
+    submission_queue = SubmissionQueue(max_batch=50, max_delay=0.05)
+    futures = []
+    threads = [
+        threading.Thread(target=lambda v=v: futures.append(
+            submission_queue.submit(survey.id, {q_id}, prepared(q_id, v))))
+        for v in range(40)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results = [f.result(timeout=5) for f in futures]
+    submission_queue.close()
+
+    assert len({r.id for r in results}) == 40
+    assert submission_queue.batches_committed < 40
+    db = SessionLocal()
+    try:
+        assert db.get(models.SurveyQuestionStats, (survey.id, q_id)).count == 40
+    finally:
+        db.close()
+
+
+def test_backpressure_and_drain(survey):
+    q_id = survey.questions[0].id
+    release = threading.Event()
+    submission_queue = SubmissionQueue(max_batch=1, max_delay=0, max_size=2)
+    original_write = submission_queue._write
+
+    def slow_write(batch):
+        release.wait(5)
+        return original_write(batch)
+
+    submission_queue._write = slow_write
+    futures = [submission_queue.submit(survey.id, {q_id}, prepared(q_id, 1))]
+    with pytest.raises(QueueFull):
+        for _ in range(5):
+            futures.append(submission_queue.submit(survey.id, {q_id}, prepared(q_id, 1)))
+
+    release.set()
+    submission_queue.close(timeout=5)
+    assert all(f.done() and f.exception() is None for f in futures)
+    with pytest.raises(QueueFull):
+        submission_queue.submit(survey.id, {q_id}, prepared(q_id, 1))
+
+
+def test_submit_route_through_queue(survey, monkeypatch):
+    monkeypatch.setattr(surveys_route, "SUBMIT_QUEUE_ENABLED", True)
+    q_id = survey.questions[0].id
+    payload = {"respondent_name": "queued",
+               "answers": [{"question_id": q_id, "answer_value": 7}]}
+    with TestClient(app) as queued_client:   # lifespan дописывает очередь
+        response = queued_client.post(f"/api/surveys/{survey.id}/submit", json=payload)
+        assert get_submission_queue().batches_committed == 1
+    assert response.status_code == 200
+    assert response.json()["answers"] == {str(q_id): 7}
+
+
+def slowed_queue(monkeypatch, write_started, release):
+    """Очередь по одному ответу, запись которого ждёт release."""
+    submission_queue = SubmissionQueue(max_batch=1, max_delay=0)
+    original_write = submission_queue._write
+
+    def slow_write(batch):
+        write_started.set()
+        release.wait(5)
+        return original_write(batch)
+
+    submission_queue._write = slow_write
+    monkeypatch.setattr(surveys_route, "SUBMIT_QUEUE_ENABLED", True)
+    monkeypatch.setattr(surveys_route, "SUBMIT_QUEUE_TIMEOUT", 0.1)
+    monkeypatch.setattr(surveys_route, "get_submission_queue", lambda: submission_queue)
+    return submission_queue
+
+
+def count_responses(name):
+    db = SessionLocal()
+    try:
+        return db.query(models.SurveyResponse).filter_by(respondent_name=name).count()
+    finally:
+        db.close()
+
+
+def test_timed_out_submission_is_withdrawn_from_queue(survey, monkeypatch):
+    q_id = survey.questions[0].id
+    write_started, release = threading.Event(), threading.Event()
+    submission_queue = slowed_queue(monkeypatch, write_started, release)
+    blocker = submission_queue.submit(survey.id, {q_id}, prepared(q_id, 1))
+    assert write_started.wait(5)             # писатель занят предыдущим ответом
+
+    payload = {"respondent_name": "withdrawn",
+               "answers": [{"question_id": q_id, "answer_value": 3}]}
+    response = client.post(f"/api/surveys/{survey.id}/submit", json=payload)
+    release.set()
+    submission_queue.close(timeout=5)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert blocker.result(timeout=5) is not None
+    assert count_responses("withdrawn") == 0
+
+
+def test_slow_commit_is_awaited_not_reported_as_failure(survey, monkeypatch):
+    q_id = survey.questions[0].id
+    write_started, release = threading.Event(), threading.Event()
+    submission_queue = slowed_queue(monkeypatch, write_started, release)
+    # ответ уже забран писателем, commit задерживается дольше таймаута
+    threading.Timer(0.3, release.set).start()
+
+    payload = {"respondent_name": "slow",
+               "answers": [{"question_id": q_id, "answer_value": 4}]}
+    response = client.post(f"/api/surveys/{survey.id}/submit", json=payload)
+    submission_queue.close(timeout=5)
+
+    assert response.status_code == 200
+    assert count_responses("slow") == 1
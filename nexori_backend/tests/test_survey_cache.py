@@ -0,0 +1,99 @@
+# tests/test_survey_cache.py
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import SessionLocal
+from app.survey_cache import survey_cache
+from app.cache import LRUTTLCache
+from app import crud, models
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def survey_questions():
+    return [{"text": "q"}]
+
+
+@pytest.fixture
+def survey_id(survey):
+    return survey.id
+
+
+def test_lru_ttl_cache_counters():
+    cache = LRUTTLCache(maxsize=2, ttl=None)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)            # вытесняет давно не читанный "b"
+    assert cache.get("b") is None
+    cache.set("d", 4, ttl=-1)    # уже протух
+    assert cache.get("d") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["expirations"]) == (1, 2, 2, 1)
+
+
+def test_hot_reads_are_served_from_cache(survey_id):
+    assert client.get(f"/api/surveys/{survey_id}").status_code == 200
+    hits, misses = survey_cache.entries.hits, survey_cache.entries.misses
+    for _ in range(5):
+        response = client.get(f"/api/surveys/{survey_id}")
+        assert response.json()["title"] == "Survey"
+    assert survey_cache.entries.hits > hits
+    assert survey_cache.entries.misses == misses
+
+
+def test_admin_update_invalidates(survey_id):
+    client.get(f"/api/surveys/{survey_id}")
+    response = client.put(f"/api/admin/surveys/{survey_id}", json={"title": "Renamed"})
+    assert response.status_code == 200
+    assert client.get(f"/api/surveys/{survey_id}").json()["title"] == "Renamed"
+
+
+def test_other_worker_write_is_picked_up_by_version_poll(survey_id, monkeypatch):
+    monkeypatch.setattr(survey_cache, "poll_interval", 3600)
+    client.get(f"/api/surveys/{survey_id}")
+    # правка «из другого воркера»: прямо в БД, с увеличением версии
+    db = SessionLocal()
+    try:
+        db.get(models.Survey, survey_id).title = "Elsewhere"
+        crud.bump_cache_version(db, "surveys")
+        db.commit()
+    finally:
+        db.close()
+
+    assert client.get(f"/api/surveys/{survey_id}").json()["title"] != "Elsewhere"
+    monkeypatch.setattr(survey_cache, "poll_interval", 0)
+    assert client.get(f"/api/surveys/{survey_id}").json()["title"] == "Elsewhere"
+    assert client.get("/api/admin/cache/stats").json()["surveys"]["invalidations"] >= 1
+
+
+def test_bump_creates_missing_counter_row(survey_id):
+    db = SessionLocal()
+    try:
+        crud.bump_cache_version(db, "fresh")      # строки ещё нет
+        crud.bump_cache_version(db, "fresh")
+        db.commit()
+        assert crud.get_cache_version(db, "fresh") == 2
+    finally:
+        db.close()
+
+
+def test_rendered_bytes_skip_pydantic(survey_id, monkeypatch):
+    first = client.get(f"/api/surveys/{survey_id}")
+    assert first.headers["content-type"] == "application/json"
+
+    def no_render(*args):
+        raise AssertionError("cached response rendered again")
+
+    monkeypatch.setattr("app.routes.surveys.render", no_render)
+    again = client.get(f"/api/surveys/{survey_id}")
+    assert again.content == first.content
+
+
+def test_catalog_page_bytes_follow_admin_writes(survey_id):
+    before = client.get("/api/surveys/", params={"fields": "summary"}).json()
+    client.put(f"/api/admin/surveys/{survey_id}", json={"title": "Catalog"})
+    after = client.get("/api/surveys/", params={"fields": "summary"}).json()
+    assert before[0]["title"] != "Catalog"
+    assert after[0]["title"] == "Catalog"